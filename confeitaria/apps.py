@@ -1,6 +1,14 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_delete, post_save
 
 
 class ConfeitariaConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "confeitaria"
+
+    def ready(self):
+        from confeitaria.busca import invalidar_indice_busca
+
+        # Mantém o índice de busca em memória (bancos sem PostgreSQL) atualizado
+        post_save.connect(invalidar_indice_busca, sender="confeitaria.Doce")
+        post_delete.connect(invalidar_indice_busca, sender="confeitaria.Doce")
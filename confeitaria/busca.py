@@ -0,0 +1,130 @@
+import re
+import threading
+import unicodedata
+
+from django.db import connection
+from django.db.models import BooleanField, Case, FloatField, Value, When
+from django.db.models.expressions import RawSQL
+from confeitaria.models import Doce
+
+# Coluna tsvector (gerada) e índices criados pela migração 0010_busca_textual
+VETOR_SQL = '"confeitaria_doce"."busca_vetor"'
+NOME_SQL = 'f_unaccent(lower("confeitaria_doce"."nome"))'
+
+
+def normalizar(texto):
+    # Minúsculas e sem acentos
+    texto = unicodedata.normalize('NFKD', (texto or '').lower())
+    return ''.join(c for c in texto if not unicodedata.combining(c))
+
+
+def radical(token):
+    # Stemming leve para português (plurais mais comuns)
+    for sufixo, troca in (('oes', 'ao'), ('aes', 'ao'), ('ns', 'm'), ('eis', 'el'), ('s', '')):
+        if len(token) > len(sufixo) and token.endswith(sufixo):
+            return token[:-len(sufixo)] + troca
+    return token
+
+
+def tokenizar(texto):
+    return re.findall(r'\w+', normalizar(texto))
+
+
+class IndiceMemoria:
+    """Índice invertido (radical -> ids) usado quando o banco não é PostgreSQL"""
+
+    def __init__(self):
+        self.nomes = None
+        self.descricoes = None
+        self._lock = threading.Lock()
+
+    def invalidar(self):
+        with self._lock:
+            self.nomes = None
+            self.descricoes = None
+
+    def _construir(self):
+        nomes = {}
+        descricoes = {}
+        for doce_id, nome, descricao in Doce.objects.values_list('id', 'nome', 'descricao'):
+            for token in tokenizar(nome):
+                nomes.setdefault(radical(token), set()).add(doce_id)
+            for token in tokenizar(descricao):
+                descricoes.setdefault(radical(token), set()).add(doce_id)
+        self.nomes = nomes
+        self.descricoes = descricoes
+
+    def buscar(self, termo):
+        # Todos os termos precisam casar (por prefixo); casar no nome vale mais
+        tokens = [radical(token) for token in tokenizar(termo)]
+        with self._lock:
+            if self.nomes is None:
+                self._construir()
+            resultado = None
+            for token in tokens:
+                pontos = {}
+                for indice, peso in ((self.descricoes, 1.0), (self.nomes, 2.0)):
+                    for chave, ids in indice.items():
+                        if chave.startswith(token):
+                            for doce_id in ids:
+                                pontos[doce_id] = max(pontos.get(doce_id, 0.0), peso)
+                if resultado is None:
+                    resultado = pontos
+                else:
+                    resultado = {
+                        doce_id: resultado[doce_id] + peso
+                        for doce_id, peso in pontos.items()
+                        if doce_id in resultado
+                    }
+                if not resultado:
+                    return {}
+            return resultado or {}
+
+
+indice_memoria = IndiceMemoria()
+
+
+def buscar_doces(termo):
+    """
+    Busca doces por nome e descrição, ordenados por relevância.
+    No PostgreSQL usa o tsvector em português (sem acentos) com índice GIN
+    e trigramas no nome; nos demais bancos usa o índice em memória.
+    """
+    tokens = tokenizar(termo)
+    doces = Doce.objects.select_related('categoria')
+    if not tokens:
+        return doces.none()
+
+    if connection.vendor == 'postgresql':
+        # Cada palavra vira um prefixo: "bolo choc" -> bolo:* & choc:*
+        tsquery = ' & '.join(f'{token}:*' for token in tokens)
+        termo_normalizado = ' '.join(tokens)
+        return doces.filter(
+            RawSQL(
+                f"{VETOR_SQL} @@ to_tsquery('portuguese', %s) OR {NOME_SQL} LIKE %s",
+                (tsquery, f'%{termo_normalizado}%'),
+                output_field=BooleanField()
+            )
+        ).annotate(
+            relevancia=RawSQL(
+                f"ts_rank({VETOR_SQL}, to_tsquery('portuguese', %s)) + similarity({NOME_SQL}, %s)",
+                (tsquery, termo_normalizado),
+                output_field=FloatField()
+            )
+        ).order_by('-relevancia', 'id')
+
+    pontos = indice_memoria.buscar(termo)
+    if not pontos:
+        return doces.none()
+    return doces.filter(pk__in=list(pontos)).annotate(
+        relevancia=Case(
+            *[When(pk=doce_id, then=Value(nota)) for doce_id, nota in pontos.items()],
+            default=Value(0.0),
+            output_field=FloatField()
+        )
+    ).order_by('-relevancia', 'id')
+
+
+def invalidar_indice_busca(sender, **kwargs):
+    # Conectado aos sinais post_save/post_delete de Doce (ver apps.py)
+    indice_memoria.invalidar()
@@ -0,0 +1,145 @@
+"""
+Carrinho da loja guardado no servidor.
+
+Com CARRINHO_REDIS_URL configurado, o carrinho fica no mesmo Redis e no
+mesmo formato de hash do microserviço de carrinho
+(microservices/carrinho/carrinho_redis.py):
+
+    carrinho:{carrinho_id} -> item:<doce_id>        quantidade
+                              adicionado:<doce_id>  data em que entrou
+                              criado_em / atualizado_em
+
+e a sessão do Django guarda apenas o carrinho_id. Sem Redis, os itens
+ficam na própria sessão (backend cached_db, ver settings.py).
+"""
+import uuid
+from datetime import datetime
+
+from django.conf import settings
+
+CHAVE_SESSAO_ITENS = "Carrinho"
+CHAVE_SESSAO_ID = "carrinho_id"
+
+_cliente_redis = None
+
+
+def _agora():
+    return datetime.utcnow().isoformat()
+
+
+def cliente_redis():
+    # Cliente único por processo (o pool de conexões é compartilhado entre as requisições)
+    global _cliente_redis
+    if _cliente_redis is None:
+        import redis
+
+        _cliente_redis = redis.Redis.from_url(
+            settings.CARRINHO_REDIS_URL,
+            decode_responses=True,
+            max_connections=settings.CARRINHO_REDIS_MAX_CONEXOES,
+            socket_timeout=1.0,
+            socket_connect_timeout=1.0,
+        )
+    return _cliente_redis
+
+
+class CarrinhoSessao:
+    """Itens na sessão: [{"doce_id": int, "quantidade": int}, ...]"""
+
+    def __init__(self, session):
+        self.session = session
+
+    def itens(self):
+        return [
+            {"doce_id": int(item["doce_id"]), "quantidade": int(item["quantidade"])}
+            for item in self.session.get(CHAVE_SESSAO_ITENS, [])
+        ]
+
+    def quantidade(self, doce_id):
+        return sum(item["quantidade"] for item in self.itens() if item["doce_id"] == doce_id)
+
+    def adicionar(self, doce_id, quantidade):
+        itens = self.itens()
+        item_existente = next((item for item in itens if item["doce_id"] == doce_id), None)
+        if item_existente:
+            item_existente["quantidade"] += quantidade
+        else:
+            itens.append({"doce_id": doce_id, "quantidade": quantidade})
+        self.session[CHAVE_SESSAO_ITENS] = itens
+
+    def remover(self, doce_id):
+        self.session[CHAVE_SESSAO_ITENS] = [item for item in self.itens() if item["doce_id"] != doce_id]
+
+    def limpar(self):
+        self.session[CHAVE_SESSAO_ITENS] = []
+
+
+class CarrinhoRedis:
+    """Itens no hash do Redis compartilhado com o microserviço de carrinho"""
+
+    def __init__(self, session, redis_client, ttl, prefixo="carrinho"):
+        self.session = session
+        self.redis_client = redis_client
+        self.ttl = ttl
+        self.prefixo = prefixo
+
+    @property
+    def carrinho_id(self):
+        # Gerado só na primeira alteração: depois disso a sessão não muda mais
+        if CHAVE_SESSAO_ID not in self.session:
+            self.session[CHAVE_SESSAO_ID] = str(uuid.uuid4())
+        return self.session[CHAVE_SESSAO_ID]
+
+    def chave(self):
+        return f"{self.prefixo}:{self.carrinho_id}"
+
+    def itens(self):
+        if CHAVE_SESSAO_ID not in self.session:
+            return []
+        campos = self.redis_client.hgetall(self.chave())
+        itens = [
+            (campos.get(f"adicionado:{campo[len('item:'):]}") or "", int(campo[len("item:"):]), int(valor))
+            for campo, valor in campos.items()
+            if campo.startswith("item:")
+        ]
+        return [{"doce_id": doce_id, "quantidade": quantidade} for _, doce_id, quantidade in sorted(itens)]
+
+    def quantidade(self, doce_id):
+        if CHAVE_SESSAO_ID not in self.session:
+            return 0
+        return int(self.redis_client.hget(self.chave(), f"item:{doce_id}") or 0)
+
+    def _alterar(self, *operacoes):
+        # Alteração, marcação de data e renovação do TTL em um único round-trip
+        chave = self.chave()
+        agora = _agora()
+        pipe = self.redis_client.pipeline()
+        for operacao in operacoes:
+            operacao(pipe, chave, agora)
+        pipe.hsetnx(chave, "criado_em", agora)
+        pipe.hset(chave, "atualizado_em", agora)
+        pipe.expire(chave, self.ttl)
+        pipe.execute()
+
+    def adicionar(self, doce_id, quantidade):
+        self._alterar(
+            lambda pipe, chave, agora: pipe.hincrby(chave, f"item:{doce_id}", quantidade),
+            lambda pipe, chave, agora: pipe.hsetnx(chave, f"adicionado:{doce_id}", agora),
+        )
+
+    def remover(self, doce_id):
+        # Sem carrinho (ou com o hash já expirado) não há o que remover: nada é criado
+        if CHAVE_SESSAO_ID not in self.session:
+            return
+        if self.redis_client.hdel(self.chave(), f"item:{doce_id}", f"adicionado:{doce_id}"):
+            self._alterar()
+
+    def limpar(self):
+        if CHAVE_SESSAO_ID in self.session:
+            self.redis_client.delete(self.chave())
+
+
+def carrinho_da_requisicao(request):
+    if settings.CARRINHO_REDIS_URL:
+        return CarrinhoRedis(request.session, cliente_redis(), settings.CARRINHO_TTL)
+    return CarrinhoSessao(request.session)
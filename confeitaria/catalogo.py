@@ -0,0 +1,165 @@
+"""
+Origem dos dados de catálogo das views da loja (settings.CATALOGO_BACKEND):
+
+- "local" (padrão): consultas ao banco do próprio Django
+- "api": microserviço de catálogo via ClienteCatalogoApi (cache local e
+  busca em lote), sem consultas de catálogo no banco do Django
+"""
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.http import Http404
+from django.shortcuts import get_object_or_404
+
+from confeitaria.busca import buscar_doces
+from confeitaria.models import Categoria, Doce
+
+
+class CatalogoLocal:
+    def categorias(self):
+        return Categoria.objects.all()
+
+    def categoria_por_nome(self, nome):
+        return get_object_or_404(Categoria, nome=nome)
+
+    def pagina_doces(self, categoria, numero, por_pagina):
+        doces = Doce.objects.select_related('categoria').order_by('id')
+        if categoria is not None:
+            doces = doces.filter(categoria=categoria)
+        return Paginator(doces, por_pagina).get_page(numero)
+
+    def doces_baratos(self, limite):
+        return Doce.objects.select_related('categoria').filter(preco__lt=20.0).order_by('preco', 'id')[:limite]
+
+    def buscar(self, termo):
+        return buscar_doces(termo)
+
+    def obter_doce(self, doce_id):
+        return get_object_or_404(Doce.objects.select_related('categoria'), pk=doce_id)
+
+    def doce_para_estoque(self, doce_id):
+        return get_object_or_404(Doce, pk=doce_id)
+
+    def relacionados(self, doce, limite):
+        return (
+            Doce.objects.select_related('categoria')
+            .filter(categoria_id=doce.categoria_id)
+            .exclude(pk=doce.pk)[:limite]
+        )
+
+    def doces_por_id(self, ids):
+        return Doce.objects.in_bulk(ids)
+
+
+class PaginaCatalogo:
+    """Página numerada sobre a paginação por cursor da API (mesma interface usada do Page)"""
+
+    def __init__(self, object_list, numero, tem_mais, total_paginas):
+        self.object_list = object_list
+        self.number = numero
+        self._tem_mais = tem_mais
+        self.paginator = self
+        self.num_pages = total_paginas
+
+    def has_next(self):
+        return self._tem_mais
+
+    def has_previous(self):
+        return self.number > 1
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    def next_page_number(self):
+        return self.number + 1
+
+    def previous_page_number(self):
+        return self.number - 1
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+class CatalogoApi:
+    # Limite de resultados da busca (máximo de uma página da API)
+    BUSCA_LIMITE = 200
+
+    def __init__(self, cliente):
+        self.cliente = cliente
+
+    def categorias(self):
+        return self.cliente.categorias()
+
+    def categoria_por_nome(self, nome):
+        categoria = next((categoria for categoria in self.categorias() if categoria.nome == nome), None)
+        if categoria is None:
+            raise Http404("Categoria não encontrada")
+        return categoria
+
+    def pagina_doces(self, categoria, numero, por_pagina):
+        try:
+            numero = max(int(numero or 1), 1)
+        except (TypeError, ValueError):
+            numero = 1
+        categoria_id = categoria.id if categoria is not None else None
+        filtro = f"{categoria_id}:{por_pagina}"
+
+        # Percorre os cursores a partir da última página conhecida
+        atual = numero
+        while atual > 1 and self.cliente.cursor_pagina(filtro, atual) is None:
+            atual -= 1
+        while True:
+            doces, paginacao = self.cliente.listar(
+                categoria_id=categoria_id,
+                limite=por_pagina,
+                cursor=self.cliente.cursor_pagina(filtro, atual) if atual > 1 else None,
+                incluir_total='true',
+            )
+            if paginacao.get('proximo_cursor'):
+                self.cliente.salvar_cursor_pagina(filtro, atual + 1, paginacao['proximo_cursor'])
+            if atual == numero or not paginacao.get('tem_mais'):
+                break
+            atual += 1
+
+        total = paginacao.get('total_geral') or len(doces)
+        total_paginas = max((total + por_pagina - 1) // por_pagina, 1)
+        return PaginaCatalogo(doces, atual, bool(paginacao.get('tem_mais')), total_paginas)
+
+    def doces_baratos(self, limite):
+        # Ordenados por preço: os de exatamente R$20 só aparecem depois de todos os mais baratos
+        doces, _ = self.cliente.listar(preco_max=20.0, ordenar='preco', limite=limite)
+        return [doce for doce in doces if doce.preco < 20.0]
+
+    def buscar(self, termo):
+        doces, _ = self.cliente.listar(busca=termo, limite=self.BUSCA_LIMITE)
+        return doces
+
+    def obter_doce(self, doce_id, fresco=False):
+        doce = self.cliente.obter(doce_id, fresco=fresco)
+        if doce is None:
+            raise Http404("Doce não encontrado")
+        return doce
+
+    def doce_para_estoque(self, doce_id):
+        # Checagem de estoque sem o cache
+        try:
+            return self.obter_doce(int(doce_id), fresco=True)
+        except (TypeError, ValueError):
+            raise Http404("Doce não encontrado")
+
+    def relacionados(self, doce, limite):
+        doces, _ = self.cliente.listar(categoria_id=doce.categoria_id, limite=limite + 1)
+        return [relacionado for relacionado in doces if relacionado.id != doce.id][:limite]
+
+    def doces_por_id(self, ids):
+        return self.cliente.obter_muitos(ids)
+
+
+def catalogo_loja():
+    if settings.CATALOGO_BACKEND == 'api':
+        from confeitaria.catalogo_api import cliente_catalogo
+
+        return CatalogoApi(cliente_catalogo())
+    return CatalogoLocal()
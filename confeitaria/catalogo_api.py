@@ -0,0 +1,219 @@
+"""
+Cliente HTTP do microserviço de catálogo usado pela loja Django
+(CATALOGO_BACKEND = "api").
+
+- Uma sessão requests por processo, com pool de conexões keep-alive e
+  retentativas para erros de conexão
+- Produtos guardados individualmente no cache do Django por
+  CATALOGO_API_CACHE_TTL segundos; os que faltam são buscados juntos em
+  POST /api/produtos/lote (até CATALOGO_API_LOTE_MAX ids por chamada)
+- Listagens e categorias também ficam no cache pelo mesmo TTL
+- invalidar_produto() é chamado pelo consumidor do feed de alterações do
+  catálogo (manage.py consumir_eventos_catalogo)
+- reservar()/liberar() debitam e devolvem estoque no checkout
+  (pedidos/services.py)
+"""
+import hashlib
+import json
+import threading
+
+import requests
+from django.conf import settings
+from django.core.cache import cache
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+PREFIXO_CACHE = "catalogo_api"
+
+
+class CatalogoIndisponivel(Exception):
+    pass
+
+
+class FotoCatalogo:
+    def __init__(self, url):
+        self.url = url
+
+    def __str__(self):
+        return self.url
+
+
+class CategoriaCatalogo:
+    def __init__(self, dados):
+        self.id = dados["id"]
+        self.nome = dados["nome"]
+
+    def __str__(self):
+        return self.nome
+
+
+class DoceCatalogo:
+    """Produto do catálogo com os mesmos atributos de Doce usados nos templates"""
+
+    def __init__(self, dados):
+        self.id = self.pk = dados["id"]
+        self.nome = dados["nome"]
+        self.descricao = dados.get("descricao") or ""
+        self.preco = dados["preco"]
+        # Estoque descontando as reservas de carrinhos, quando o catálogo informa
+        self.estoque = dados.get("estoque_disponivel", dados.get("estoque") or 0)
+        self.categoria_id = dados.get("categoria_id")
+        self.categoria = dados.get("categoria_nome") or ""
+        self.foto = FotoCatalogo(dados["foto_url"]) if dados.get("foto_url") else None
+        self.ativo = dados.get("ativo", True)
+
+    def __str__(self):
+        return f"{self.nome} - Estoque: {self.estoque}"
+
+
+class ClienteCatalogoApi:
+    def __init__(self, url_base, timeout=3.0, ttl_cache=30, lote_max=100, pool_maxsize=10, retries=2):
+        self.url_base = url_base.rstrip("/")
+        self.timeout = timeout
+        self.ttl_cache = ttl_cache
+        self.lote_max = lote_max
+
+        self.session = requests.Session()
+        adaptador = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=pool_maxsize,
+            max_retries=Retry(total=retries, connect=retries, read=0, backoff_factor=0.1, allowed_methods=None),
+        )
+        self.session.mount("http://", adaptador)
+        self.session.mount("https://", adaptador)
+
+    def _requisitar(self, metodo, caminho, **kwargs):
+        try:
+            response = self.session.request(metodo, f"{self.url_base}{caminho}", timeout=self.timeout, **kwargs)
+        except requests.RequestException as e:
+            raise CatalogoIndisponivel(str(e))
+        if response.status_code == 404:
+            return None
+        if response.status_code >= 500:
+            raise CatalogoIndisponivel(f"Catálogo respondeu {response.status_code}")
+        return response.json()
+
+    def _chave(self, *partes):
+        return ":".join([PREFIXO_CACHE, *[str(parte) for parte in partes]])
+
+    # Produtos
+
+    def obter_muitos(self, ids):
+        """{id: DoceCatalogo} dos ids encontrados: cache primeiro, depois lotes no catálogo"""
+        ids = list(dict.fromkeys(int(produto_id) for produto_id in ids))
+        chaves = {self._chave("produto", produto_id): produto_id for produto_id in ids}
+        encontrados = {chaves[chave]: dados for chave, dados in cache.get_many(list(chaves)).items()}
+
+        faltantes = [produto_id for produto_id in ids if produto_id not in encontrados]
+        for inicio in range(0, len(faltantes), self.lote_max):
+            lote = faltantes[inicio:inicio + self.lote_max]
+            resposta = self._requisitar("POST", "/api/produtos/lote", json={"ids": lote}) or {}
+            novos = {dados["id"]: dados for dados in resposta.get("data", [])}
+            cache.set_many(
+                {self._chave("produto", produto_id): dados for produto_id, dados in novos.items()},
+                self.ttl_cache,
+            )
+            encontrados.update(novos)
+
+        return {produto_id: DoceCatalogo(dados) for produto_id, dados in encontrados.items()}
+
+    def obter(self, produto_id, fresco=False):
+        """Um produto (None se não existir). fresco=True ignora o cache (checagem de estoque)"""
+        if not fresco:
+            return self.obter_muitos([produto_id]).get(int(produto_id))
+        resposta = self._requisitar("GET", f"/api/produtos/{int(produto_id)}")
+        if not resposta:
+            return None
+        cache.set(self._chave("produto", resposta["data"]["id"]), resposta["data"], self.ttl_cache)
+        return DoceCatalogo(resposta["data"])
+
+    def listar(self, **params):
+        """
+        GET /api/produtos com cache por combinação de parâmetros
+        Retorna ([DoceCatalogo], paginacao)
+        """
+        params = {nome: valor for nome, valor in params.items() if valor is not None}
+        assinatura = hashlib.md5(json.dumps(params, sort_keys=True).encode()).hexdigest()
+        chave = self._chave("listagem", self._geracao_listagens(), assinatura)
+        resposta = cache.get(chave)
+        if resposta is None:
+            resposta = self._requisitar("GET", "/api/produtos", params=params) or {"data": [], "paginacao": {}}
+            cache.set(chave, resposta, self.ttl_cache)
+            # Aproveita a listagem para aquecer o cache de produtos individuais
+            cache.set_many(
+                {self._chave("produto", dados["id"]): dados for dados in resposta["data"]},
+                self.ttl_cache,
+            )
+        return [DoceCatalogo(dados) for dados in resposta["data"]], resposta.get("paginacao", {})
+
+    def _geracao_listagens(self):
+        # Trocar a geração invalida de uma vez todas as listagens em cache
+        return cache.get_or_set(self._chave("geracao"), 0, None)
+
+    def invalidar_produto(self, produto_id=None):
+        """Remove o produto do cache e descarta as listagens em cache"""
+        if produto_id is not None:
+            cache.delete(self._chave("produto", produto_id))
+        try:
+            cache.incr(self._chave("geracao"))
+        except ValueError:
+            cache.set(self._chave("geracao"), 1, None)
+
+    # Estoque (checkout)
+
+    def reservar(self, quantidades):
+        """
+        Debita o estoque de {produto_id: quantidade} em uma única transação
+        do catálogo (tudo ou nada). Retorna os ids recusados (vazio = reservado)
+        """
+        itens = [{"produto_id": produto_id, "quantidade": quantidade} for produto_id, quantidade in quantidades.items()]
+        resposta = self._requisitar("POST", "/api/produtos/reservar", json={"itens": itens}) or {}
+        for produto_id in quantidades:
+            cache.delete(self._chave("produto", produto_id))
+        if resposta.get("success"):
+            return []
+        return resposta.get("produtos_indisponiveis") or list(quantidades)
+
+    def liberar(self, quantidades):
+        """Devolve ao estoque uma reserva feita com reservar() (compensação)"""
+        itens = [{"produto_id": produto_id, "quantidade": quantidade} for produto_id, quantidade in quantidades.items()]
+        self._requisitar("POST", "/api/produtos/liberar", json={"itens": itens})
+        for produto_id in quantidades:
+            cache.delete(self._chave("produto", produto_id))
+
+    # Categorias
+
+    def categorias(self):
+        chave = self._chave("categorias")
+        dados = cache.get(chave)
+        if dados is None:
+            dados = (self._requisitar("GET", "/api/categorias") or {}).get("data", [])
+            cache.set(chave, dados, self.ttl_cache)
+        return [CategoriaCatalogo(categoria) for categoria in dados]
+
+    # Cursores das páginas (a API pagina por cursor, a loja por número)
+
+    def cursor_pagina(self, filtro, numero):
+        return cache.get(self._chave("cursor", filtro, numero))
+
+    def salvar_cursor_pagina(self, filtro, numero, cursor):
+        cache.set(self._chave("cursor", filtro, numero), cursor, self.ttl_cache)
+
+
+_cliente = None
+_lock = threading.Lock()
+
+
+def cliente_catalogo():
+    # Um cliente (e um pool de conexões) por processo
+    global _cliente
+    with _lock:
+        if _cliente is None:
+            _cliente = ClienteCatalogoApi(
+                settings.CATALOGO_API_URL,
+                timeout=settings.CATALOGO_API_TIMEOUT,
+                ttl_cache=settings.CATALOGO_API_CACHE_TTL,
+                lote_max=settings.CATALOGO_API_LOTE_MAX,
+                pool_maxsize=settings.CATALOGO_API_POOL_MAXSIZE,
+            )
+        return _cliente
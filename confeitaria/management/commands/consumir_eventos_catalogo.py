@@ -0,0 +1,46 @@
+import json
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from confeitaria.catalogo_api import cliente_catalogo
+
+STREAM_EVENTOS = "catalogo:eventos"
+
+
+class Command(BaseCommand):
+    help = (
+        "Consome o feed de alterações do microserviço de catálogo (Redis Stream) e "
+        "invalida o cache da loja (CATALOGO_BACKEND=api). Use com um cache "
+        "compartilhado (DJANGO_CACHE_REDIS_URL) para valer para todos os workers."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--desde", default="$", help="Id inicial no stream ($ = só eventos novos, 0 = todos)")
+        parser.add_argument("--bloqueio-ms", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        import redis
+
+        redis_client = redis.Redis.from_url(settings.CATALOGO_EVENTOS_REDIS_URL, decode_responses=True)
+        cliente = cliente_catalogo()
+        ultimo_id = options["desde"]
+        self.stdout.write(f"Consumindo {STREAM_EVENTOS} a partir de {ultimo_id}")
+
+        while True:
+            try:
+                resposta = redis_client.xread({STREAM_EVENTOS: ultimo_id}, count=100, block=options["bloqueio_ms"])
+            except redis.RedisError as e:
+                self.stderr.write(f"Erro ao ler eventos do catálogo: {e}")
+                time.sleep(1)
+                continue
+
+            for _, mensagens in resposta or []:
+                for mensagem_id, campos in mensagens:
+                    ultimo_id = mensagem_id
+                    produto_id = int(campos["produto_id"]) if campos.get("produto_id") else None
+                    cliente.invalidar_produto(produto_id)
+                    if options["verbosity"] > 1:
+                        dados = json.loads(campos.get("dados") or "{}")
+                        self.stdout.write(f"{campos.get('tipo')} produto={produto_id} {dados}")
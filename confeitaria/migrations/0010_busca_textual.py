@@ -0,0 +1,54 @@
+from django.db import migrations
+
+# Busca textual no PostgreSQL: tsvector em português sem acentos (GIN)
+# e trigramas no nome. Em outros bancos a busca usa índice em memória.
+CRIAR_BUSCA = [
+    "CREATE EXTENSION IF NOT EXISTS unaccent",
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    # unaccent() não é IMMUTABLE e não pode ser usado em índices/colunas geradas
+    """
+    CREATE OR REPLACE FUNCTION f_unaccent(text) RETURNS text AS
+    $$ SELECT public.unaccent('public.unaccent', $1) $$
+    LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT
+    """,
+    """
+    ALTER TABLE confeitaria_doce ADD COLUMN IF NOT EXISTS busca_vetor tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('portuguese', f_unaccent(coalesce(nome, ''))), 'A') ||
+        setweight(to_tsvector('portuguese', f_unaccent(coalesce(descricao, ''))), 'B')
+    ) STORED
+    """,
+    "CREATE INDEX IF NOT EXISTS confeitaria_doce_busca_vetor_idx ON confeitaria_doce USING GIN (busca_vetor)",
+    "CREATE INDEX IF NOT EXISTS confeitaria_doce_nome_trgm_idx ON confeitaria_doce USING GIN (f_unaccent(lower(nome)) gin_trgm_ops)",
+]
+
+REMOVER_BUSCA = [
+    "DROP INDEX IF EXISTS confeitaria_doce_nome_trgm_idx",
+    "DROP INDEX IF EXISTS confeitaria_doce_busca_vetor_idx",
+    "ALTER TABLE confeitaria_doce DROP COLUMN IF EXISTS busca_vetor",
+]
+
+
+def criar_busca(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for sql in CRIAR_BUSCA:
+        schema_editor.execute(sql)
+
+
+def remover_busca(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for sql in REMOVER_BUSCA:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('confeitaria', '0009_rename_categorias_categoria'),
+    ]
+
+    operations = [
+        migrations.RunPython(criar_busca, remover_busca),
+    ]
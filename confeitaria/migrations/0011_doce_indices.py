@@ -0,0 +1,19 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('confeitaria', '0010_busca_textual'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='doce',
+            index=models.Index(fields=['preco', 'id'], name='doce_preco_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='doce',
+            index=models.Index(fields=['categoria', 'id'], name='doce_categoria_id_idx'),
+        ),
+    ]
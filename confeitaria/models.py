@@ -19,6 +19,14 @@ class Doce(models.Model):
     foto = models.ImageField(upload_to="fotos/%Y/%m/%d/", blank=True)
     estoque = models.PositiveIntegerField(default=0)  # Novo campo para controle de estoque
 
+    class Meta:
+        indexes = [
+            # doces_baratos (preco__lt) e ordenação por preço
+            models.Index(fields=["preco", "id"], name="doce_preco_idx"),
+            # home filtrada por categoria, paginada por id
+            models.Index(fields=["categoria", "id"], name="doce_categoria_id_idx"),
+        ]
+
     def __str__(self):
         return f"{self.nome} - Estoque: {self.estoque}"
 
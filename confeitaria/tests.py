@@ -1,3 +1,203 @@
-from django.test import TestCase
+from unittest import skipUnless
+from unittest.mock import patch
 
-# Create your tests here.
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from confeitaria.busca import buscar_doces, indice_memoria
+from confeitaria.catalogo_api import ClienteCatalogoApi
+from confeitaria.models import Categoria, Doce
+
+
+class ConsultasPorPaginaTest(TestCase):
+    """O número de consultas das páginas não pode crescer com o catálogo"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.bolos = Categoria.objects.create(nome="Bolos")
+        cls.tortas = Categoria.objects.create(nome="Tortas")
+        cls.doces = [
+            Doce.objects.create(
+                nome=f"Doce {i}",
+                descricao="Doce de teste",
+                categoria=cls.bolos if i % 2 else cls.tortas,
+                preco=10.0 + i,
+                estoque=10
+            )
+            for i in range(12)
+        ]
+
+    def test_index_numero_constante_de_consultas(self):
+        # contagem da paginação, página de doces, doces_baratos e categorias
+        with self.assertNumQueries(4):
+            self.client.get(reverse('index'))
+
+    def test_index_por_categoria_numero_constante_de_consultas(self):
+        # categoria selecionada, contagem, página de doces, doces_baratos e categorias
+        with self.assertNumQueries(5):
+            self.client.get(reverse('index'), {'categoria': 'Bolos'})
+
+    def test_index_paginado(self):
+        Doce.objects.create(nome="Doce extra", descricao="Doce de teste", categoria=self.bolos, preco=30.0)
+        response = self.client.get(reverse('index'), {'pagina': 2})
+        self.assertEqual(response.context['pagina'].number, 2)
+        self.assertEqual(len(response.context['doces']), 1)
+
+    def test_busca_numero_constante_de_consultas(self):
+        if connection.vendor != 'postgresql':
+            # Fora do PostgreSQL o índice em memória é montado (uma consulta) na primeira busca
+            indice_memoria.invalidar()
+            indice_memoria.buscar('')
+        with self.assertNumQueries(1):
+            self.client.post(reverse('busca'), {'busca': 'Doce'})
+
+    def test_detalhes_numero_constante_de_consultas(self):
+        # doce com categoria e doces relacionados
+        with self.assertNumQueries(2):
+            self.client.get(reverse('produtos', args=[self.doces[0].id]))
+
+    def test_carrinho_numero_constante_de_consultas(self):
+        for doce in self.doces[:5]:
+            self.client.post(reverse('carrinho'), {'tipo': 'adicionar', 'doce_id': doce.id, 'quantidade': 1})
+
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('carrinho'))
+        self.assertEqual(len(response.context['itens']), 5)
+
+
+class BuscaDocesTest(TestCase):
+    """Busca sem acentos, com plurais e com o nome valendo mais que a descrição"""
+
+    @classmethod
+    def setUpTestData(cls):
+        categoria = Categoria.objects.create(nome="Bolos")
+        cls.torta = Doce.objects.create(
+            nome="Torta de limão", descricao="Massa crocante", categoria=categoria, preco=30.0
+        )
+        cls.bolo = Doce.objects.create(
+            nome="Bolo de fubá", descricao="Cobertura de limão", categoria=categoria, preco=25.0
+        )
+        cls.brigadeiro = Doce.objects.create(
+            nome="Brigadeiro", descricao="Chocolate belga", categoria=categoria, preco=3.0
+        )
+
+    def setUp(self):
+        # O índice em memória pode guardar doces de outros testes
+        indice_memoria.invalidar()
+
+    def test_ignora_acentos(self):
+        self.assertEqual(list(buscar_doces("fuba")), [self.bolo])
+        self.assertEqual(list(buscar_doces("LIMÃO")), [self.torta, self.bolo])
+
+    def test_encontra_plural(self):
+        self.assertEqual(list(buscar_doces("brigadeiros")), [self.brigadeiro])
+        self.assertEqual(list(buscar_doces("tortas de limão")), [self.torta])
+
+    def test_nome_antes_da_descricao(self):
+        resultado = list(buscar_doces("limao"))
+        self.assertEqual(resultado, [self.torta, self.bolo])
+        self.assertGreater(resultado[0].relevancia, resultado[1].relevancia)
+
+    def test_todos_os_termos_precisam_casar(self):
+        self.assertEqual(list(buscar_doces("bolo chocolate")), [])
+        self.assertEqual(list(buscar_doces("")), [])
+
+
+@override_settings(CARRINHO_REDIS_URL="")
+class CarrinhoSessaoTest(TestCase):
+    """Sem Redis, o carrinho fica na sessão do servidor"""
+
+    @classmethod
+    def setUpTestData(cls):
+        categoria = Categoria.objects.create(nome="Bolos")
+        cls.doce = Doce.objects.create(
+            nome="Bolo", descricao="Doce de teste", categoria=categoria, preco=10.0, estoque=3
+        )
+
+    def adicionar(self, quantidade):
+        return self.client.post(reverse('carrinho'), {'tipo': 'adicionar', 'doce_id': self.doce.id, 'quantidade': quantidade})
+
+    def test_adicionar_soma_quantidade_ate_o_estoque(self):
+        self.adicionar(2)
+        self.adicionar(2)
+        self.assertEqual(self.client.session['Carrinho'], [{'doce_id': self.doce.id, 'quantidade': 2}])
+
+    def test_remover_item(self):
+        self.adicionar(1)
+        self.client.post(reverse('carrinho'), {'tipo': 'remover', 'doce_id': self.doce.id})
+        self.assertEqual(self.client.session['Carrinho'], [])
+
+
+
+def produto_catalogo(produto_id):
+    return {
+        'id': produto_id, 'nome': f'Doce {produto_id}', 'descricao': 'Doce de teste', 'preco': 10.0 + produto_id,
+        'estoque': 5, 'estoque_disponivel': 5, 'categoria_id': 1, 'categoria_nome': 'Bolos', 'foto_url': None
+    }
+
+
+def resposta_catalogo(metodo, caminho, **kwargs):
+    if caminho == '/api/categorias':
+        return {'data': [{'id': 1, 'nome': 'Bolos'}]}
+    if caminho == '/api/produtos/lote':
+        return {'data': [produto_catalogo(produto_id) for produto_id in kwargs['json']['ids']]}
+    if caminho.startswith('/api/produtos/'):
+        return {'data': produto_catalogo(int(caminho.rsplit('/', 1)[1]))}
+    return {'data': [produto_catalogo(1), produto_catalogo(2)], 'paginacao': {'tem_mais': False, 'total_geral': 2}}
+
+
+@override_settings(CATALOGO_BACKEND='api', CARRINHO_REDIS_URL='')
+class CatalogoApiTest(TestCase):
+    """Com CATALOGO_BACKEND=api as páginas não consultam o catálogo no banco do Django"""
+
+    def setUp(self):
+        cache.clear()
+        patcher = patch.object(ClienteCatalogoApi, '_requisitar', side_effect=resposta_catalogo)
+        self.requisitar = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_index_sem_consultas_ao_banco(self):
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('index'))
+        self.assertEqual([doce.id for doce in response.context['doces']], [1, 2])
+
+    def test_carrinho_busca_produtos_em_lote_e_usa_cache(self):
+        for produto_id in (1, 2, 3):
+            self.client.post(reverse('carrinho'), {'tipo': 'adicionar', 'doce_id': produto_id, 'quantidade': 1})
+        cache.clear()
+        self.requisitar.reset_mock()
+
+        self.client.get(reverse('carrinho'))
+        response = self.client.get(reverse('carrinho'))
+        self.assertEqual(len(response.context['itens']), 3)
+        # Uma chamada em lote na primeira exibição; a segunda vem do cache
+        self.assertEqual(self.requisitar.call_count, 1)
+
+    def test_evento_do_catalogo_invalida_listagens(self):
+        cliente = ClienteCatalogoApi('http://catalogo')
+        cliente.listar(limite=12)
+        cliente.listar(limite=12)
+        self.assertEqual(self.requisitar.call_count, 1)
+
+        cliente.invalidar_produto(1)
+        cliente.listar(limite=12)
+        self.assertEqual(self.requisitar.call_count, 2)
+
+
+@skipUnless(connection.vendor == "postgresql", "EXPLAIN verificado apenas no PostgreSQL")
+class IndicesDocesTest(TestCase):
+    """As consultas principais da loja precisam poder usar os índices"""
+
+    def plano(self, queryset):
+        # Com poucas linhas o planejador prefere seq scan; desliga para ver se o índice serve
+        with connection.cursor() as cursor:
+            cursor.execute("SET LOCAL enable_seqscan = off")
+        return queryset.explain()
+
+    def test_doces_baratos_usa_indice_de_preco(self):
+        self.assertIn("doce_preco_idx", self.plano(Doce.objects.filter(preco__lt=20.0).order_by("preco", "id")))
+
+    def test_doces_por_categoria_usa_indice_de_categoria(self):
+        categoria = Categoria.objects.create(nome="Bolos")
+        self.assertIn("doce_categoria_id_idx", self.plano(Doce.objects.filter(categoria=categoria).order_by("id")))
@@ -1,33 +1,40 @@
-from django.shortcuts import render, redirect, get_object_or_404
+from django.shortcuts import render, redirect
 from django.contrib import messages
-from confeitaria.models import Doce, Categoria
+from django.http import Http404
+from confeitaria.carrinho import carrinho_da_requisicao
+from confeitaria.catalogo import catalogo_loja
 
-from django.shortcuts import render, get_object_or_404
-from confeitaria.models import Doce, Categoria  # Corrigido para Categoria
+# Quantidade de doces exibidos por página na home
+DOCES_POR_PAGINA = 12
 
 # Em views.py
 # Em views.py
 def index(request):
-    # Obter doces abaixo de 20 reais
-    doces_baratos = Doce.objects.filter(preco__lt=20.0)
+    # Banco local ou microserviço de catálogo, conforme CATALOGO_BACKEND
+    catalogo = catalogo_loja()
+
+    # Obter doces abaixo de 20 reais (limitados ao tamanho de uma página)
+    doces_baratos = catalogo.doces_baratos(DOCES_POR_PAGINA)
 
     # Obter a categoria da URL ou definir "TODOS" como padrão
     categoria_slug = request.GET.get('categoria', 'TODOS')
 
-    if categoria_slug == 'TODOS':
-        doces = Doce.objects.all()  # Removemos o limite de 10
-    else:
-        categoria = get_object_or_404(Categoria, nome=categoria_slug)
-        doces = Doce.objects.filter(categoria=categoria)  # Filtro sem limite
+    categoria = None
+    if categoria_slug != 'TODOS':
+        categoria = catalogo.categoria_por_nome(categoria_slug)
+
+    # Paginação: apenas uma página de doces é carregada por requisição
+    pagina = catalogo.pagina_doces(categoria, request.GET.get('pagina'), DOCES_POR_PAGINA)
 
     # Carregar todas as categorias, incluindo a opção "TODOS"
-    categorias = Categoria.objects.all()
+    categorias = catalogo.categorias()
     
     # Incluindo "TODOS" como a primeira opção
     categorias_com_todos = [None] + list(categorias)  # None representa a opção "TODOS"
 
     return render(request, "confeitaria/index.html", {
-        "doces": doces,
+        "doces": pagina.object_list,
+        "pagina": pagina,
         "doces_baratos": doces_baratos,
         "categorias": categorias_com_todos,  # Passando a lista de categorias com "TODOS"
         "categoria_selecionada": categoria_slug
@@ -40,18 +47,22 @@ def busca(request):
         return redirect('index')
     
     query = request.POST['busca']
-    doces = Doce.objects.filter(nome__icontains=query)
+    doces = catalogo_loja().buscar(query)
     return render(request, 'confeitaria/busca.html', {"doces": doces, "busca": query})
 
 def detalhes_doce(request, doce_id):
-    doce = get_object_or_404(Doce, pk=doce_id)
-    doces_relacionados = Doce.objects.filter(categoria=doce.categoria)[:10]
+    catalogo = catalogo_loja()
+    doce = catalogo.obter_doce(doce_id)
+    doces_relacionados = catalogo.relacionados(doce, 10)
     return render(request, 'confeitaria/detalhes.html', {
         "doce": doce,
-        "doces_relacionados": [d for d in doces_relacionados if d.id != doce_id]
+        "doces_relacionados": doces_relacionados
     })
 
 def carrinho(request):
+    carrinho_atual = carrinho_da_requisicao(request)
+    catalogo = catalogo_loja()
+
     if request.method == 'POST':
         tipo = request.POST.get('tipo')
         doce_id = request.POST.get('doce_id')
@@ -59,55 +70,41 @@ def carrinho(request):
 
         if tipo == 'limpar':
             # Limpa o carrinho e redireciona sem tentar acessar itens
-            request.session['Carrinho'] = []
+            carrinho_atual.limpar()
             messages.success(request, "Carrinho limpo com sucesso!")
             return redirect('carrinho')  # Redireciona para evitar erros de referência a itens inexistentes
 
         # Obtenha o objeto Doce para verificar o estoque
-        doce = get_object_or_404(Doce, pk=doce_id)
+        doce = catalogo.doce_para_estoque(doce_id)
 
         if tipo == 'adicionar':
-            # Adiciona ou atualiza o carrinho
-            if 'Carrinho' not in request.session:
-                request.session['Carrinho'] = []
-
-            carrinho = request.session['Carrinho']
-            item_existente = next((item for item in carrinho if item['doce_id'] == doce_id), None)
-
             # Verificar se a quantidade no carrinho não ultrapassa o estoque
-            if item_existente:
-                nova_quantidade = item_existente['quantidade'] + quantidade
-                if nova_quantidade > doce.estoque:
-                    messages.error(request, f"Estoque insuficiente para {doce.nome}. Estoque disponível: {doce.estoque}.")
-                    return redirect('carrinho')
-                item_existente['quantidade'] = nova_quantidade
-            else:
-                if quantidade > doce.estoque:
-                    messages.error(request, f"Estoque insuficiente para {doce.nome}. Estoque disponível: {doce.estoque}.")
-                    return redirect('carrinho')
-                carrinho.append({'doce_id': doce_id, 'quantidade': quantidade})
-
-            request.session['Carrinho'] = carrinho
+            nova_quantidade = carrinho_atual.quantidade(doce.id) + quantidade
+            if nova_quantidade > doce.estoque:
+                messages.error(request, f"Estoque insuficiente para {doce.nome}. Estoque disponível: {doce.estoque}.")
+                return redirect('carrinho')
+
+            # Adiciona ou atualiza o item no carrinho
+            carrinho_atual.adicionar(doce.id, quantidade)
             messages.success(request, "Doce adicionado ao carrinho com sucesso!")
 
         elif tipo == 'remover':
-            itens = request.session.get('Carrinho', [])
-            for item in itens:
-                if item['doce_id'] == doce_id:
-                    itens.remove(item)
-                    break
-            request.session['Carrinho'] = itens
+            carrinho_atual.remover(doce.id)
             messages.success(request, "Doce removido do carrinho com sucesso!")
 
         return redirect('carrinho')  # Redireciona para atualizar a página do carrinho
 
     # Código GET para exibir o carrinho
     elif request.method == 'GET':
-        itens = request.session.get('Carrinho', [])
+        itens = carrinho_atual.itens()
+        # Carrega todos os doces do carrinho com uma única consulta
+        doces_por_id = catalogo.doces_por_id([item['doce_id'] for item in itens])
         doces = []
         valor_total = 0
         for item in itens:
-            doce = get_object_or_404(Doce, pk=item['doce_id'])
+            doce = doces_por_id.get(item['doce_id'])
+            if doce is None:
+                raise Http404("Doce não encontrado")
             total_item = doce.preco * item['quantidade']
             doces.append({'doce': doce, 'quantidade': item['quantidade'], 'total_item': total_item})
             valor_total += total_item
@@ -4,37 +4,90 @@ Responsável por gerenciar sessões de usuários e itens do carrinho
 """
 from flask import Flask, jsonify, request
 from flask_cors import CORS
-import redis
-import json
 import os
-import requests
 from datetime import datetime, timedelta
 import uuid
 
+from cache_produtos import CacheProdutos
+from carrinho_redis import RepositorioCarrinho
+from conexao_redis import configuracao, criar_cliente_redis, modo_cluster, status_pool
+from eventos_catalogo import ConsumidorEventosCatalogo, invalidar_cache_produtos as invalidador_eventos
+from idempotencia import RespostasIdempotentes
+from reservas import ReservaRecusada, ReservasEstoque
+from cliente_catalogo import ClienteCatalogo, CatalogoIndisponivel
+
 app = Flask(__name__)
 CORS(app)
 
-# Configurações Redis
-REDIS_HOST = os.getenv('REDIS_HOST', 'localhost')
-REDIS_PORT = int(os.getenv('REDIS_PORT', 6379))
-REDIS_DB = int(os.getenv('REDIS_DB', 0))
-REDIS_PASSWORD = os.getenv('REDIS_PASSWORD', None)
-
 # URL do serviço de catálogo
 CATALOGO_URL = os.getenv('CATALOGO_URL', 'http://localhost:5001')
 
-# Conexão Redis
-redis_client = redis.Redis(
-    host=REDIS_HOST,
-    port=REDIS_PORT,
-    db=REDIS_DB,
-    password=REDIS_PASSWORD,
-    decode_responses=True
+# Máximo de ids por chamada ao endpoint de lote do catálogo
+CATALOGO_LOTE_MAX_IDS = int(os.getenv('CATALOGO_LOTE_MAX_IDS', 100))
+
+# Cliente HTTP do catálogo: sessão com pool keep-alive e circuit breaker.
+# Cada worker do gunicorn importa o módulo e tem seu próprio cliente.
+catalogo_client = ClienteCatalogo(
+    CATALOGO_URL,
+    connect_timeout=float(os.getenv('CATALOGO_CONNECT_TIMEOUT', 1.0)),
+    read_timeout=float(os.getenv('CATALOGO_READ_TIMEOUT', 3.0)),
+    retries=int(os.getenv('CATALOGO_RETRIES', 2)),
+    backoff=float(os.getenv('CATALOGO_BACKOFF', 0.1)),
+    pool_maxsize=int(os.getenv('CATALOGO_POOL_MAXSIZE', 20)),
+    limite_falhas=int(os.getenv('CATALOGO_CB_LIMITE_FALHAS', 5)),
+    tempo_reset=int(os.getenv('CATALOGO_CB_TEMPO_RESET', 30))
 )
 
+# Conexão Redis: pool bloqueante dimensionado (REDIS_POOL_*), timeouts de
+# socket e, opcionalmente, Sentinel ou Cluster (REDIS_MODO)
+redis_client = criar_cliente_redis()
+
 # Tempo de expiração do carrinho (24 horas)
 CARRINHO_TTL = 86400
 
+# Carrinhos guardados como hash no Redis, alterados por scripts Lua atômicos
+carrinhos = RepositorioCarrinho(redis_client, CARRINHO_TTL, transacional=not modo_cluster(redis_client))
+
+# Reservas temporárias de estoque para os itens dos carrinhos. Expiram antes
+# do carrinho e são recuperadas por um varredor em segundo plano.
+RESERVA_TTL = int(os.getenv('RESERVA_TTL', min(900, CARRINHO_TTL)))
+RESERVA_VARREDURA_INTERVALO = float(os.getenv('RESERVA_VARREDURA_INTERVALO', 30))
+reservas = ReservasEstoque(redis_client, RESERVA_TTL)
+# No modo ASGI o varredor roda como tarefa do app_async.py
+if os.getenv('RESERVA_VARREDOR', 'True') == 'True' and os.getenv('MODO_ASGI', 'False') != 'True':
+    reservas.iniciar_varredor(RESERVA_VARREDURA_INTERVALO)
+
+# Respostas das escritas com Idempotency-Key, guardadas no Redis por
+# IDEMPOTENCIA_TTL segundos (retentativas não duplicam itens)
+IDEMPOTENCIA_TTL = int(os.getenv('IDEMPOTENCIA_TTL', 86400))
+IDEMPOTENCIA_TTL_PROCESSAMENTO = int(os.getenv('IDEMPOTENCIA_TTL_PROCESSAMENTO', 60))
+idempotencia = RespostasIdempotentes(redis_client, IDEMPOTENCIA_TTL, IDEMPOTENCIA_TTL_PROCESSAMENTO)
+
+# Cache local de produtos (LRU + TTL), opcionalmente compartilhado via Redis
+cache_produtos = CacheProdutos(
+    max_itens=int(os.getenv('CACHE_PRODUTOS_MAX_ITENS', 1000)),
+    ttl_estatico=int(os.getenv('CACHE_PRODUTOS_TTL_ESTATICO', 300)),
+    ttl_estoque=int(os.getenv('CACHE_PRODUTOS_TTL_ESTOQUE', 5)),
+    redis_client=redis_client if os.getenv('CACHE_PRODUTOS_REDIS', 'False') == 'True' else None
+)
+
+
+def criar_consumidor_eventos(cache):
+    """
+    Consumidor do feed de alterações do catálogo que invalida `cache` a cada
+    mudança de preço ou estoque (permite TTLs longos no cache de produtos)
+    """
+    # Conexão própria: o XREAD bloqueia por mais tempo que o socket_timeout do pool
+    cliente = criar_cliente_redis({**configuracao(), 'socket_timeout': 10.0, 'max_conexoes': 2})
+    return ConsumidorEventosCatalogo(cliente, invalidador_eventos(cache))
+
+
+EVENTOS_CATALOGO = os.getenv('EVENTOS_CATALOGO', 'True') == 'True'
+consumidor_eventos = None
+if EVENTOS_CATALOGO and os.getenv('MODO_ASGI', 'False') != 'True':
+    consumidor_eventos = criar_consumidor_eventos(cache_produtos)
+    consumidor_eventos.iniciar()
+
 
 # ======================
 # FUNÇÕES AUXILIARES
@@ -45,57 +98,113 @@ def gerar_session_id():
     return str(uuid.uuid4())
 
 
-def validar_produto_catalogo(produto_id, quantidade):
-    """Valida disponibilidade do produto no serviço de catálogo"""
-    try:
-        response = requests.get(
-            f'{CATALOGO_URL}/api/produtos/{produto_id}/estoque',
-            params={'quantidade': quantidade},
-            timeout=5
-        )
-        
-        if response.status_code == 200:
-            data = response.json()
-            return data.get('data', {}).get('disponivel', False)
-        return False
-    except Exception as e:
-        print(f"Erro ao validar produto: {e}")
-        return False
+def linha_validacao(produto_id, quantidade, produto):
+    """Disponibilidade de uma linha no formato de /api/produtos/validar"""
+    estoque = produto.get('estoque', 0) if produto else None
+    if produto is None:
+        motivo = 'nao_encontrado'
+    elif not produto.get('ativo', True):
+        motivo = 'inativo'
+    elif estoque < quantidade:
+        motivo = 'estoque_insuficiente'
+    else:
+        motivo = None
+    return {
+        'produto_id': produto_id,
+        'quantidade_solicitada': quantidade,
+        'estoque_atual': estoque,
+        'disponivel': motivo is None,
+        'motivo': motivo
+    }
+
+
+def validar_linhas_catalogo(linhas, session_id=None):
+    """
+    Valida a quantidade final de cada produto ({produto_id: quantidade})
+    de uma vez: produtos com estoque ainda fresco no cache são conferidos
+    localmente e os demais em chamadas a /api/produtos/validar (lotes de
+    até CATALOGO_LOTE_MAX_IDS). Com o catálogo fora ou respondendo com
+    erro, usa os dados expirados do cache. As reservas de
+    outras sessões são conferidas depois, pelo script de reserva.
+    Retorna {produto_id: linha}
+    """
+    produtos, faltantes = cache_produtos.obter_muitos(list(linhas), exigir_estoque=True)
+    resultado = {
+        produto_id: linha_validacao(produto_id, linhas[produto_id], produto)
+        for produto_id, produto in produtos.items()
+    }
+
+    if faltantes:
+        try:
+            for inicio in range(0, len(faltantes), CATALOGO_LOTE_MAX_IDS):
+                lote = faltantes[inicio:inicio + CATALOGO_LOTE_MAX_IDS]
+                response = catalogo_client.post('/api/produtos/validar', json={
+                    'itens': [{'produto_id': pid, 'quantidade': linhas[pid]} for pid in lote],
+                    'session_id': session_id
+                })
+                if response.status_code != 200:
+                    # Resposta recusada (ex.: 400): não é "produto não encontrado"
+                    raise CatalogoIndisponivel(f'Catálogo respondeu {response.status_code} ao validar')
+                for linha in response.json()['data']['itens']:
+                    resultado[linha['produto_id']] = linha
+        except CatalogoIndisponivel as e:
+            print(f"Catálogo indisponível, validando com cache expirado: {e}")
+            expirados, _ = cache_produtos.obter_muitos(faltantes, permitir_expirado=True)
+            for produto_id, produto in expirados.items():
+                resultado[produto_id] = linha_validacao(produto_id, linhas[produto_id], produto)
+
+    for produto_id in faltantes:
+        if produto_id not in resultado:
+            resultado[produto_id] = linha_validacao(produto_id, linhas[produto_id], None)
+    return resultado
 
 
 def obter_detalhes_produto(produto_id):
     """Obtém detalhes do produto do serviço de catálogo"""
-    try:
-        response = requests.get(
-            f'{CATALOGO_URL}/api/produtos/{produto_id}',
-            timeout=5
+    return obter_detalhes_produtos([produto_id]).get(produto_id)
+
+
+def buscar_produtos_catalogo(produto_ids):
+    """
+    Busca produtos no catálogo com chamadas em lote
+    Lança CatalogoIndisponivel se o catálogo estiver fora
+    """
+    produtos = []
+    for inicio in range(0, len(produto_ids), CATALOGO_LOTE_MAX_IDS):
+        lote = produto_ids[inicio:inicio + CATALOGO_LOTE_MAX_IDS]
+        response = catalogo_client.get(
+            '/api/produtos/lote',
+            params={'ids': ','.join(str(pid) for pid in lote)}
         )
-        
+
         if response.status_code == 200:
-            data = response.json()
-            return data.get('data')
-        return None
-    except Exception as e:
-        print(f"Erro ao obter produto: {e}")
-        return None
+            produtos.extend(response.json().get('data', []))
+    return produtos
 
 
-def get_carrinho(session_id):
-    """Obtém carrinho do Redis"""
-    carrinho_json = redis_client.get(f'carrinho:{session_id}')
-    if carrinho_json:
-        return json.loads(carrinho_json)
-    return {'itens': [], 'criado_em': datetime.utcnow().isoformat()}
+def obter_detalhes_produtos(produto_ids, exigir_estoque=False):
+    """
+    Obtém detalhes de vários produtos, consultando o cache local antes
+    do catálogo. Se o catálogo estiver indisponível, serve os dados
+    expirados que ainda estiverem no cache.
+    Retorna um dicionário {produto_id: produto}
+    """
+    ids = list(dict.fromkeys(produto_ids))
+    produtos, faltantes = cache_produtos.obter_muitos(ids, exigir_estoque=exigir_estoque)
 
+    if faltantes:
+        try:
+            novos = buscar_produtos_catalogo(faltantes)
+        except CatalogoIndisponivel as e:
+            print(f"Catálogo indisponível, usando cache expirado: {e}")
+            expirados, _ = cache_produtos.obter_muitos(faltantes, permitir_expirado=True)
+            produtos.update(expirados)
+            return produtos
 
-def salvar_carrinho(session_id, carrinho):
-    """Salva carrinho no Redis com TTL"""
-    carrinho['atualizado_em'] = datetime.utcnow().isoformat()
-    redis_client.setex(
-        f'carrinho:{session_id}',
-        CARRINHO_TTL,
-        json.dumps(carrinho)
-    )
+        cache_produtos.salvar_muitos(novos)
+        for produto in novos:
+            produtos[produto['id']] = produto
+    return produtos
 
 
 # ======================
@@ -107,12 +216,7 @@ def criar_sessao():
     """Cria uma nova sessão de carrinho"""
     try:
         session_id = gerar_session_id()
-        carrinho = {
-            'itens': [],
-            'criado_em': datetime.utcnow().isoformat(),
-            'atualizado_em': datetime.utcnow().isoformat()
-        }
-        salvar_carrinho(session_id, carrinho)
+        carrinhos.criar(session_id)
         
         return jsonify({
             'success': True,
@@ -129,14 +233,17 @@ def criar_sessao():
 def obter_carrinho(session_id):
     """Obtém carrinho de uma sessão"""
     try:
-        carrinho = get_carrinho(session_id)
+        carrinho = carrinhos.obter(session_id)
         
-        # Enriquece itens com dados do catálogo
+        # Enriquece itens com dados do catálogo (uma única chamada em lote)
         itens_enriquecidos = []
         valor_total = 0
-        
+        produtos = obter_detalhes_produtos(
+            [item['produto_id'] for item in carrinho['itens']]
+        )
+
         for item in carrinho['itens']:
-            produto = obter_detalhes_produto(item['produto_id'])
+            produto = produtos.get(item['produto_id'])
             if produto:
                 item_enriquecido = {
                     **item,
@@ -162,10 +269,12 @@ def obter_carrinho(session_id):
 
 
 @app.route('/api/carrinho/<session_id>/adicionar', methods=['POST'])
+@idempotencia.idempotente
 def adicionar_item(session_id):
     """
     Adiciona item ao carrinho
     Body: {"produto_id": int, "quantidade": int}
+    Header opcional: Idempotency-Key (repetições devolvem a primeira resposta)
     """
     try:
         data = request.get_json()
@@ -178,41 +287,44 @@ def adicionar_item(session_id):
                 'error': 'produto_id e quantidade são obrigatórios'
             }), 400
         
-        # Valida disponibilidade no catálogo
-        if not validar_produto_catalogo(produto_id, quantidade):
+        # Valida uma única vez a quantidade final (a que já está no
+        # carrinho somada à nova), calculada localmente
+        atual = carrinhos.quantidade(session_id, produto_id)
+        linha = validar_linhas_catalogo({produto_id: atual + quantidade}, session_id)[produto_id]
+        if not linha['disponivel']:
+            excede_total = (
+                atual > 0
+                and linha['motivo'] == 'estoque_insuficiente'
+                and linha['estoque_atual'] >= quantidade
+            )
             return jsonify({
                 'success': False,
-                'error': 'Produto indisponível ou estoque insuficiente'
+                'error': 'Quantidade total excede estoque disponível' if excede_total
+                         else 'Produto indisponível ou estoque insuficiente'
             }), 400
         
-        # Obtém carrinho atual
-        carrinho = get_carrinho(session_id)
-        
-        # Verifica se produto já está no carrinho
-        item_existente = None
-        for item in carrinho['itens']:
-            if item['produto_id'] == produto_id:
-                item_existente = item
-                break
-        
-        if item_existente:
-            # Atualiza quantidade
-            nova_quantidade = item_existente['quantidade'] + quantidade
-            if not validar_produto_catalogo(produto_id, nova_quantidade):
-                return jsonify({
-                    'success': False,
-                    'error': 'Quantidade total excede estoque disponível'
-                }), 400
-            item_existente['quantidade'] = nova_quantidade
-        else:
-            # Adiciona novo item
-            carrinho['itens'].append({
-                'produto_id': produto_id,
-                'quantidade': quantidade,
-                'adicionado_em': datetime.utcnow().isoformat()
-            })
+        # Reserva a quantidade final, descontando as reservas de outras sessões
+        try:
+            reservas.definir(session_id, produto_id, atual + quantidade, estoque=linha['estoque_atual'])
+        except ReservaRecusada as e:
+            return jsonify({
+                'success': False,
+                'error': 'Estoque reservado em outros carrinhos',
+                'disponivel': e.disponivel
+            }), 409
         
-        salvar_carrinho(session_id, carrinho)
+        # Soma ao item (ou cria) no Redis; o script recusa se a quantidade
+        # total passar do estoque, sem ler e regravar o carrinho inteiro
+        adicionado, carrinho = carrinhos.adicionar(
+            session_id, produto_id, quantidade, limite=linha['estoque_atual']
+        )
+        if not adicionado:
+            # O carrinho mudou em paralelo: a reserva volta ao que está nele
+            reservas.definir(session_id, produto_id, carrinhos.quantidade(session_id, produto_id))
+            return jsonify({
+                'success': False,
+                'error': 'Quantidade total excede estoque disponível'
+            }), 400
         
         return jsonify({
             'success': True,
@@ -227,15 +339,8 @@ def adicionar_item(session_id):
 def remover_item(session_id, produto_id):
     """Remove item do carrinho"""
     try:
-        carrinho = get_carrinho(session_id)
-        
-        # Remove item
-        carrinho['itens'] = [
-            item for item in carrinho['itens'] 
-            if item['produto_id'] != produto_id
-        ]
-        
-        salvar_carrinho(session_id, carrinho)
+        carrinho = carrinhos.remover(session_id, produto_id)
+        reservas.liberar(session_id, [produto_id])
         
         return jsonify({
             'success': True,
@@ -263,30 +368,30 @@ def atualizar_quantidade(session_id, produto_id):
             }), 400
         
         # Valida disponibilidade
-        if not validar_produto_catalogo(produto_id, quantidade):
+        linha = validar_linhas_catalogo({produto_id: quantidade}, session_id)[produto_id]
+        if not linha['disponivel']:
             return jsonify({
                 'success': False,
                 'error': 'Estoque insuficiente'
             }), 400
         
-        carrinho = get_carrinho(session_id)
-        
-        # Atualiza quantidade
-        item_encontrado = False
-        for item in carrinho['itens']:
-            if item['produto_id'] == produto_id:
-                item['quantidade'] = quantidade
-                item_encontrado = True
-                break
+        try:
+            reservas.definir(session_id, produto_id, quantidade, estoque=linha['estoque_atual'])
+        except ReservaRecusada as e:
+            return jsonify({
+                'success': False,
+                'error': 'Estoque reservado em outros carrinhos',
+                'disponivel': e.disponivel
+            }), 409
         
-        if not item_encontrado:
+        carrinho = carrinhos.atualizar(session_id, produto_id, quantidade)
+        if carrinho is None:
+            reservas.liberar(session_id, [produto_id])
             return jsonify({
                 'success': False,
                 'error': 'Item não encontrado no carrinho'
             }), 404
         
-        salvar_carrinho(session_id, carrinho)
-        
         return jsonify({
             'success': True,
             'message': 'Quantidade atualizada',
@@ -296,11 +401,51 @@ def atualizar_quantidade(session_id, produto_id):
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
+@app.route('/api/carrinho/<session_id>/validar', methods=['POST'])
+def validar_carrinho(session_id):
+    """
+    Valida a disponibilidade de todas as linhas do carrinho de uma vez
+    Body (opcional): {"itens": [{"produto_id": int, "quantidade": int}, ...]}
+    para validar um estado desejado em vez do carrinho salvo
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        itens = data.get('itens')
+        if itens is None:
+            itens = carrinhos.obter(session_id)['itens']
+
+        linhas = {}
+        for item in itens:
+            produto_id = int(item['produto_id'])
+            linhas[produto_id] = linhas.get(produto_id, 0) + int(item['quantidade'])
+        if not linhas:
+            return jsonify({
+                'success': True,
+                'data': {'valido': True, 'itens': []}
+            }), 200
+
+        resultado = validar_linhas_catalogo(linhas, session_id)
+        itens_validados = [resultado[produto_id] for produto_id in linhas]
+        return jsonify({
+            'success': True,
+            'data': {
+                'valido': all(linha['disponivel'] for linha in itens_validados),
+                'itens': itens_validados
+            }
+        }), 200
+    except (KeyError, TypeError, ValueError) as e:
+        return jsonify({'success': False, 'error': f'Itens inválidos: {e}'}), 400
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
 @app.route('/api/carrinho/<session_id>', methods=['DELETE'])
 def limpar_carrinho(session_id):
     """Limpa carrinho completamente"""
     try:
-        redis_client.delete(f'carrinho:{session_id}')
+        itens = carrinhos.obter(session_id)['itens']
+        reservas.liberar(session_id, [item['produto_id'] for item in itens])
+        carrinhos.limpar(session_id)
         
         return jsonify({
             'success': True,
@@ -311,9 +456,48 @@ def limpar_carrinho(session_id):
 
 
 # ======================
-# HEALTH CHECK
+# CACHE DE PRODUTOS
 # ======================
 
+@app.route('/api/cache/produtos', methods=['DELETE'])
+def invalidar_cache_produtos():
+    """Invalida todo o cache local de produtos"""
+    cache_produtos.invalidar()
+    return jsonify({
+        'success': True,
+        'message': 'Cache de produtos invalidado'
+    }), 200
+
+
+@app.route('/api/cache/produtos/<int:produto_id>', methods=['DELETE'])
+def invalidar_cache_produto(produto_id):
+    """Invalida um produto do cache local"""
+    cache_produtos.invalidar(produto_id)
+    return jsonify({
+        'success': True,
+        'message': f'Produto {produto_id} removido do cache'
+    }), 200
+
+
+# ======================
+# HEALTH CHECK / MÉTRICAS
+# ======================
+
+@app.route('/metrics', methods=['GET'])
+def metricas():
+    """Métricas internas do serviço"""
+    return jsonify({
+        'service': 'carrinho',
+        'cache_produtos': cache_produtos.estatisticas(),
+        'cliente_catalogo': catalogo_client.status(),
+        'redis_pool': status_pool(redis_client),
+        'reservas': reservas.estatisticas(),
+        'idempotencia': idempotencia.estatisticas(),
+        'eventos_catalogo': consumidor_eventos.estatisticas() if consumidor_eventos else None,
+        'timestamp': datetime.utcnow().isoformat()
+    }), 200
+
+
 @app.route('/health', methods=['GET'])
 def health_check():
     """Endpoint para verificar saúde do serviço"""
@@ -322,14 +506,20 @@ def health_check():
         redis_client.ping()
         
         # Testa conexão com catálogo
-        catalogo_response = requests.get(f'{CATALOGO_URL}/health', timeout=2)
-        catalogo_healthy = catalogo_response.status_code == 200
+        try:
+            catalogo_response = catalogo_client.get('/health', timeout=2)
+            catalogo_healthy = catalogo_response.status_code == 200
+        except CatalogoIndisponivel:
+            catalogo_healthy = False
         
         return jsonify({
             'status': 'healthy',
             'service': 'carrinho',
             'redis': 'connected',
+            'redis_pool': status_pool(redis_client),
             'catalogo': 'connected' if catalogo_healthy else 'disconnected',
+            'cache_produtos': cache_produtos.estatisticas(),
+            'cliente_catalogo': catalogo_client.status(),
             'timestamp': datetime.utcnow().isoformat()
         }), 200
     except Exception as e:
@@ -0,0 +1,532 @@
+"""
+Microserviço de Carrinho de Compras - variante assíncrona (ASGI)
+Mesma API do app.py servida por Quart, com Redis assíncrono
+(redis.asyncio) e cliente HTTP assíncrono (httpx) para o catálogo.
+Os dados do catálogo de um carrinho são buscados em paralelo (lotes
+simultâneos, limitados por CATALOGO_CONCORRENCIA_MAX): ler um carrinho
+custa cerca de uma latência do catálogo, não uma por item. Os carrinhos
+usam o mesmo armazenamento em hash (carrinho_redis.py) e as mesmas
+reservas de estoque (reservas.py) do app.py.
+
+Execução:
+    uvicorn app_async:app --host 0.0.0.0 --port 5002
+    gunicorn -k uvicorn.workers.UvicornWorker app_async:app
+
+O cache de produtos fica só na memória do processo (as chamadas ao
+Redis do CacheProdutos são síncronas).
+
+Constantes e funções auxiliares vêm do app.py, importado com MODO_ASGI=True:
+sem threads em segundo plano; os clientes Redis síncronos que ele cria
+não abrem conexões enquanto não são usados.
+"""
+import asyncio
+import os
+from datetime import datetime, timedelta
+
+from quart import Quart, jsonify, request
+from quart_cors import cors
+
+# O app.py inicia o varredor de reservas e o consumidor de eventos em
+# threads quando importado fora do modo ASGI; aqui os dois rodam como
+# tarefas do loop, então o modo é fixado antes do import (uvicorn
+# app_async:app funciona sem MODO_ASGI no ambiente)
+os.environ['MODO_ASGI'] = 'True'
+
+from app import (
+    CARRINHO_TTL, CATALOGO_LOTE_MAX_IDS, CATALOGO_URL, EVENTOS_CATALOGO, IDEMPOTENCIA_TTL,
+    IDEMPOTENCIA_TTL_PROCESSAMENTO, RESERVA_TTL, RESERVA_VARREDURA_INTERVALO, criar_consumidor_eventos,
+    gerar_session_id, linha_validacao
+)
+from cache_produtos import CacheProdutos
+from carrinho_redis import RepositorioCarrinhoAsync
+from cliente_catalogo import CatalogoIndisponivel, ClienteCatalogoAsync
+from conexao_redis import criar_cliente_redis_async, modo_cluster, status_pool
+from idempotencia import RespostasIdempotentesAsync
+from reservas import ReservaRecusada, ReservasEstoqueAsync
+
+app = cors(Quart(__name__))
+
+# Máximo de chamadas simultâneas ao catálogo por requisição
+CATALOGO_CONCORRENCIA_MAX = int(os.getenv('CATALOGO_CONCORRENCIA_MAX', 10))
+
+catalogo_client = ClienteCatalogoAsync(
+    CATALOGO_URL,
+    connect_timeout=float(os.getenv('CATALOGO_CONNECT_TIMEOUT', 1.0)),
+    read_timeout=float(os.getenv('CATALOGO_READ_TIMEOUT', 3.0)),
+    retries=int(os.getenv('CATALOGO_RETRIES', 2)),
+    backoff=float(os.getenv('CATALOGO_BACKOFF', 0.1)),
+    pool_maxsize=int(os.getenv('CATALOGO_POOL_MAXSIZE', 20)),
+    limite_falhas=int(os.getenv('CATALOGO_CB_LIMITE_FALHAS', 5)),
+    tempo_reset=int(os.getenv('CATALOGO_CB_TEMPO_RESET', 30))
+)
+
+redis_client = criar_cliente_redis_async()
+
+carrinhos = RepositorioCarrinhoAsync(
+    redis_client, CARRINHO_TTL, transacional=not modo_cluster(redis_client)
+)
+
+reservas = ReservasEstoqueAsync(redis_client, RESERVA_TTL)
+
+idempotencia = RespostasIdempotentesAsync(redis_client, IDEMPOTENCIA_TTL, IDEMPOTENCIA_TTL_PROCESSAMENTO)
+
+cache_produtos = CacheProdutos(
+    max_itens=int(os.getenv('CACHE_PRODUTOS_MAX_ITENS', 1000)),
+    ttl_estatico=int(os.getenv('CACHE_PRODUTOS_TTL_ESTATICO', 300)),
+    ttl_estoque=int(os.getenv('CACHE_PRODUTOS_TTL_ESTOQUE', 5))
+)
+
+# Invalidação pelo feed do catálogo (thread com cliente Redis síncrono)
+consumidor_eventos = criar_consumidor_eventos(cache_produtos) if EVENTOS_CATALOGO else None
+
+
+# ======================
+# FUNÇÕES AUXILIARES
+# ======================
+
+async def buscar_lote_catalogo(lote, limite):
+    """Busca um lote de ids no endpoint de lote do catálogo"""
+    async with limite:
+        response = await catalogo_client.get(
+            '/api/produtos/lote',
+            params={'ids': ','.join(str(pid) for pid in lote)}
+        )
+    if response.status_code == 200:
+        return response.json().get('data', [])
+    if response.status_code in (404, 405):
+        # Catálogo sem o endpoint de lote: um GET por produto, em paralelo
+        return await buscar_individualmente(lote, limite)
+    return []
+
+
+async def buscar_produto_catalogo(produto_id, limite):
+    async with limite:
+        response = await catalogo_client.get(f'/api/produtos/{produto_id}')
+    if response.status_code == 200:
+        return response.json().get('data')
+    return None
+
+
+async def buscar_individualmente(produto_ids, limite):
+    produtos = await asyncio.gather(
+        *(buscar_produto_catalogo(pid, limite) for pid in produto_ids)
+    )
+    return [produto for produto in produtos if produto]
+
+
+async def buscar_produtos_catalogo(produto_ids):
+    """
+    Busca produtos no catálogo com os lotes disparados em paralelo
+    Lança CatalogoIndisponivel se o catálogo estiver fora
+    """
+    limite = asyncio.Semaphore(CATALOGO_CONCORRENCIA_MAX)
+    lotes = [
+        produto_ids[inicio:inicio + CATALOGO_LOTE_MAX_IDS]
+        for inicio in range(0, len(produto_ids), CATALOGO_LOTE_MAX_IDS)
+    ]
+    resultados = await asyncio.gather(*(buscar_lote_catalogo(lote, limite) for lote in lotes))
+    return [produto for resultado in resultados for produto in resultado]
+
+
+async def obter_detalhes_produtos(produto_ids, exigir_estoque=False):
+    """
+    Obtém detalhes de vários produtos, consultando o cache local antes
+    do catálogo. Se o catálogo estiver indisponível, serve os dados
+    expirados que ainda estiverem no cache.
+    Retorna um dicionário {produto_id: produto}
+    """
+    ids = list(dict.fromkeys(produto_ids))
+    produtos, faltantes = cache_produtos.obter_muitos(ids, exigir_estoque=exigir_estoque)
+
+    if faltantes:
+        try:
+            novos = await buscar_produtos_catalogo(faltantes)
+        except CatalogoIndisponivel as e:
+            print(f"Catálogo indisponível, usando cache expirado: {e}")
+            expirados, _ = cache_produtos.obter_muitos(faltantes, permitir_expirado=True)
+            produtos.update(expirados)
+            return produtos
+
+        cache_produtos.salvar_muitos(novos)
+        for produto in novos:
+            produtos[produto['id']] = produto
+    return produtos
+
+
+async def validar_linhas_catalogo(linhas, session_id=None):
+    """
+    Valida a quantidade final de cada produto ({produto_id: quantidade}):
+    cache fresco localmente, o resto em uma chamada a /api/produtos/validar
+    Retorna {produto_id: linha}
+    """
+    produtos, faltantes = cache_produtos.obter_muitos(list(linhas), exigir_estoque=True)
+    resultado = {
+        produto_id: linha_validacao(produto_id, linhas[produto_id], produto)
+        for produto_id, produto in produtos.items()
+    }
+
+    if faltantes:
+        try:
+            for inicio in range(0, len(faltantes), CATALOGO_LOTE_MAX_IDS):
+                lote = faltantes[inicio:inicio + CATALOGO_LOTE_MAX_IDS]
+                response = await catalogo_client.post('/api/produtos/validar', json={
+                    'itens': [{'produto_id': pid, 'quantidade': linhas[pid]} for pid in lote],
+                    'session_id': session_id
+                })
+                if response.status_code != 200:
+                    # Resposta recusada (ex.: 400): não é "produto não encontrado"
+                    raise CatalogoIndisponivel(f'Catálogo respondeu {response.status_code} ao validar')
+                for linha in response.json()['data']['itens']:
+                    resultado[linha['produto_id']] = linha
+        except CatalogoIndisponivel as e:
+            print(f"Catálogo indisponível, validando com cache expirado: {e}")
+            expirados, _ = cache_produtos.obter_muitos(faltantes, permitir_expirado=True)
+            for produto_id, produto in expirados.items():
+                resultado[produto_id] = linha_validacao(produto_id, linhas[produto_id], produto)
+
+    for produto_id in faltantes:
+        if produto_id not in resultado:
+            resultado[produto_id] = linha_validacao(produto_id, linhas[produto_id], None)
+    return resultado
+
+
+# ======================
+# ENDPOINTS
+# ======================
+
+@app.route('/api/carrinho/sessao', methods=['POST'])
+async def criar_sessao():
+    """Cria uma nova sessão de carrinho"""
+    try:
+        session_id = gerar_session_id()
+        await carrinhos.criar(session_id)
+
+        return jsonify({
+            'success': True,
+            'data': {
+                'session_id': session_id,
+                'expira_em': (datetime.utcnow() + timedelta(seconds=CARRINHO_TTL)).isoformat()
+            }
+        }), 201
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@app.route('/api/carrinho/<session_id>', methods=['GET'])
+async def obter_carrinho(session_id):
+    """Obtém carrinho de uma sessão"""
+    try:
+        carrinho = await carrinhos.obter(session_id)
+
+        # Enriquece itens com dados do catálogo (lotes em paralelo)
+        itens_enriquecidos = []
+        valor_total = 0
+        produtos = await obter_detalhes_produtos(
+            [item['produto_id'] for item in carrinho['itens']]
+        )
+
+        for item in carrinho['itens']:
+            produto = produtos.get(item['produto_id'])
+            if produto:
+                item_enriquecido = {
+                    **item,
+                    'produto': produto,
+                    'subtotal': produto['preco'] * item['quantidade']
+                }
+                itens_enriquecidos.append(item_enriquecido)
+                valor_total += item_enriquecido['subtotal']
+
+        return jsonify({
+            'success': True,
+            'data': {
+                'session_id': session_id,
+                'itens': itens_enriquecidos,
+                'total_itens': len(itens_enriquecidos),
+                'valor_total': valor_total,
+                'criado_em': carrinho.get('criado_em'),
+                'atualizado_em': carrinho.get('atualizado_em')
+            }
+        }), 200
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@app.route('/api/carrinho/<session_id>/adicionar', methods=['POST'])
+@idempotencia.idempotente_async
+async def adicionar_item(session_id):
+    """
+    Adiciona item ao carrinho
+    Body: {"produto_id": int, "quantidade": int}
+    Header opcional: Idempotency-Key (repetições devolvem a primeira resposta)
+    """
+    try:
+        data = await request.get_json()
+        produto_id = data.get('produto_id')
+        quantidade = data.get('quantidade', 1)
+
+        if not produto_id or quantidade <= 0:
+            return jsonify({
+                'success': False,
+                'error': 'produto_id e quantidade são obrigatórios'
+            }), 400
+
+        # Uma única validação da quantidade final, calculada localmente
+        atual = await carrinhos.quantidade(session_id, produto_id)
+        linha = (await validar_linhas_catalogo({produto_id: atual + quantidade}, session_id))[produto_id]
+        if not linha['disponivel']:
+            excede_total = (
+                atual > 0
+                and linha['motivo'] == 'estoque_insuficiente'
+                and linha['estoque_atual'] >= quantidade
+            )
+            return jsonify({
+                'success': False,
+                'error': 'Quantidade total excede estoque disponível' if excede_total
+                         else 'Produto indisponível ou estoque insuficiente'
+            }), 400
+
+        try:
+            await reservas.definir(session_id, produto_id, atual + quantidade, estoque=linha['estoque_atual'])
+        except ReservaRecusada as e:
+            return jsonify({
+                'success': False,
+                'error': 'Estoque reservado em outros carrinhos',
+                'disponivel': e.disponivel
+            }), 409
+
+        adicionado, carrinho = await carrinhos.adicionar(
+            session_id, produto_id, quantidade, limite=linha['estoque_atual']
+        )
+        if not adicionado:
+            await reservas.definir(session_id, produto_id, await carrinhos.quantidade(session_id, produto_id))
+            return jsonify({
+                'success': False,
+                'error': 'Quantidade total excede estoque disponível'
+            }), 400
+
+        return jsonify({
+            'success': True,
+            'message': 'Item adicionado ao carrinho',
+            'data': carrinho
+        }), 200
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@app.route('/api/carrinho/<session_id>/remover/<int:produto_id>', methods=['DELETE'])
+async def remover_item(session_id, produto_id):
+    """Remove item do carrinho"""
+    try:
+        carrinho = await carrinhos.remover(session_id, produto_id)
+        await reservas.liberar(session_id, [produto_id])
+
+        return jsonify({
+            'success': True,
+            'message': 'Item removido do carrinho',
+            'data': carrinho
+        }), 200
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@app.route('/api/carrinho/<session_id>/atualizar/<int:produto_id>', methods=['PUT'])
+async def atualizar_quantidade(session_id, produto_id):
+    """
+    Atualiza quantidade de um item
+    Body: {"quantidade": int}
+    """
+    try:
+        data = await request.get_json()
+        quantidade = data.get('quantidade', 1)
+
+        if quantidade <= 0:
+            return jsonify({
+                'success': False,
+                'error': 'Quantidade deve ser maior que zero'
+            }), 400
+
+        linha = (await validar_linhas_catalogo({produto_id: quantidade}, session_id))[produto_id]
+        if not linha['disponivel']:
+            return jsonify({
+                'success': False,
+                'error': 'Estoque insuficiente'
+            }), 400
+
+        try:
+            await reservas.definir(session_id, produto_id, quantidade, estoque=linha['estoque_atual'])
+        except ReservaRecusada as e:
+            return jsonify({
+                'success': False,
+                'error': 'Estoque reservado em outros carrinhos',
+                'disponivel': e.disponivel
+            }), 409
+
+        carrinho = await carrinhos.atualizar(session_id, produto_id, quantidade)
+        if carrinho is None:
+            await reservas.liberar(session_id, [produto_id])
+            return jsonify({
+                'success': False,
+                'error': 'Item não encontrado no carrinho'
+            }), 404
+
+        return jsonify({
+            'success': True,
+            'message': 'Quantidade atualizada',
+            'data': carrinho
+        }), 200
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@app.route('/api/carrinho/<session_id>/validar', methods=['POST'])
+async def validar_carrinho(session_id):
+    """
+    Valida a disponibilidade de todas as linhas do carrinho de uma vez
+    Body (opcional): {"itens": [{"produto_id": int, "quantidade": int}, ...]}
+    """
+    try:
+        data = await request.get_json(silent=True) or {}
+        itens = data.get('itens')
+        if itens is None:
+            itens = (await carrinhos.obter(session_id))['itens']
+
+        linhas = {}
+        for item in itens:
+            produto_id = int(item['produto_id'])
+            linhas[produto_id] = linhas.get(produto_id, 0) + int(item['quantidade'])
+        if not linhas:
+            return jsonify({
+                'success': True,
+                'data': {'valido': True, 'itens': []}
+            }), 200
+
+        resultado = await validar_linhas_catalogo(linhas, session_id)
+        itens_validados = [resultado[produto_id] for produto_id in linhas]
+        return jsonify({
+            'success': True,
+            'data': {
+                'valido': all(linha['disponivel'] for linha in itens_validados),
+                'itens': itens_validados
+            }
+        }), 200
+    except (KeyError, TypeError, ValueError) as e:
+        return jsonify({'success': False, 'error': f'Itens inválidos: {e}'}), 400
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@app.route('/api/carrinho/<session_id>', methods=['DELETE'])
+async def limpar_carrinho(session_id):
+    """Limpa carrinho completamente"""
+    try:
+        itens = (await carrinhos.obter(session_id))['itens']
+        await reservas.liberar(session_id, [item['produto_id'] for item in itens])
+        await carrinhos.limpar(session_id)
+
+        return jsonify({
+            'success': True,
+            'message': 'Carrinho limpo com sucesso'
+        }), 200
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+# ======================
+# CACHE DE PRODUTOS
+# ======================
+
+@app.route('/api/cache/produtos', methods=['DELETE'])
+async def invalidar_cache_produtos():
+    """Invalida todo o cache local de produtos"""
+    cache_produtos.invalidar()
+    return jsonify({
+        'success': True,
+        'message': 'Cache de produtos invalidado'
+    }), 200
+
+
+@app.route('/api/cache/produtos/<int:produto_id>', methods=['DELETE'])
+async def invalidar_cache_produto(produto_id):
+    """Invalida um produto do cache local"""
+    cache_produtos.invalidar(produto_id)
+    return jsonify({
+        'success': True,
+        'message': f'Produto {produto_id} removido do cache'
+    }), 200
+
+
+# ======================
+# HEALTH CHECK / MÉTRICAS
+# ======================
+
+@app.route('/metrics', methods=['GET'])
+async def metricas():
+    """Métricas internas do serviço"""
+    return jsonify({
+        'service': 'carrinho',
+        'modo': 'asgi',
+        'cache_produtos': cache_produtos.estatisticas(),
+        'cliente_catalogo': catalogo_client.status(),
+        'redis_pool': status_pool(redis_client),
+        'reservas': reservas.estatisticas(),
+        'idempotencia': idempotencia.estatisticas(),
+        'eventos_catalogo': consumidor_eventos.estatisticas() if consumidor_eventos else None,
+        'timestamp': datetime.utcnow().isoformat()
+    }), 200
+
+
+@app.route('/health', methods=['GET'])
+async def health_check():
+    """Endpoint para verificar saúde do serviço"""
+    try:
+        await redis_client.ping()
+
+        try:
+            catalogo_response = await catalogo_client.get('/health', timeout=2)
+            catalogo_healthy = catalogo_response.status_code == 200
+        except CatalogoIndisponivel:
+            catalogo_healthy = False
+
+        return jsonify({
+            'status': 'healthy',
+            'service': 'carrinho',
+            'modo': 'asgi',
+            'redis': 'connected',
+            'redis_pool': status_pool(redis_client),
+            'catalogo': 'connected' if catalogo_healthy else 'disconnected',
+            'cache_produtos': cache_produtos.estatisticas(),
+            'cliente_catalogo': catalogo_client.status(),
+            'timestamp': datetime.utcnow().isoformat()
+        }), 200
+    except Exception as e:
+        return jsonify({
+            'status': 'unhealthy',
+            'service': 'carrinho',
+            'error': str(e),
+            'timestamp': datetime.utcnow().isoformat()
+        }), 503
+
+
+@app.before_serving
+async def iniciar_tarefas_segundo_plano():
+    if consumidor_eventos is not None:
+        consumidor_eventos.iniciar()
+    if os.getenv('RESERVA_VARREDOR', 'True') == 'True':
+        app.varredor_reservas = asyncio.create_task(
+            reservas.executar_varredor(RESERVA_VARREDURA_INTERVALO)
+        )
+
+
+@app.after_serving
+async def fechar_conexoes():
+    varredor = getattr(app, 'varredor_reservas', None)
+    if varredor is not None:
+        varredor.cancel()
+    await catalogo_client.fechar()
+    await redis_client.aclose()
+
+
+if __name__ == '__main__':
+    import uvicorn
+
+    uvicorn.run(app, host='0.0.0.0', port=int(os.getenv('PORT', 5002)))
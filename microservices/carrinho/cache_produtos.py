@@ -0,0 +1,160 @@
+"""
+Cache local de produtos do catálogo
+LRU em memória com TTL curto para estoque e TTL longo para os campos
+estáticos (nome, preço, descrição...), opcionalmente compartilhado
+entre workers através do Redis
+"""
+import json
+import threading
+import time
+from collections import OrderedDict
+
+
+class CacheProdutos:
+    """Cache read-through de snapshots de produtos com expiração e LRU"""
+
+    def __init__(self, max_itens=1000, ttl_estatico=300, ttl_estoque=5,
+                 redis_client=None, prefixo='cache:produto'):
+        self.max_itens = max_itens
+        self.ttl_estatico = ttl_estatico
+        self.ttl_estoque = ttl_estoque
+        self.redis_client = redis_client
+        self.prefixo = prefixo
+
+        self._itens = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.hits_redis = 0
+        self.misses = 0
+        self.evicoes = 0
+
+    def _chave(self, produto_id):
+        return f'{self.prefixo}:{produto_id}'
+
+    def _valida(self, entrada, agora, exigir_estoque):
+        if agora >= entrada['expira_estatico']:
+            return False
+        if exigir_estoque and agora >= entrada['expira_estoque']:
+            return False
+        return True
+
+    def _guardar_local(self, produto_id, entrada):
+        """Guarda entrada na memória, removendo a menos usada se cheio"""
+        self._itens[produto_id] = entrada
+        self._itens.move_to_end(produto_id)
+        while len(self._itens) > self.max_itens:
+            self._itens.popitem(last=False)
+            self.evicoes += 1
+
+    def obter_muitos(self, produto_ids, exigir_estoque=False, permitir_expirado=False):
+        """
+        Busca produtos no cache
+        exigir_estoque: só aceita entradas cujo estoque ainda está no TTL curto
+        permitir_expirado: aceita entradas vencidas (usado quando o catálogo está fora)
+        Retorna ({produto_id: produto}, [ids não encontrados])
+        """
+        agora = time.time()
+        encontrados = {}
+        faltantes = []
+
+        with self._lock:
+            for produto_id in produto_ids:
+                entrada = self._itens.get(produto_id)
+                if entrada and (permitir_expirado or self._valida(entrada, agora, exigir_estoque)):
+                    self._itens.move_to_end(produto_id)
+                    encontrados[produto_id] = entrada['produto']
+                    self.hits += 1
+                else:
+                    faltantes.append(produto_id)
+
+        if faltantes and self.redis_client is not None and not permitir_expirado:
+            faltantes = self._obter_do_redis(faltantes, encontrados, agora, exigir_estoque)
+
+        with self._lock:
+            self.misses += len(faltantes)
+
+        return encontrados, faltantes
+
+    def _obter_do_redis(self, produto_ids, encontrados, agora, exigir_estoque):
+        """Completa a busca com o cache compartilhado no Redis"""
+        # Em Redis Cluster as chaves ficam em slots diferentes: mget_nonatomic
+        # agrupa por nó em vez de falhar com CROSSSLOT
+        mget = getattr(self.redis_client, 'mget_nonatomic', self.redis_client.mget)
+        try:
+            valores = mget([self._chave(pid) for pid in produto_ids])
+        except Exception as e:
+            print(f"Erro ao ler cache de produtos no Redis: {e}")
+            return produto_ids
+
+        faltantes = []
+        with self._lock:
+            for produto_id, valor in zip(produto_ids, valores):
+                entrada = json.loads(valor) if valor else None
+                if entrada and self._valida(entrada, agora, exigir_estoque):
+                    self._guardar_local(produto_id, entrada)
+                    encontrados[produto_id] = entrada['produto']
+                    self.hits_redis += 1
+                else:
+                    faltantes.append(produto_id)
+        return faltantes
+
+    def salvar_muitos(self, produtos):
+        """Guarda snapshots recém-obtidos do catálogo"""
+        agora = time.time()
+        entradas = {}
+        with self._lock:
+            for produto in produtos:
+                entrada = {
+                    'produto': produto,
+                    'expira_estatico': agora + self.ttl_estatico,
+                    'expira_estoque': agora + self.ttl_estoque
+                }
+                self._guardar_local(produto['id'], entrada)
+                entradas[produto['id']] = entrada
+
+        if entradas and self.redis_client is not None:
+            try:
+                pipe = self.redis_client.pipeline(transaction=False)
+                for produto_id, entrada in entradas.items():
+                    pipe.setex(self._chave(produto_id), self.ttl_estatico, json.dumps(entrada))
+                pipe.execute()
+            except Exception as e:
+                print(f"Erro ao gravar cache de produtos no Redis: {e}")
+
+    def invalidar(self, produto_id=None):
+        """Remove um produto (ou todos, se produto_id for None) do cache"""
+        with self._lock:
+            if produto_id is None:
+                self._itens.clear()
+            else:
+                self._itens.pop(produto_id, None)
+
+        if self.redis_client is not None:
+            try:
+                if produto_id is None:
+                    pipe = self.redis_client.pipeline(transaction=False)
+                    for chave in self.redis_client.scan_iter(match=f'{self.prefixo}:*', count=500):
+                        pipe.delete(chave)
+                    pipe.execute()
+                else:
+                    self.redis_client.delete(self._chave(produto_id))
+            except Exception as e:
+                print(f"Erro ao invalidar cache de produtos no Redis: {e}")
+
+    def estatisticas(self):
+        """Contadores de uso do cache"""
+        with self._lock:
+            consultas = self.hits + self.hits_redis + self.misses
+            return {
+                'itens': len(self._itens),
+                'max_itens': self.max_itens,
+                'hits': self.hits,
+                'hits_redis': self.hits_redis,
+                'misses': self.misses,
+                'evicoes': self.evicoes,
+                'taxa_acerto': round((self.hits + self.hits_redis) / consultas, 4) if consultas else 0.0,
+                'ttl_estatico': self.ttl_estatico,
+                'ttl_estoque': self.ttl_estoque,
+                'redis': self.redis_client is not None
+            }
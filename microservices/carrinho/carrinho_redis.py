@@ -0,0 +1,256 @@
+"""
+Armazenamento do carrinho no Redis como hash
+
+    carrinho:{session_id} -> item:<produto_id>        quantidade
+                             adicionado:<produto_id>  data em que entrou
+                             criado_em / atualizado_em
+
+Cada alteração é um único script Lua (atômico e com um round-trip), então
+adições simultâneas na mesma sessão não se sobrescrevem. Carrinhos antigos,
+gravados como uma string JSON, são convertidos para hash pelo próprio
+script na primeira alteração (e na primeira leitura).
+"""
+from datetime import datetime
+
+import redis
+
+# Converte o carrinho legado (string JSON) em hash, preservando o TTL.
+# KEYS[1] = chave do carrinho; ARGV[1] = agora; ARGV[2] = TTL
+LUA_MIGRAR = """
+local chave = KEYS[1]
+local function texto(valor, padrao)
+    if valor == nil or valor == cjson.null then
+        return padrao
+    end
+    return tostring(valor)
+end
+if redis.call('TYPE', chave).ok == 'string' then
+    local ttl = redis.call('TTL', chave)
+    local carrinho = cjson.decode(redis.call('GET', chave))
+    redis.call('DEL', chave)
+    local itens = carrinho.itens
+    if itens == nil or itens == cjson.null then
+        itens = {}
+    end
+    for _, item in ipairs(itens) do
+        local produto_id = texto(item.produto_id)
+        redis.call('HINCRBY', chave, 'item:' .. produto_id, tonumber(item.quantidade) or 0)
+        redis.call('HSET', chave, 'adicionado:' .. produto_id, texto(item.adicionado_em, ARGV[1]))
+    end
+    redis.call('HSET', chave,
+        'criado_em', texto(carrinho.criado_em, ARGV[1]),
+        'atualizado_em', texto(carrinho.atualizado_em, ARGV[1]))
+    redis.call('EXPIRE', chave, ttl > 0 and ttl or ARGV[2])
+end
+"""
+
+# Marca a alteração e renova o TTL
+LUA_TOCAR = """
+redis.call('HSETNX', chave, 'criado_em', ARGV[1])
+redis.call('HSET', chave, 'atualizado_em', ARGV[1])
+redis.call('EXPIRE', chave, ARGV[2])
+"""
+
+LUA_OBTER = LUA_MIGRAR + """
+return redis.call('HGETALL', chave)
+"""
+
+# ARGV[3] = produto_id, ARGV[4] = quantidade a somar,
+# ARGV[5] = estoque disponível (-1 = sem limite)
+# Retorna {1, nova_quantidade, carrinho} ou {0, quantidade_atual}
+LUA_ADICIONAR = LUA_MIGRAR + """
+local campo = 'item:' .. ARGV[3]
+local quantidade = tonumber(ARGV[4])
+local limite = tonumber(ARGV[5])
+local atual = tonumber(redis.call('HGET', chave, campo) or '0')
+if limite >= 0 and atual + quantidade > limite then
+    return {0, atual}
+end
+local nova = redis.call('HINCRBY', chave, campo, quantidade)
+redis.call('HSETNX', chave, 'adicionado:' .. ARGV[3], ARGV[1])
+""" + LUA_TOCAR + """
+return {1, nova, redis.call('HGETALL', chave)}
+"""
+
+# ARGV[3] = produto_id, ARGV[4] = nova quantidade
+# Retorna {1, carrinho} ou {0} se o item não está no carrinho
+LUA_ATUALIZAR = LUA_MIGRAR + """
+local campo = 'item:' .. ARGV[3]
+if redis.call('HEXISTS', chave, campo) == 0 then
+    return {0}
+end
+redis.call('HSET', chave, campo, ARGV[4])
+""" + LUA_TOCAR + """
+return {1, redis.call('HGETALL', chave)}
+"""
+
+# ARGV[3] = produto_id
+# Carrinho inexistente: retorna vazio sem criar a chave
+LUA_REMOVER = LUA_MIGRAR + """
+if redis.call('EXISTS', chave) == 0 then
+    return {}
+end
+redis.call('HDEL', chave, 'item:' .. ARGV[3], 'adicionado:' .. ARGV[3])
+""" + LUA_TOCAR + """
+return redis.call('HGETALL', chave)
+"""
+
+
+def _agora():
+    return datetime.utcnow().isoformat()
+
+
+def _pares(valores):
+    """Resposta plana do HGETALL dentro do Lua -> dict"""
+    return dict(zip(valores[::2], valores[1::2]))
+
+
+def montar_carrinho(campos):
+    """Hash do Redis -> formato do carrinho usado pela API"""
+    itens = []
+    for campo, valor in campos.items():
+        if campo.startswith('item:'):
+            produto_id = campo[len('item:'):]
+            itens.append({
+                'produto_id': int(produto_id),
+                'quantidade': int(valor),
+                'adicionado_em': campos.get(f'adicionado:{produto_id}')
+            })
+    itens.sort(key=lambda item: (item['adicionado_em'] or '', item['produto_id']))
+    return {
+        'itens': itens,
+        'criado_em': campos.get('criado_em', _agora()),
+        'atualizado_em': campos.get('atualizado_em')
+    }
+
+
+class RepositorioCarrinho:
+    """Operações atômicas sobre carrinhos guardados como hash no Redis"""
+
+    def __init__(self, redis_client, ttl, prefixo='carrinho', transacional=True):
+        self.redis_client = redis_client
+        self.ttl = ttl
+        self.prefixo = prefixo
+        # Redis Cluster não tem MULTI no pipeline; os comandos de um mesmo
+        # carrinho ficam no mesmo nó e seguem juntos em um único envio
+        self.transacional = transacional
+        self._obter = redis_client.register_script(LUA_OBTER)
+        self._adicionar = redis_client.register_script(LUA_ADICIONAR)
+        self._atualizar = redis_client.register_script(LUA_ATUALIZAR)
+        self._remover = redis_client.register_script(LUA_REMOVER)
+
+    def chave(self, session_id):
+        return f'{self.prefixo}:{session_id}'
+
+    def _args(self, *extras):
+        return [_agora(), self.ttl, *extras]
+
+    def obter(self, session_id):
+        """Carrinho da sessão (vazio se não existir)"""
+        try:
+            campos = self.redis_client.hgetall(self.chave(session_id))
+        except redis.ResponseError:
+            # WRONGTYPE: carrinho legado em JSON, convertido pelo script
+            campos = _pares(self._obter(keys=[self.chave(session_id)], args=self._args()))
+        return montar_carrinho(campos)
+
+    def quantidade(self, session_id, produto_id):
+        """Quantidade de um produto já no carrinho (0 se não estiver)"""
+        try:
+            valor = self.redis_client.hget(self.chave(session_id), f'item:{produto_id}')
+        except redis.ResponseError:
+            return next((item['quantidade'] for item in self.obter(session_id)['itens']
+                         if item['produto_id'] == produto_id), 0)
+        return int(valor or 0)
+
+    def criar(self, session_id):
+        """Cria um carrinho vazio (HSET + EXPIRE em um único round-trip)"""
+        agora = _agora()
+        chave = self.chave(session_id)
+        pipe = self.redis_client.pipeline(transaction=self.transacional)
+        pipe.hset(chave, mapping={'criado_em': agora, 'atualizado_em': agora})
+        pipe.expire(chave, self.ttl)
+        pipe.execute()
+        return {'itens': [], 'criado_em': agora, 'atualizado_em': agora}
+
+    def adicionar(self, session_id, produto_id, quantidade, limite=None):
+        """
+        Soma `quantidade` ao item, desde que o total não passe de `limite`
+        (estoque disponível). Retorna (True, carrinho) ou
+        (False, quantidade já no carrinho)
+        """
+        resultado = self._adicionar(
+            keys=[self.chave(session_id)],
+            args=self._args(produto_id, quantidade, -1 if limite is None else limite)
+        )
+        if not resultado[0]:
+            return False, int(resultado[1])
+        return True, montar_carrinho(_pares(resultado[2]))
+
+    def atualizar(self, session_id, produto_id, quantidade):
+        """Define a quantidade de um item; None se o item não está no carrinho"""
+        resultado = self._atualizar(
+            keys=[self.chave(session_id)], args=self._args(produto_id, quantidade)
+        )
+        if not resultado[0]:
+            return None
+        return montar_carrinho(_pares(resultado[1]))
+
+    def remover(self, session_id, produto_id):
+        campos = self._remover(keys=[self.chave(session_id)], args=self._args(produto_id))
+        return montar_carrinho(_pares(campos))
+
+    def limpar(self, session_id):
+        self.redis_client.delete(self.chave(session_id))
+
+
+class RepositorioCarrinhoAsync(RepositorioCarrinho):
+    """Mesmas operações com um cliente redis.asyncio"""
+
+    async def obter(self, session_id):
+        try:
+            campos = await self.redis_client.hgetall(self.chave(session_id))
+        except redis.ResponseError:
+            campos = _pares(await self._obter(keys=[self.chave(session_id)], args=self._args()))
+        return montar_carrinho(campos)
+
+    async def quantidade(self, session_id, produto_id):
+        try:
+            valor = await self.redis_client.hget(self.chave(session_id), f'item:{produto_id}')
+        except redis.ResponseError:
+            return next((item['quantidade'] for item in (await self.obter(session_id))['itens']
+                         if item['produto_id'] == produto_id), 0)
+        return int(valor or 0)
+
+    async def criar(self, session_id):
+        agora = _agora()
+        chave = self.chave(session_id)
+        async with self.redis_client.pipeline(transaction=self.transacional) as pipe:
+            pipe.hset(chave, mapping={'criado_em': agora, 'atualizado_em': agora})
+            pipe.expire(chave, self.ttl)
+            await pipe.execute()
+        return {'itens': [], 'criado_em': agora, 'atualizado_em': agora}
+
+    async def adicionar(self, session_id, produto_id, quantidade, limite=None):
+        resultado = await self._adicionar(
+            keys=[self.chave(session_id)],
+            args=self._args(produto_id, quantidade, -1 if limite is None else limite)
+        )
+        if not resultado[0]:
+            return False, int(resultado[1])
+        return True, montar_carrinho(_pares(resultado[2]))
+
+    async def atualizar(self, session_id, produto_id, quantidade):
+        resultado = await self._atualizar(
+            keys=[self.chave(session_id)], args=self._args(produto_id, quantidade)
+        )
+        if not resultado[0]:
+            return None
+        return montar_carrinho(_pares(resultado[1]))
+
+    async def remover(self, session_id, produto_id):
+        campos = await self._remover(keys=[self.chave(session_id)], args=self._args(produto_id))
+        return montar_carrinho(_pares(campos))
+
+    async def limpar(self, session_id):
+        await self.redis_client.delete(self.chave(session_id))
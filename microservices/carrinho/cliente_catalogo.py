@@ -0,0 +1,233 @@
+"""
+Cliente HTTP do serviço de catálogo
+Sessão com pool de conexões keep-alive, timeouts separados de conexão e
+leitura, retentativas limitadas com jitter e circuit breaker
+"""
+import asyncio
+import random
+import threading
+import time
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+class CatalogoIndisponivel(Exception):
+    """O catálogo não respondeu (erro de rede, timeout ou 5xx)"""
+
+
+class CircuitoAberto(CatalogoIndisponivel):
+    """O circuit breaker está aberto e a chamada nem foi feita"""
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker simples
+    fechado -> aberto após `limite_falhas` falhas seguidas
+    aberto -> meio_aberto após `tempo_reset` segundos (deixa uma chamada passar)
+    meio_aberto -> fechado no primeiro sucesso, ou aberto de novo na falha
+
+    Em meio_aberto só a chamada de teste passa; as demais são recusadas até
+    ela registrar o resultado (ou até `tempo_reset` segundos sem resposta)
+    """
+
+    FECHADO = 'fechado'
+    ABERTO = 'aberto'
+    MEIO_ABERTO = 'meio_aberto'
+
+    def __init__(self, limite_falhas=5, tempo_reset=30):
+        self.limite_falhas = limite_falhas
+        self.tempo_reset = tempo_reset
+        self.estado = self.FECHADO
+        self.falhas = 0
+        self.aberto_em = None
+        self.teste_em = None
+        self._lock = threading.Lock()
+
+    def permitir(self):
+        """Indica se uma chamada pode ser feita agora"""
+        with self._lock:
+            agora = time.monotonic()
+            if self.estado == self.ABERTO:
+                if agora - self.aberto_em < self.tempo_reset:
+                    return False
+                self.estado = self.MEIO_ABERTO
+                self.teste_em = agora
+                return True
+            if self.estado == self.MEIO_ABERTO:
+                if self.teste_em is not None and agora - self.teste_em < self.tempo_reset:
+                    return False
+                self.teste_em = agora
+                return True
+            return True
+
+    def registrar_sucesso(self):
+        with self._lock:
+            self.estado = self.FECHADO
+            self.falhas = 0
+            self.aberto_em = None
+            self.teste_em = None
+
+    def registrar_falha(self):
+        with self._lock:
+            self.falhas += 1
+            if self.estado == self.MEIO_ABERTO or self.falhas >= self.limite_falhas:
+                self.estado = self.ABERTO
+                self.aberto_em = time.monotonic()
+            self.teste_em = None
+
+    def status(self):
+        with self._lock:
+            return {'estado': self.estado, 'falhas': self.falhas}
+
+
+class ClienteCatalogo:
+    """Cliente compartilhado (um por worker) para chamadas ao catálogo"""
+
+    def __init__(self, base_url, connect_timeout=1.0, read_timeout=3.0,
+                 retries=2, backoff=0.1, pool_maxsize=20,
+                 limite_falhas=5, tempo_reset=30):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = (connect_timeout, read_timeout)
+        self.breaker = CircuitBreaker(limite_falhas, tempo_reset)
+
+        # Retenta apenas métodos idempotentes; falhas de conexão (antes
+        # do envio) são retentadas para qualquer método
+        retry = Retry(
+            total=retries,
+            connect=retries,
+            read=retries,
+            status=retries,
+            backoff_factor=backoff,
+            backoff_jitter=backoff,
+            status_forcelist=(502, 503, 504),
+            allowed_methods=frozenset({'GET', 'HEAD'}),
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_maxsize, max_retries=retry)
+
+        self.session = requests.Session()
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def requisitar(self, metodo, caminho, **kwargs):
+        """
+        Faz uma requisição ao catálogo passando pelo circuit breaker
+        Lança CircuitoAberto / CatalogoIndisponivel em caso de falha
+        """
+        if not self.breaker.permitir():
+            raise CircuitoAberto('Circuito aberto para o serviço de catálogo')
+
+        kwargs.setdefault('timeout', self.timeout)
+        try:
+            response = self.session.request(metodo, f'{self.base_url}{caminho}', **kwargs)
+        except requests.RequestException as e:
+            self.breaker.registrar_falha()
+            raise CatalogoIndisponivel(str(e)) from e
+
+        if response.status_code >= 500:
+            self.breaker.registrar_falha()
+            raise CatalogoIndisponivel(f'Catálogo respondeu {response.status_code}')
+
+        self.breaker.registrar_sucesso()
+        return response
+
+    def get(self, caminho, **kwargs):
+        return self.requisitar('GET', caminho, **kwargs)
+
+    def post(self, caminho, **kwargs):
+        return self.requisitar('POST', caminho, **kwargs)
+
+    def put(self, caminho, **kwargs):
+        return self.requisitar('PUT', caminho, **kwargs)
+
+    def status(self):
+        return {
+            'circuito': self.breaker.status(),
+            'timeout': {'conexao': self.timeout[0], 'leitura': self.timeout[1]}
+        }
+
+
+class ClienteCatalogoAsync:
+    """
+    Versão assíncrona do ClienteCatalogo (httpx), usada pelo app_async.py
+    Mesmos timeouts, retentativas com jitter para métodos idempotentes e
+    circuit breaker; o pool keep-alive é compartilhado pelas corrotinas
+    """
+
+    METODOS_IDEMPOTENTES = frozenset({'GET', 'HEAD'})
+    STATUS_RETENTAVEIS = frozenset({502, 503, 504})
+
+    def __init__(self, base_url, connect_timeout=1.0, read_timeout=3.0,
+                 retries=2, backoff=0.1, pool_maxsize=20,
+                 limite_falhas=5, tempo_reset=30):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = (connect_timeout, read_timeout)
+        self.retries = retries
+        self.backoff = backoff
+        self.breaker = CircuitBreaker(limite_falhas, tempo_reset)
+        self.client = httpx.AsyncClient(
+            base_url=self.base_url,
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+            limits=httpx.Limits(max_connections=pool_maxsize, max_keepalive_connections=pool_maxsize)
+        )
+
+    async def requisitar(self, metodo, caminho, **kwargs):
+        """
+        Faz uma requisição ao catálogo passando pelo circuit breaker
+        Lança CircuitoAberto / CatalogoIndisponivel em caso de falha
+        """
+        if not self.breaker.permitir():
+            raise CircuitoAberto('Circuito aberto para o serviço de catálogo')
+
+        idempotente = metodo in self.METODOS_IDEMPOTENTES
+        response = erro = None
+        for tentativa in range(self.retries + 1):
+            if tentativa:
+                espera = self.backoff * (2 ** (tentativa - 1))
+                await asyncio.sleep(espera + random.uniform(0, self.backoff))
+            try:
+                response = await self.client.request(metodo, caminho, **kwargs)
+            except httpx.ConnectError as e:
+                # Falha antes do envio: seguro retentar qualquer método
+                erro = e
+                continue
+            except httpx.HTTPError as e:
+                erro = e
+                if idempotente:
+                    continue
+                break
+            if idempotente and response.status_code in self.STATUS_RETENTAVEIS:
+                continue
+            break
+
+        if response is None:
+            self.breaker.registrar_falha()
+            raise CatalogoIndisponivel(str(erro)) from erro
+
+        if response.status_code >= 500:
+            self.breaker.registrar_falha()
+            raise CatalogoIndisponivel(f'Catálogo respondeu {response.status_code}')
+
+        self.breaker.registrar_sucesso()
+        return response
+
+    async def get(self, caminho, **kwargs):
+        return await self.requisitar('GET', caminho, **kwargs)
+
+    async def post(self, caminho, **kwargs):
+        return await self.requisitar('POST', caminho, **kwargs)
+
+    async def put(self, caminho, **kwargs):
+        return await self.requisitar('PUT', caminho, **kwargs)
+
+    async def fechar(self):
+        await self.client.aclose()
+
+    def status(self):
+        return {
+            'circuito': self.breaker.status(),
+            'timeout': {'conexao': self.timeout[0], 'leitura': self.timeout[1]}
+        }
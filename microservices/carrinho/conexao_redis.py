@@ -0,0 +1,136 @@
+"""
+Conexão com o Redis do carrinho
+Pool de conexões bloqueante e dimensionado (espera por uma conexão livre
+em vez de abrir conexões sem limite), timeouts de socket, health check
+periódico das conexões ociosas e suporte opcional a Redis Sentinel
+(failover do primário) ou Redis Cluster.
+
+REDIS_MODO: "simples" (padrão) | "sentinel" | "cluster"
+"""
+import os
+
+import redis
+import redis.asyncio as redis_async
+from redis.asyncio.cluster import RedisCluster as RedisClusterAsync
+from redis.asyncio.sentinel import Sentinel as SentinelAsync
+from redis.cluster import ClusterNode, RedisCluster
+from redis.sentinel import Sentinel
+
+
+def _enderecos(valor):
+    """"host1:26379,host2:26379" -> [("host1", 26379), ("host2", 26379)]"""
+    enderecos = []
+    for item in valor.split(','):
+        if item.strip():
+            host, _, porta = item.strip().partition(':')
+            enderecos.append((host, int(porta or 6379)))
+    return enderecos
+
+
+def configuracao():
+    return {
+        'modo': os.getenv('REDIS_MODO', 'simples'),
+        'host': os.getenv('REDIS_HOST', 'localhost'),
+        'port': int(os.getenv('REDIS_PORT', 6379)),
+        'db': int(os.getenv('REDIS_DB', 0)),
+        'password': os.getenv('REDIS_PASSWORD') or None,
+        'max_conexoes': int(os.getenv('REDIS_POOL_MAX_CONEXOES', 50)),
+        'timeout_pool': float(os.getenv('REDIS_POOL_TIMEOUT', 2.0)),
+        'socket_timeout': float(os.getenv('REDIS_SOCKET_TIMEOUT', 1.0)),
+        'socket_connect_timeout': float(os.getenv('REDIS_SOCKET_CONNECT_TIMEOUT', 1.0)),
+        'health_check_interval': int(os.getenv('REDIS_HEALTH_CHECK_INTERVAL', 30)),
+        'sentinelas': _enderecos(os.getenv('REDIS_SENTINELS', '')),
+        'sentinel_master': os.getenv('REDIS_SENTINEL_MASTER', 'mymaster'),
+        'nos_cluster': _enderecos(os.getenv('REDIS_CLUSTER_NODES', '')),
+    }
+
+
+def _opcoes_conexao(config):
+    return {
+        'password': config['password'],
+        'socket_timeout': config['socket_timeout'],
+        'socket_connect_timeout': config['socket_connect_timeout'],
+        'socket_keepalive': True,
+        'health_check_interval': config['health_check_interval'],
+        'decode_responses': True,
+    }
+
+
+def criar_cliente_redis(config=None):
+    """Cliente síncrono conforme REDIS_MODO"""
+    config = config or configuracao()
+    opcoes = _opcoes_conexao(config)
+
+    if config['modo'] == 'sentinel':
+        sentinel = Sentinel(
+            config['sentinelas'],
+            socket_timeout=config['socket_timeout'],
+            sentinel_kwargs={'socket_timeout': config['socket_timeout']}
+        )
+        return sentinel.master_for(
+            config['sentinel_master'], db=config['db'],
+            max_connections=config['max_conexoes'], **opcoes
+        )
+
+    if config['modo'] == 'cluster':
+        return RedisCluster(
+            startup_nodes=[ClusterNode(host, porta) for host, porta in config['nos_cluster']],
+            max_connections=config['max_conexoes'], **opcoes
+        )
+
+    pool = redis.BlockingConnectionPool(
+        host=config['host'], port=config['port'], db=config['db'],
+        max_connections=config['max_conexoes'], timeout=config['timeout_pool'],
+        **opcoes
+    )
+    return redis.Redis(connection_pool=pool)
+
+
+def criar_cliente_redis_async(config=None):
+    """Cliente redis.asyncio conforme REDIS_MODO (usado pelo app_async.py)"""
+    config = config or configuracao()
+    opcoes = _opcoes_conexao(config)
+
+    if config['modo'] == 'sentinel':
+        sentinel = SentinelAsync(
+            config['sentinelas'],
+            socket_timeout=config['socket_timeout'],
+            sentinel_kwargs={'socket_timeout': config['socket_timeout']}
+        )
+        return sentinel.master_for(
+            config['sentinel_master'], db=config['db'],
+            max_connections=config['max_conexoes'], **opcoes
+        )
+
+    if config['modo'] == 'cluster':
+        host, porta = config['nos_cluster'][0]
+        return RedisClusterAsync(host=host, port=porta, max_connections=config['max_conexoes'], **opcoes)
+
+    pool = redis_async.BlockingConnectionPool(
+        host=config['host'], port=config['port'], db=config['db'],
+        max_connections=config['max_conexoes'], timeout=config['timeout_pool'],
+        **opcoes
+    )
+    return redis_async.Redis(connection_pool=pool)
+
+
+def modo_cluster(cliente):
+    return isinstance(cliente, (RedisCluster, RedisClusterAsync))
+
+
+def status_pool(cliente):
+    """Uso do pool de conexões (modos simples e sentinel)"""
+    pool = getattr(cliente, 'connection_pool', None)
+    if pool is None:
+        return {'modo': 'cluster'}
+    status = {
+        'classe': type(pool).__name__,
+        'max_conexoes': pool.max_connections,
+    }
+    if hasattr(pool, '_in_use_connections'):
+        status['em_uso'] = len(pool._in_use_connections)
+    elif hasattr(pool, '_connections'):
+        # BlockingConnectionPool: conexões já abertas (em uso ou ociosas)
+        status['abertas'] = len(pool._connections)
+        status['timeout'] = pool.timeout
+    return status
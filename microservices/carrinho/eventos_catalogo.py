@@ -0,0 +1,83 @@
+"""
+Consumidor do feed de alterações do catálogo
+
+Lê o stream `catalogo:eventos` (publicado pelo outbox do catálogo) com
+XREAD bloqueante e chama `ao_receber(evento)` para cada alteração. Cada
+processo lê o stream inteiro (sem consumer group), já que cada worker tem
+o seu cache local para invalidar. Começa pelos eventos novos e, após uma
+falha de conexão, continua do último id lido.
+"""
+import json
+import threading
+import time
+
+STREAM_EVENTOS = 'catalogo:eventos'
+
+
+class ConsumidorEventosCatalogo:
+    def __init__(self, redis_client, ao_receber, stream=STREAM_EVENTOS, bloqueio_ms=5000, lote=100):
+        self.redis_client = redis_client
+        self.ao_receber = ao_receber
+        self.stream = stream
+        self.bloqueio_ms = bloqueio_ms
+        self.lote = lote
+
+        self.ultimo_id = '$'
+        self.recebidos = 0
+        self.falhas = 0
+
+    def ler(self):
+        """Espera e processa um lote de eventos; retorna quantos foram lidos"""
+        resposta = self.redis_client.xread(
+            {self.stream: self.ultimo_id}, count=self.lote, block=self.bloqueio_ms
+        )
+        lidos = 0
+        for _, mensagens in resposta or []:
+            for mensagem_id, campos in mensagens:
+                self.ultimo_id = mensagem_id
+                evento = dict(campos)
+                evento['dados'] = json.loads(evento.get('dados') or '{}')
+                evento['produto_id'] = int(evento['produto_id']) if evento.get('produto_id') else None
+                try:
+                    self.ao_receber(evento)
+                except Exception as e:
+                    print(f"Erro ao processar evento do catálogo {mensagem_id}: {e}")
+                lidos += 1
+        self.recebidos += lidos
+        return lidos
+
+    def iniciar(self):
+        """Thread em segundo plano que consome o stream"""
+
+        def executar():
+            while True:
+                try:
+                    self.ler()
+                except Exception as e:
+                    self.falhas += 1
+                    print(f"Erro ao ler eventos do catálogo: {e}")
+                    time.sleep(1)
+
+        thread = threading.Thread(target=executar, name='consumidor-eventos-catalogo', daemon=True)
+        thread.start()
+        return thread
+
+    def estatisticas(self):
+        return {
+            'stream': self.stream,
+            'ultimo_id': self.ultimo_id,
+            'recebidos': self.recebidos,
+            'falhas': self.falhas
+        }
+
+
+def invalidar_cache_produtos(cache_produtos):
+    """ao_receber que remove do cache de produtos o item alterado"""
+
+    def ao_receber(evento):
+        if evento['produto_id'] is None:
+            cache_produtos.invalidar()
+        else:
+            cache_produtos.invalidar(evento['produto_id'])
+
+    return ao_receber
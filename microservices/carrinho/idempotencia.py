@@ -0,0 +1,229 @@
+"""
+Deduplicação de escritas pelo cabeçalho Idempotency-Key
+
+A primeira requisição com uma chave marca a chave como "processando" no
+Redis (SET NX) e, ao terminar, guarda a resposta por `ttl` segundos. As
+repetições com a mesma chave recebem a resposta guardada (cabeçalho
+Idempotent-Replayed: true) sem executar a escrita de novo:
+
+- mesma chave com outro corpo: 422
+- mesma chave enquanto a primeira ainda executa: 409
+- respostas 5xx não são guardadas (a repetição executa de novo)
+
+Sem Redis configurado, sem o cabeçalho ou com o Redis fora do ar, a
+requisição segue normalmente.
+
+Cada microserviço é construído a partir da própria pasta (ver
+docker-compose.yml), então este arquivo existe em catalogo/ e carrinho/;
+as duas cópias devem continuar idênticas.
+"""
+import asyncio
+import functools
+import hashlib
+import json
+
+import redis
+from flask import Response, jsonify, make_response, request
+
+CABECALHO = 'Idempotency-Key'
+TAMANHO_MAXIMO_CHAVE = 255
+
+NOVA = 'nova'
+REPETIDA = 'repetida'
+PROCESSANDO = 'processando'
+CONFLITO = 'conflito'
+INDISPONIVEL = 'indisponivel'
+
+
+def impressao(metodo, caminho, corpo):
+    """Identifica o conteúdo da requisição (mesma chave, outro corpo = conflito)"""
+    return hashlib.sha256(metodo.encode() + b' ' + caminho.encode() + b'\n' + corpo).hexdigest()
+
+
+def avaliar(salvo, impressao_requisicao):
+    """(estado, resposta) a partir do valor salvo para uma chave"""
+    if salvo is None:
+        # Expirou entre o SET e o GET: segue sem deduplicar
+        return INDISPONIVEL, None
+    dados = json.loads(salvo)
+    if dados['impressao'] != impressao_requisicao:
+        return CONFLITO, None
+    if dados['estado'] == PROCESSANDO:
+        return PROCESSANDO, None
+    return REPETIDA, dados
+
+
+def recusa(estado):
+    """(corpo, status) para uma chave em conflito ou ainda em processamento"""
+    if estado == CONFLITO:
+        return {'success': False, 'error': f'{CABECALHO} já usada com outra requisição'}, 422
+    return {'success': False, 'error': f'Requisição com esta {CABECALHO} ainda em processamento'}, 409
+
+
+class RespostasIdempotentes:
+    """
+    Respostas guardadas num Redis síncrono (None desativa). O decorator
+    `idempotente` serve o Flask; `idempotente_async` serve o Quart,
+    executando as mesmas chamadas fora do event loop
+    """
+
+    def __init__(self, redis_client, ttl=86400, ttl_processamento=60, prefixo='idempotencia'):
+        self.redis_client = redis_client
+        self.ttl = ttl
+        # Uma requisição que morreu no meio libera a chave depois deste tempo
+        self.ttl_processamento = ttl_processamento
+        self.prefixo = prefixo
+
+        self.repetidas = 0
+        self.conflitos = 0
+        self.falhas = 0
+
+    @property
+    def ativo(self):
+        return self.redis_client is not None
+
+    def chave(self, escopo, chave_cliente):
+        return f'{self.prefixo}:{escopo}:{chave_cliente}'
+
+    def marcador(self, impressao_requisicao):
+        return json.dumps({'estado': PROCESSANDO, 'impressao': impressao_requisicao})
+
+    def concluida(self, impressao_requisicao, status, corpo, tipo):
+        return json.dumps({
+            'estado': 'concluida',
+            'impressao': impressao_requisicao,
+            'status': status,
+            'corpo': corpo,
+            'tipo': tipo
+        })
+
+    def contar(self, estado):
+        if estado == REPETIDA:
+            self.repetidas += 1
+        elif estado in (CONFLITO, PROCESSANDO):
+            self.conflitos += 1
+
+    def reservar(self, chave, impressao_requisicao):
+        """Marca a chave como em processamento. Retorna (estado, resposta_salva)"""
+        try:
+            if self.redis_client.set(chave, self.marcador(impressao_requisicao), nx=True, ex=self.ttl_processamento):
+                return NOVA, None
+            salvo = self.redis_client.get(chave)
+        except redis.RedisError as e:
+            self.falhas += 1
+            print(f"Erro ao consultar {CABECALHO} no Redis: {e}")
+            return INDISPONIVEL, None
+        return avaliar(salvo, impressao_requisicao)
+
+    def salvar(self, chave, impressao_requisicao, status, corpo, tipo):
+        try:
+            if status >= 500:
+                self.redis_client.delete(chave)
+                return
+            self.redis_client.set(chave, self.concluida(impressao_requisicao, status, corpo, tipo), ex=self.ttl)
+        except redis.RedisError as e:
+            self.falhas += 1
+            print(f"Erro ao salvar resposta idempotente: {e}")
+
+    async def reservar_async(self, chave, impressao_requisicao):
+        return await asyncio.to_thread(self.reservar, chave, impressao_requisicao)
+
+    async def salvar_async(self, chave, impressao_requisicao, status, corpo, tipo):
+        await asyncio.to_thread(self.salvar, chave, impressao_requisicao, status, corpo, tipo)
+
+    def idempotente(self, view):
+        """Decorator para endpoints de escrita do Flask"""
+
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            chave_cliente = request.headers.get(CABECALHO)
+            if not self.ativo or not chave_cliente:
+                return view(*args, **kwargs)
+            if len(chave_cliente) > TAMANHO_MAXIMO_CHAVE:
+                return jsonify({'success': False, 'error': f'{CABECALHO} muito longa'}), 400
+
+            chave = self.chave(request.endpoint, chave_cliente)
+            impressao_requisicao = impressao(request.method, request.path, request.get_data())
+            estado, salvo = self.reservar(chave, impressao_requisicao)
+            self.contar(estado)
+            if estado == REPETIDA:
+                return Response(salvo['corpo'], salvo['status'], mimetype=salvo['tipo'],
+                                headers={'Idempotent-Replayed': 'true'})
+            if estado in (CONFLITO, PROCESSANDO):
+                corpo, status = recusa(estado)
+                return jsonify(corpo), status
+
+            response = make_response(view(*args, **kwargs))
+            if estado == NOVA:
+                self.salvar(chave, impressao_requisicao, response.status_code,
+                            response.get_data(as_text=True), response.mimetype)
+            return response
+
+        return wrapper
+
+    def idempotente_async(self, view):
+        """Decorator para endpoints de escrita do Quart"""
+        from quart import Response as RespostaQuart, jsonify as jsonify_quart, make_response as make_response_quart
+        from quart import request as requisicao
+
+        @functools.wraps(view)
+        async def wrapper(*args, **kwargs):
+            chave_cliente = requisicao.headers.get(CABECALHO)
+            if not self.ativo or not chave_cliente:
+                return await view(*args, **kwargs)
+            if len(chave_cliente) > TAMANHO_MAXIMO_CHAVE:
+                return jsonify_quart({'success': False, 'error': f'{CABECALHO} muito longa'}), 400
+
+            chave = self.chave(requisicao.endpoint, chave_cliente)
+            impressao_requisicao = impressao(requisicao.method, requisicao.path, await requisicao.get_data())
+            estado, salvo = await self.reservar_async(chave, impressao_requisicao)
+            self.contar(estado)
+            if estado == REPETIDA:
+                return RespostaQuart(salvo['corpo'], salvo['status'], mimetype=salvo['tipo'],
+                                     headers={'Idempotent-Replayed': 'true'})
+            if estado in (CONFLITO, PROCESSANDO):
+                corpo, status = recusa(estado)
+                return jsonify_quart(corpo), status
+
+            response = await make_response_quart(await view(*args, **kwargs))
+            if estado == NOVA:
+                await self.salvar_async(chave, impressao_requisicao, response.status_code,
+                                        await response.get_data(as_text=True), response.mimetype)
+            return response
+
+        return wrapper
+
+    def estatisticas(self):
+        return {
+            'ativo': self.ativo,
+            'repetidas': self.repetidas,
+            'conflitos': self.conflitos,
+            'falhas': self.falhas
+        }
+
+
+class RespostasIdempotentesAsync(RespostasIdempotentes):
+    """Mesmo armazenamento com redis.asyncio, sem threads (use `idempotente_async`)"""
+
+    async def reservar_async(self, chave, impressao_requisicao):
+        try:
+            if await self.redis_client.set(chave, self.marcador(impressao_requisicao), nx=True,
+                                           ex=self.ttl_processamento):
+                return NOVA, None
+            salvo = await self.redis_client.get(chave)
+        except redis.RedisError as e:
+            self.falhas += 1
+            print(f"Erro ao consultar {CABECALHO} no Redis: {e}")
+            return INDISPONIVEL, None
+        return avaliar(salvo, impressao_requisicao)
+
+    async def salvar_async(self, chave, impressao_requisicao, status, corpo, tipo):
+        try:
+            if status >= 500:
+                await self.redis_client.delete(chave)
+                return
+            await self.redis_client.set(chave, self.concluida(impressao_requisicao, status, corpo, tipo),
+                                        ex=self.ttl)
+        except redis.RedisError as e:
+            self.falhas += 1
+            print(f"Erro ao salvar resposta idempotente: {e}")
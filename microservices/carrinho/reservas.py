@@ -0,0 +1,241 @@
+"""
+Reservas temporárias de estoque (holds) para itens de carrinho
+
+Ao adicionar um item, a sessão reserva a quantidade no Redis por
+RESERVA_TTL segundos (renovado a cada alteração). O catálogo desconta as
+reservas ativas de outras sessões do estoque disponível e, no checkout,
+converte as reservas da sessão na baixa de estoque.
+
+Chaves (a hash tag {produto_id} mantém as três no mesmo slot do Cluster):
+    reserva:{<produto_id>}:sessoes  hash  session_id -> quantidade
+    reserva:{<produto_id>}:expira   zset  session_id -> expiração (epoch)
+    reserva:{<produto_id>}:total    int   soma das reservas do produto
+    reservas:produtos               set   produtos com reservas
+    reservas:versao                 int   muda a cada alteração (cache do catálogo)
+
+Reservas vencidas são recuperadas pelo próprio script a cada alteração do
+produto e por um varredor periódico (iniciar_varredor).
+"""
+import asyncio
+import threading
+import time
+
+# Recupera as reservas vencidas do produto (KEYS: sessoes, expira, total)
+LUA_RECUPERAR_VENCIDAS = """
+local vencidas = redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', ARGV[1])
+for _, sessao in ipairs(vencidas) do
+    local quantidade = tonumber(redis.call('HGET', KEYS[1], sessao) or '0')
+    redis.call('HDEL', KEYS[1], sessao)
+    redis.call('DECRBY', KEYS[3], quantidade)
+end
+if #vencidas > 0 then
+    redis.call('ZREM', KEYS[2], unpack(vencidas))
+end
+"""
+
+# ARGV[1] = agora, ARGV[2] = session_id, ARGV[3] = quantidade final da
+# sessão (0 libera), ARGV[4] = estoque do produto (-1 = sem checagem),
+# ARGV[5] = expiração
+# Retorna {1, disponível restante} ou {0, disponível para a sessão}
+LUA_DEFINIR = LUA_RECUPERAR_VENCIDAS + """
+local atual = tonumber(redis.call('HGET', KEYS[1], ARGV[2]) or '0')
+local outros = tonumber(redis.call('GET', KEYS[3]) or '0') - atual
+local nova = tonumber(ARGV[3])
+local estoque = tonumber(ARGV[4])
+if nova > atual and estoque >= 0 and outros + nova > estoque then
+    return {0, estoque - outros}
+end
+if nova > 0 then
+    redis.call('HSET', KEYS[1], ARGV[2], nova)
+    redis.call('ZADD', KEYS[2], ARGV[5], ARGV[2])
+else
+    redis.call('HDEL', KEYS[1], ARGV[2])
+    redis.call('ZREM', KEYS[2], ARGV[2])
+end
+redis.call('INCRBY', KEYS[3], nova - atual)
+return {1, estoque - outros - nova}
+"""
+
+# Retorna quantas reservas ainda existem para o produto
+LUA_VARRER = LUA_RECUPERAR_VENCIDAS + """
+return redis.call('HLEN', KEYS[1])
+"""
+
+CHAVE_PRODUTOS = 'reservas:produtos'
+CHAVE_VERSAO = 'reservas:versao'
+CHAVE_LOCK_VARREDURA = 'reservas:varredura'
+
+
+class ReservaRecusada(Exception):
+    """Outras sessões já reservaram o estoque restante"""
+
+    def __init__(self, produto_id, disponivel):
+        self.produto_id = produto_id
+        self.disponivel = max(disponivel, 0)
+        super().__init__(f'Apenas {self.disponivel} unidade(s) disponível(is) do produto {produto_id}')
+
+
+class ReservasEstoque:
+    def __init__(self, redis_client, ttl, prefixo='reserva'):
+        self.redis_client = redis_client
+        self.ttl = ttl
+        self.prefixo = prefixo
+        self._definir = redis_client.register_script(LUA_DEFINIR)
+        self._varrer = redis_client.register_script(LUA_VARRER)
+
+        self.varreduras = 0
+        self.produtos_liberados = 0
+
+    def chaves(self, produto_id):
+        base = f'{self.prefixo}:{{{produto_id}}}'
+        return [f'{base}:sessoes', f'{base}:expira', f'{base}:total']
+
+    def definir(self, session_id, produto_id, quantidade, estoque=None):
+        """
+        Ajusta a reserva da sessão para `quantidade` (0 libera) e renova a
+        expiração. Com `estoque`, recusa aumentos que passem do estoque
+        menos as reservas de outras sessões (lança ReservaRecusada).
+        """
+        agora = time.time()
+        pipe = self.redis_client.pipeline(transaction=False)
+        self._definir(
+            keys=self.chaves(produto_id),
+            args=[agora, session_id, quantidade, -1 if estoque is None else estoque, agora + self.ttl],
+            client=pipe
+        )
+        if quantidade > 0:
+            pipe.sadd(CHAVE_PRODUTOS, produto_id)
+        pipe.incr(CHAVE_VERSAO)
+        resultado = pipe.execute()[0]
+        if not resultado[0]:
+            raise ReservaRecusada(produto_id, int(resultado[1]))
+
+    def liberar(self, session_id, produto_ids):
+        """Libera as reservas da sessão (item removido ou carrinho limpo)"""
+        if not produto_ids:
+            return
+        agora = time.time()
+        pipe = self.redis_client.pipeline(transaction=False)
+        for produto_id in produto_ids:
+            self._definir(
+                keys=self.chaves(produto_id),
+                args=[agora, session_id, 0, -1, agora],
+                client=pipe
+            )
+        pipe.incr(CHAVE_VERSAO)
+        pipe.execute()
+
+    def varrer(self):
+        """
+        Recupera reservas vencidas de todos os produtos. Um lock com
+        expiração evita que todos os workers varram ao mesmo tempo.
+        Retorna o número de produtos verificados (None se outro worker varreu)
+        """
+        intervalo = max(int(self.ttl / 10), 1)
+        if not self.redis_client.set(CHAVE_LOCK_VARREDURA, '1', nx=True, ex=intervalo):
+            return None
+
+        agora = time.time()
+        produtos = list(self.redis_client.smembers(CHAVE_PRODUTOS))
+        if not produtos:
+            return 0
+
+        pipe = self.redis_client.pipeline(transaction=False)
+        for produto_id in produtos:
+            self._varrer(keys=self.chaves(produto_id), args=[agora], client=pipe)
+        restantes = pipe.execute()
+
+        sem_reservas = [pid for pid, quantidade in zip(produtos, restantes) if not quantidade]
+        if sem_reservas:
+            self.redis_client.srem(CHAVE_PRODUTOS, *sem_reservas)
+        self.redis_client.incr(CHAVE_VERSAO)
+        self.varreduras += 1
+        self.produtos_liberados += len(sem_reservas)
+        return len(produtos)
+
+    def iniciar_varredor(self, intervalo):
+        """Thread em segundo plano que chama varrer() a cada `intervalo` segundos"""
+
+        def executar():
+            while True:
+                time.sleep(intervalo)
+                try:
+                    self.varrer()
+                except Exception as e:
+                    print(f"Erro na varredura de reservas: {e}")
+
+        thread = threading.Thread(target=executar, name='varredor-reservas', daemon=True)
+        thread.start()
+        return thread
+
+    def estatisticas(self):
+        return {
+            'ttl': self.ttl,
+            'varreduras': self.varreduras,
+            'produtos_liberados': self.produtos_liberados
+        }
+
+
+class ReservasEstoqueAsync(ReservasEstoque):
+    """Mesmas operações com um cliente redis.asyncio (app_async.py)"""
+
+    async def definir(self, session_id, produto_id, quantidade, estoque=None):
+        agora = time.time()
+        async with self.redis_client.pipeline(transaction=False) as pipe:
+            await self._definir(
+                keys=self.chaves(produto_id),
+                args=[agora, session_id, quantidade, -1 if estoque is None else estoque, agora + self.ttl],
+                client=pipe
+            )
+            if quantidade > 0:
+                pipe.sadd(CHAVE_PRODUTOS, produto_id)
+            pipe.incr(CHAVE_VERSAO)
+            resultado = (await pipe.execute())[0]
+        if not resultado[0]:
+            raise ReservaRecusada(produto_id, int(resultado[1]))
+
+    async def liberar(self, session_id, produto_ids):
+        if not produto_ids:
+            return
+        agora = time.time()
+        async with self.redis_client.pipeline(transaction=False) as pipe:
+            for produto_id in produto_ids:
+                await self._definir(
+                    keys=self.chaves(produto_id),
+                    args=[agora, session_id, 0, -1, agora],
+                    client=pipe
+                )
+            pipe.incr(CHAVE_VERSAO)
+            await pipe.execute()
+
+    async def varrer(self):
+        intervalo = max(int(self.ttl / 10), 1)
+        if not await self.redis_client.set(CHAVE_LOCK_VARREDURA, '1', nx=True, ex=intervalo):
+            return None
+
+        agora = time.time()
+        produtos = list(await self.redis_client.smembers(CHAVE_PRODUTOS))
+        if not produtos:
+            return 0
+
+        async with self.redis_client.pipeline(transaction=False) as pipe:
+            for produto_id in produtos:
+                await self._varrer(keys=self.chaves(produto_id), args=[agora], client=pipe)
+            restantes = await pipe.execute()
+
+        sem_reservas = [pid for pid, quantidade in zip(produtos, restantes) if not quantidade]
+        if sem_reservas:
+            await self.redis_client.srem(CHAVE_PRODUTOS, *sem_reservas)
+        await self.redis_client.incr(CHAVE_VERSAO)
+        self.varreduras += 1
+        self.produtos_liberados += len(sem_reservas)
+        return len(produtos)
+
+    async def executar_varredor(self, intervalo):
+        """Laço de varredura para rodar como tarefa do event loop"""
+        while True:
+            await asyncio.sleep(intervalo)
+            try:
+                await self.varrer()
+            except Exception as e:
+                print(f"Erro na varredura de reservas: {e}")
@@ -0,0 +1,86 @@
+"""
+Validação do carrinho: o catálogo desconta as reservas de outras sessões,
+não as da própria sessão (pytest, com fakeredis no lugar do Redis)
+"""
+import os
+
+import pytest
+
+fakeredis = pytest.importorskip('fakeredis')
+pytest.importorskip('lupa')  # scripts Lua no fakeredis
+pytest.importorskip('flask')
+
+# Sem threads em segundo plano ao importar o app
+os.environ['RESERVA_VARREDOR'] = 'False'
+os.environ['EVENTOS_CATALOGO'] = 'False'
+
+import app as carrinho_app  # noqa: E402
+from cache_produtos import CacheProdutos  # noqa: E402
+from carrinho_redis import RepositorioCarrinho  # noqa: E402
+from reservas import ReservasEstoque  # noqa: E402
+
+ESTOQUE = 3
+
+
+class RespostaFalsa:
+    status_code = 200
+
+    def __init__(self, dados):
+        self.dados = dados
+
+    def json(self):
+        return self.dados
+
+
+@pytest.fixture
+def redis_falso(monkeypatch):
+    redis_client = fakeredis.FakeRedis(decode_responses=True)
+    reservas = ReservasEstoque(redis_client, 900)
+    monkeypatch.setattr(carrinho_app, 'carrinhos', RepositorioCarrinho(redis_client, carrinho_app.CARRINHO_TTL))
+    monkeypatch.setattr(carrinho_app, 'reservas', reservas)
+    monkeypatch.setattr(carrinho_app, 'cache_produtos', CacheProdutos())
+
+    def validar_no_catalogo(caminho, json=None, **kwargs):
+        # Mesma conta do catálogo (microservices/catalogo/reservas.py): estoque
+        # menos o total reservado, sem as reservas da sessão informada
+        itens = []
+        for item in json['itens']:
+            sessoes, _, total = reservas.chaves(item['produto_id'])
+            reservado = int(redis_client.get(total) or 0)
+            if json.get('session_id'):
+                reservado -= int(redis_client.hget(sessoes, json['session_id']) or 0)
+            disponivel = ESTOQUE - reservado >= item['quantidade']
+            itens.append({
+                'produto_id': item['produto_id'],
+                'quantidade_solicitada': item['quantidade'],
+                'estoque_atual': ESTOQUE,
+                'estoque_reservado': reservado,
+                'disponivel': disponivel,
+                'motivo': None if disponivel else 'estoque_insuficiente'
+            })
+        return RespostaFalsa({'success': True, 'data': {'itens': itens}})
+
+    monkeypatch.setattr(carrinho_app.catalogo_client, 'post', validar_no_catalogo)
+    return redis_client
+
+
+def test_carrinho_com_todo_o_estoque_reservado_e_valido(redis_falso):
+    carrinho_app.reservas.definir('sessao-1', 1, ESTOQUE, estoque=ESTOQUE)
+    carrinho_app.carrinhos.adicionar('sessao-1', 1, ESTOQUE, limite=ESTOQUE)
+
+    response = carrinho_app.app.test_client().post('/api/carrinho/sessao-1/validar', json={})
+
+    dados = response.get_json()['data']
+    assert dados['valido'] is True
+    assert dados['itens'][0]['estoque_reservado'] == 0
+
+
+def test_reserva_de_outra_sessao_continua_descontada(redis_falso):
+    carrinho_app.reservas.definir('sessao-2', 1, ESTOQUE, estoque=ESTOQUE)
+    carrinho_app.carrinhos.adicionar('sessao-1', 1, 1, limite=ESTOQUE)
+
+    response = carrinho_app.app.test_client().post('/api/carrinho/sessao-1/validar', json={})
+
+    dados = response.get_json()['data']
+    assert dados['valido'] is False
+    assert dados['itens'][0]['motivo'] == 'estoque_insuficiente'
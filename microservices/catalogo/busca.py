@@ -0,0 +1,181 @@
+"""
+Busca textual de produtos
+PostgreSQL: tsvector em português (com unaccent) indexado por GIN, mais
+índice de trigramas (pg_trgm) sobre o nome para termos parciais.
+Outros bancos (SQLite em desenvolvimento): índice invertido em memória.
+"""
+import re
+import threading
+import unicodedata
+
+from sqlalchemy import case, func, literal_column, or_, text
+
+DDL_BUSCA_POSTGRES = [
+    "CREATE EXTENSION IF NOT EXISTS unaccent",
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    # unaccent() não é IMMUTABLE e não pode ser usado em índices/colunas geradas
+    """
+    CREATE OR REPLACE FUNCTION f_unaccent(text) RETURNS text AS
+    $$ SELECT public.unaccent('public.unaccent', $1) $$
+    LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT
+    """,
+    """
+    ALTER TABLE produtos ADD COLUMN IF NOT EXISTS busca_vetor tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('portuguese', f_unaccent(coalesce(nome, ''))), 'A') ||
+        setweight(to_tsvector('portuguese', f_unaccent(coalesce(descricao, ''))), 'B')
+    ) STORED
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_produtos_busca_vetor ON produtos USING GIN (busca_vetor)",
+    "CREATE INDEX IF NOT EXISTS idx_produtos_nome_trgm ON produtos USING GIN (f_unaccent(lower(nome)) gin_trgm_ops)",
+]
+
+
+def normalizar(texto):
+    """Minúsculas e sem acentos"""
+    texto = unicodedata.normalize('NFKD', (texto or '').lower())
+    return ''.join(c for c in texto if not unicodedata.combining(c))
+
+
+def radical(token):
+    """Stemming leve para português (plurais mais comuns)"""
+    for sufixo, troca in (('oes', 'ao'), ('aes', 'ao'), ('ns', 'm'), ('eis', 'el'), ('s', '')):
+        if len(token) > len(sufixo) and token.endswith(sufixo):
+            return token[:-len(sufixo)] + troca
+    return token
+
+
+def tokenizar(texto):
+    return re.findall(r'\w+', normalizar(texto))
+
+
+class IndiceMemoria:
+    """Índice invertido simples (radical -> ids) usado quando não há PostgreSQL"""
+
+    def __init__(self):
+        self.versao = None
+        self.nomes = {}
+        self.descricoes = {}
+        self._lock = threading.Lock()
+
+    def reconstruir(self, versao, linhas):
+        nomes = {}
+        descricoes = {}
+        for produto_id, nome, descricao in linhas:
+            for token in tokenizar(nome):
+                nomes.setdefault(radical(token), set()).add(produto_id)
+            for token in tokenizar(descricao):
+                descricoes.setdefault(radical(token), set()).add(produto_id)
+        with self._lock:
+            self.nomes = nomes
+            self.descricoes = descricoes
+            self.versao = versao
+
+    def buscar(self, termo):
+        """
+        Todos os termos precisam casar (por prefixo do radical);
+        casar no nome vale mais que na descrição.
+        Retorna {produto_id: relevancia}
+        """
+        tokens = [radical(token) for token in tokenizar(termo)]
+        if not tokens:
+            return {}
+
+        with self._lock:
+            resultado = None
+            for token in tokens:
+                pontos = {}
+                for indice, peso in ((self.descricoes, 1.0), (self.nomes, 2.0)):
+                    for chave, ids in indice.items():
+                        if chave.startswith(token):
+                            for produto_id in ids:
+                                pontos[produto_id] = max(pontos.get(produto_id, 0.0), peso)
+                if resultado is None:
+                    resultado = pontos
+                else:
+                    resultado = {
+                        produto_id: resultado[produto_id] + peso
+                        for produto_id, peso in pontos.items()
+                        if produto_id in resultado
+                    }
+                if not resultado:
+                    return {}
+            return resultado
+
+
+class BuscaProdutos:
+    """Monta o filtro e a relevância da busca conforme o banco em uso"""
+
+    def __init__(self, db, modelo):
+        self.db = db
+        self.modelo = modelo
+        self.postgres = False
+        self.indice_memoria = IndiceMemoria()
+
+    def preparar(self):
+        """Cria extensões, coluna tsvector e índices (PostgreSQL)"""
+        if self.db.engine.dialect.name != 'postgresql':
+            print("ℹ️  Busca textual usando índice em memória")
+            return
+        try:
+            with self.db.engine.begin() as conexao:
+                for ddl in DDL_BUSCA_POSTGRES:
+                    conexao.execute(text(ddl))
+            self.postgres = True
+            print("✅ Índices de busca textual criados/verificados")
+        except Exception as e:
+            # Réplicas (somente leitura) não aceitam DDL, mas já recebem os índices do primário
+            if self._indices_existem():
+                self.postgres = True
+                print("✅ Índices de busca textual encontrados")
+            else:
+                print(f"⚠️  Busca textual sem índices do PostgreSQL, usando índice em memória: {e}")
+
+    def _indices_existem(self):
+        try:
+            with self.db.engine.connect() as conexao:
+                return conexao.execute(text(
+                    "SELECT 1 FROM pg_indexes WHERE indexname = 'idx_produtos_busca_vetor'"
+                )).first() is not None
+        except Exception:
+            return False
+
+    def _atualizar_indice_memoria(self):
+        Produto = self.modelo
+        versao = self.db.session.query(
+            func.count(Produto.id), func.max(Produto.atualizado_em)
+        ).one()
+        versao = tuple(versao)
+        if versao != self.indice_memoria.versao:
+            linhas = self.db.session.query(Produto.id, Produto.nome, Produto.descricao).all()
+            self.indice_memoria.reconstruir(versao, linhas)
+
+    def filtro(self, termo):
+        """
+        Retorna (condição, relevância) para aplicar na consulta de produtos
+        ou None se o termo não tiver palavras pesquisáveis
+        """
+        tokens = tokenizar(termo)
+        if not tokens:
+            return None
+        Produto = self.modelo
+
+        if self.postgres:
+            # Cada palavra vira um prefixo: "bolo choc" -> bolo:* & choc:*
+            tsquery = func.to_tsquery('portuguese', ' & '.join(f'{token}:*' for token in tokens))
+            vetor = literal_column('produtos.busca_vetor')
+            nome = func.f_unaccent(func.lower(Produto.nome))
+            termo_normalizado = ' '.join(tokens)
+            condicao = or_(
+                vetor.op('@@')(tsquery),
+                nome.like(f'%{termo_normalizado}%')
+            )
+            relevancia = func.ts_rank(vetor, tsquery) + func.similarity(nome, termo_normalizado)
+            return condicao, relevancia
+
+        self._atualizar_indice_memoria()
+        pontos = self.indice_memoria.buscar(termo)
+        if not pontos:
+            return Produto.id.in_([]), literal_column('0')
+        relevancia = case(pontos, value=Produto.id, else_=0.0)
+        return Produto.id.in_(list(pontos)), relevancia
@@ -0,0 +1,120 @@
+"""
+Cache de respostas HTTP do catálogo
+Respostas GET são guardadas por rota + query string e identificadas por
+um ETag derivado da versão do catálogo. Requisições condicionais
+(If-None-Match / If-Modified-Since) recebem 304 sem reconsultar o banco.
+"""
+import functools
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from datetime import timezone
+from urllib.parse import urlencode
+
+from flask import Response, make_response, request
+
+
+class CacheRespostas:
+    """Cache em memória (por worker) de respostas GET versionadas"""
+
+    def __init__(self, obter_versao, max_itens=500, ttl_versao=1.0, max_age=5):
+        # obter_versao() -> (versao, ultima_modificacao: datetime | None)
+        self.obter_versao = obter_versao
+        self.max_itens = max_itens
+        self.ttl_versao = ttl_versao
+        self.max_age = max_age
+
+        self._respostas = OrderedDict()
+        self._versao = None
+        self._versao_expira = 0.0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.nao_modificados = 0
+
+    def versao_atual(self):
+        """Versão do catálogo, memorizada por `ttl_versao` segundos"""
+        agora = time.monotonic()
+        with self._lock:
+            if self._versao is not None and agora < self._versao_expira:
+                return self._versao
+        versao = self.obter_versao()
+        with self._lock:
+            self._versao = versao
+            self._versao_expira = agora + self.ttl_versao
+        return versao
+
+    def invalidar(self):
+        """Descarta respostas e a versão memorizada (chamado após escritas)"""
+        with self._lock:
+            self._respostas.clear()
+            self._versao = None
+
+    def _chave(self):
+        return f'{request.path}?{urlencode(sorted(request.args.items(multi=True)))}'
+
+    def _cabecalhos(self, response, etag, ultima_modificacao):
+        response.set_etag(etag)
+        if ultima_modificacao is not None:
+            response.last_modified = ultima_modificacao.replace(tzinfo=timezone.utc)
+        response.headers['Cache-Control'] = f'public, max-age={self.max_age}'
+        return response
+
+    def _nao_modificado(self, etag, ultima_modificacao):
+        if request.if_none_match:
+            return request.if_none_match.contains(etag)
+        if request.if_modified_since and ultima_modificacao is not None:
+            return ultima_modificacao.replace(tzinfo=timezone.utc, microsecond=0) <= request.if_modified_since
+        return False
+
+    def em_cache(self, view):
+        """Decorator para endpoints GET de leitura do catálogo"""
+
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            versao, ultima_modificacao = self.versao_atual()
+            chave = self._chave()
+            etag = hashlib.sha1(f'{chave}|{versao}'.encode()).hexdigest()
+
+            if self._nao_modificado(etag, ultima_modificacao):
+                with self._lock:
+                    self.nao_modificados += 1
+                return self._cabecalhos(Response(status=304), etag, ultima_modificacao)
+
+            with self._lock:
+                guardada = self._respostas.get(chave)
+                if guardada and guardada[0] == etag:
+                    self._respostas.move_to_end(chave)
+                    self.hits += 1
+                else:
+                    guardada = None
+                    self.misses += 1
+
+            if guardada:
+                response = Response(guardada[1], status=200, mimetype='application/json')
+                return self._cabecalhos(response, etag, ultima_modificacao)
+
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+
+            with self._lock:
+                self._respostas[chave] = (etag, response.get_data())
+                self._respostas.move_to_end(chave)
+                while len(self._respostas) > self.max_itens:
+                    self._respostas.popitem(last=False)
+            return self._cabecalhos(response, etag, ultima_modificacao)
+
+        return wrapper
+
+    def estatisticas(self):
+        with self._lock:
+            return {
+                'respostas': len(self._respostas),
+                'max_itens': self.max_itens,
+                'hits': self.hits,
+                'misses': self.misses,
+                'nao_modificados': self.nao_modificados
+            }
@@ -0,0 +1,146 @@
+"""
+Feed de alterações do catálogo (outbox transacional + Redis Streams)
+
+As escritas registram um evento na tabela eventos_catalogo na mesma
+transação da alteração (registrar), então nenhum evento se perde nem é
+publicado para uma alteração desfeita. Um publicador em segundo plano lê
+os eventos pendentes, envia cada um ao stream `catalogo:eventos` (XADD,
+com tamanho limitado) e ao canal pub/sub de mesmo nome, e marca-os como
+publicados.
+
+A entrega é "pelo menos uma vez": se o commit da marcação falhar, o evento
+é reenviado. Os consumidores só invalidam caches, o que é idempotente.
+
+Campos de cada evento: evento_id, tipo, produto_id, dados (JSON), criado_em
+"""
+import json
+import threading
+import time
+from datetime import datetime, timedelta
+
+import redis
+from sqlalchemy import delete, select
+
+STREAM_EVENTOS = 'catalogo:eventos'
+CANAL_EVENTOS = 'catalogo:eventos'
+
+
+class PublicadorEventos:
+    def __init__(self, app, db, modelo, url, stream=STREAM_EVENTOS, canal=CANAL_EVENTOS,
+                 tamanho_stream=10000, lote=100, intervalo=1.0, retencao_horas=24):
+        self.app = app
+        self.db = db
+        self.modelo = modelo
+        self.stream = stream
+        self.canal = canal
+        self.tamanho_stream = tamanho_stream
+        self.lote = lote
+        self.intervalo = intervalo
+        self.retencao = timedelta(hours=retencao_horas)
+
+        self.redis_client = None
+        if url:
+            self.redis_client = redis.Redis.from_url(
+                url, decode_responses=True, socket_timeout=1.0, socket_connect_timeout=1.0
+            )
+
+        self._acordar = threading.Event()
+        self._thread = None
+        self._ultima_limpeza = 0.0
+
+        self.publicados = 0
+        self.falhas = 0
+
+    @property
+    def ativo(self):
+        return self.redis_client is not None
+
+    def evento(self, tipo, produto_id, **dados):
+        """Linha do outbox a adicionar na transação (None com o feed desativado)"""
+        if not self.ativo:
+            return None
+        return self.modelo(tipo=tipo, produto_id=produto_id, dados=json.dumps(dados))
+
+    def registrar(self, tipo, produto_id, **dados):
+        """Adiciona o evento à transação atual (sem commit)"""
+        evento = self.evento(tipo, produto_id, **dados)
+        if evento is not None:
+            self.db.session.add(evento)
+
+    def notificar(self):
+        """Acorda o publicador logo após um commit com eventos"""
+        self._acordar.set()
+
+    def publicar_pendentes(self):
+        """Publica um lote de eventos pendentes; retorna quantos foram publicados"""
+        sessao = self.db.session
+        try:
+            consulta = (
+                select(self.modelo)
+                .where(self.modelo.publicado_em.is_(None))
+                .order_by(self.modelo.id)
+                .limit(self.lote)
+            )
+            if self.db.engine.dialect.name == 'postgresql':
+                # Vários workers publicando sem pegar os mesmos eventos
+                consulta = consulta.with_for_update(skip_locked=True)
+            eventos = sessao.execute(consulta).scalars().all()
+            if not eventos:
+                sessao.rollback()
+                return 0
+
+            pipe = self.redis_client.pipeline(transaction=False)
+            for evento in eventos:
+                campos = evento.campos()
+                pipe.xadd(self.stream, campos, maxlen=self.tamanho_stream, approximate=True)
+                pipe.publish(self.canal, json.dumps(campos))
+            pipe.execute()
+
+            agora = datetime.utcnow()
+            for evento in eventos:
+                evento.publicado_em = agora
+            sessao.commit()
+            self.publicados += len(eventos)
+            return len(eventos)
+        except Exception:
+            sessao.rollback()
+            raise
+
+    def limpar_publicados(self):
+        """Remove eventos publicados há mais que o tempo de retenção"""
+        limite = datetime.utcnow() - self.retencao
+        self.db.session.execute(
+            delete(self.modelo).where(self.modelo.publicado_em < limite)
+        )
+        self.db.session.commit()
+
+    def _executar(self):
+        while True:
+            self._acordar.wait(self.intervalo)
+            self._acordar.clear()
+            try:
+                with self.app.app_context():
+                    while self.publicar_pendentes() == self.lote:
+                        pass
+                    if time.monotonic() - self._ultima_limpeza > 3600:
+                        self.limpar_publicados()
+                        self._ultima_limpeza = time.monotonic()
+            except Exception as e:
+                self.falhas += 1
+                print(f"Erro ao publicar eventos do catálogo: {e}")
+
+    def iniciar(self):
+        """Thread em segundo plano que publica os eventos pendentes"""
+        if not self.ativo or self._thread is not None:
+            return None
+        self._thread = threading.Thread(target=self._executar, name='publicador-eventos', daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def estatisticas(self):
+        return {
+            'ativo': self.ativo,
+            'stream': self.stream,
+            'publicados': self.publicados,
+            'falhas': self.falhas
+        }
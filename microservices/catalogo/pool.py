@@ -0,0 +1,148 @@
+"""
+Configuração do pool de conexões do SQLAlchemy
+Tamanho, overflow, timeouts e reciclagem configuráveis por ambiente,
+modo compatível com PgBouncer em transaction pooling e métricas do pool
+"""
+import os
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import TimeoutError as TimeoutPool
+from sqlalchemy.pool import QueuePool
+
+
+class PoolMedido(QueuePool):
+    """QueuePool que mede o tempo de espera por uma conexão livre"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._lock_metricas = threading.Lock()
+        self.esperas = 0
+        self.espera_total = 0.0
+        self.espera_maxima = 0.0
+        self.timeouts = 0
+        self.erros_conexao = 0
+
+    def _do_get(self):
+        inicio = time.perf_counter()
+        try:
+            return super()._do_get()
+        except TimeoutPool:
+            # Esgotou pool_timeout esperando uma conexão livre
+            with self._lock_metricas:
+                self.timeouts += 1
+            raise
+        except Exception:
+            # Falha ao abrir uma conexão nova (banco fora, autenticação...)
+            with self._lock_metricas:
+                self.erros_conexao += 1
+            raise
+        finally:
+            espera = time.perf_counter() - inicio
+            with self._lock_metricas:
+                self.esperas += 1
+                self.espera_total += espera
+                self.espera_maxima = max(self.espera_maxima, espera)
+
+
+def modo_pgbouncer():
+    return os.getenv('DB_PGBOUNCER', 'False') == 'True'
+
+
+def statement_timeout_ms():
+    return int(os.getenv('DB_STATEMENT_TIMEOUT_MS', 5000))
+
+
+def opcoes_pool(pool_size_padrao=5):
+    return {
+        'pool_size': int(os.getenv('DB_POOL_SIZE', pool_size_padrao)),
+        'max_overflow': int(os.getenv('DB_POOL_MAX_OVERFLOW', 5)),
+        'pool_timeout': float(os.getenv('DB_POOL_TIMEOUT', 5)),
+        'pool_recycle': int(os.getenv('DB_POOL_RECYCLE', 1800)),
+        'pool_pre_ping': os.getenv('DB_POOL_PRE_PING', 'True') == 'True',
+        # LIFO reaproveita as conexões mais recentes e deixa as ociosas expirarem
+        'pool_use_lifo': True,
+    }
+
+
+def opcoes_engine(url):
+    """Opções de create_engine a partir das variáveis de ambiente"""
+    if not url.startswith('postgresql'):
+        return {}
+
+    opcoes = {'poolclass': PoolMedido, **opcoes_pool()}
+
+    connect_args = {
+        'connect_timeout': int(os.getenv('DB_CONNECT_TIMEOUT', 5)),
+        'application_name': os.getenv('DB_APPLICATION_NAME', 'catalogo-service'),
+    }
+    if modo_pgbouncer():
+        # Em transaction pooling a conexão do servidor muda a cada transação:
+        # nada de parâmetros de sessão nem prepared statements no servidor
+        # (psycopg2 não os usa; psycopg 3 precisa de prepare_threshold=None)
+        if url.startswith('postgresql+psycopg://'):
+            connect_args['prepare_threshold'] = None
+    elif statement_timeout_ms():
+        connect_args['options'] = f'-c statement_timeout={statement_timeout_ms()}'
+    opcoes['connect_args'] = connect_args
+    return opcoes
+
+
+def url_async(url):
+    """postgresql://... -> postgresql+asyncpg://... (driver assíncrono)"""
+    return make_url(url).set(drivername='postgresql+asyncpg')
+
+
+def opcoes_engine_async():
+    """
+    Opções de create_async_engine (asyncpg) com as mesmas variáveis de
+    ambiente; o pool padrão é maior porque um único processo atende
+    muitas requisições simultâneas
+    """
+    opcoes = opcoes_pool(pool_size_padrao=20)
+    server_settings = {'application_name': os.getenv('DB_APPLICATION_NAME', 'catalogo-service-async')}
+    connect_args = {'timeout': int(os.getenv('DB_CONNECT_TIMEOUT', 5))}
+    if modo_pgbouncer():
+        # asyncpg prepara todos os comandos: sem cache de prepared statements
+        connect_args['statement_cache_size'] = 0
+    elif statement_timeout_ms():
+        server_settings['statement_timeout'] = str(statement_timeout_ms())
+    connect_args['server_settings'] = server_settings
+    opcoes['connect_args'] = connect_args
+    return opcoes
+
+
+def configurar_engine(engine):
+    """Eventos por engine: statement_timeout por transação no modo PgBouncer"""
+    if engine.dialect.name != 'postgresql' or not modo_pgbouncer() or not statement_timeout_ms():
+        return
+
+    @event.listens_for(engine, 'begin')
+    def aplicar_statement_timeout(conexao):
+        # SET LOCAL vale só para a transação corrente (seguro no PgBouncer)
+        conexao.exec_driver_sql(f'SET LOCAL statement_timeout = {statement_timeout_ms()}')
+
+
+def metricas_pool(engine):
+    pool = engine.pool
+    metricas = {'classe': type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        metricas.update({
+            'tamanho': pool.size(),
+            'em_uso': pool.checkedout(),
+            'livres': pool.checkedin(),
+            'overflow': pool.overflow(),
+            'timeout': pool.timeout(),
+        })
+    if isinstance(pool, PoolMedido):
+        with pool._lock_metricas:
+            metricas.update({
+                'esperas': pool.esperas,
+                'espera_media_ms': round(pool.espera_total / pool.esperas * 1000, 3) if pool.esperas else 0.0,
+                'espera_maxima_ms': round(pool.espera_maxima * 1000, 3),
+                'timeouts': pool.timeouts,
+                'erros_conexao': pool.erros_conexao,
+            })
+    return metricas
@@ -0,0 +1,111 @@
+"""
+Leitura das reservas temporárias dos carrinhos (holds)
+
+O serviço de carrinho reserva no Redis a quantidade de cada item por
+alguns minutos (microservices/carrinho/reservas.py). O catálogo desconta
+essas reservas do estoque disponível e, ao reservar o estoque no checkout,
+consome as reservas da sessão.
+
+Sem RESERVAS_REDIS_URL as reservas são ignoradas, e com o Redis fora do ar
+o catálogo segue usando apenas o estoque do banco.
+"""
+import redis
+
+# Mesmo layout de chaves do carrinho
+CHAVE_VERSAO = 'reservas:versao'
+
+# Remove a reserva da sessão de um produto. KEYS: sessoes, expira, total;
+# ARGV[1] = session_id. Retorna a quantidade consumida
+LUA_CONSUMIR = """
+local quantidade = tonumber(redis.call('HGET', KEYS[1], ARGV[1]) or '0')
+if quantidade > 0 then
+    redis.call('HDEL', KEYS[1], ARGV[1])
+    redis.call('ZREM', KEYS[2], ARGV[1])
+    redis.call('DECRBY', KEYS[3], quantidade)
+end
+return quantidade
+"""
+
+
+class ReservasCarrinho:
+    def __init__(self, url, prefixo='reserva', socket_timeout=0.5):
+        self.prefixo = prefixo
+        self.redis_client = None
+        if url:
+            self.redis_client = redis.Redis.from_url(
+                url,
+                decode_responses=True,
+                socket_timeout=socket_timeout,
+                socket_connect_timeout=socket_timeout
+            )
+            self._consumir = self.redis_client.register_script(LUA_CONSUMIR)
+
+        self.falhas = 0
+
+    @property
+    def ativo(self):
+        return self.redis_client is not None
+
+    def chaves(self, produto_id):
+        base = f'{self.prefixo}:{{{produto_id}}}'
+        return [f'{base}:sessoes', f'{base}:expira', f'{base}:total']
+
+    def reservados(self, produto_ids, excluir_sessao=None):
+        """
+        Quantidade reservada em carrinhos por produto ({produto_id: int}),
+        sem contar as reservas de `excluir_sessao`. Um único round-trip.
+        """
+        produto_ids = list(produto_ids)
+        if not self.ativo or not produto_ids:
+            return {}
+        try:
+            pipe = self.redis_client.pipeline(transaction=False)
+            for produto_id in produto_ids:
+                sessoes, _, total = self.chaves(produto_id)
+                pipe.get(total)
+                if excluir_sessao:
+                    pipe.hget(sessoes, excluir_sessao)
+            valores = pipe.execute()
+        except redis.RedisError as e:
+            self.falhas += 1
+            print(f"Reservas indisponíveis, usando apenas o estoque: {e}")
+            return {}
+
+        passo = 2 if excluir_sessao else 1
+        resultado = {}
+        for indice, produto_id in enumerate(produto_ids):
+            reservado = int(valores[indice * passo] or 0)
+            if excluir_sessao:
+                reservado -= int(valores[indice * passo + 1] or 0)
+            resultado[produto_id] = max(reservado, 0)
+        return resultado
+
+    def consumir(self, session_id, produto_ids):
+        """
+        Converte as reservas da sessão em baixa definitiva (chamado após o
+        commit da reserva de estoque). Se falhar, as reservas expiram sozinhas.
+        """
+        if not self.ativo or not session_id:
+            return
+        try:
+            pipe = self.redis_client.pipeline(transaction=False)
+            for produto_id in produto_ids:
+                self._consumir(keys=self.chaves(produto_id), args=[session_id], client=pipe)
+            pipe.incr(CHAVE_VERSAO)
+            pipe.execute()
+        except redis.RedisError as e:
+            self.falhas += 1
+            print(f"Erro ao consumir reservas da sessão {session_id}: {e}")
+
+    def versao(self):
+        """Contador alterado a cada reserva (compõe a versão do cache HTTP)"""
+        if not self.ativo:
+            return None
+        try:
+            return self.redis_client.get(CHAVE_VERSAO)
+        except redis.RedisError:
+            self.falhas += 1
+            return None
+
+    def estatisticas(self):
+        return {'ativo': self.ativo, 'falhas': self.falhas}
@@ -0,0 +1,168 @@
+"""
+Roteamento de leitura/escrita entre o banco primário e réplicas
+- Endpoints de leitura usam uma réplica saudável; escritas vão ao primário
+- Read-your-writes: depois de uma escrita o cliente lê do primário por
+  alguns segundos (cookie) ou quando pede com o header X-Consistencia: forte
+- Réplicas com atraso acima do limite, fora do ar ou que não estão em
+  recuperação (não são standby de verdade) são ignoradas até a próxima
+  verificação; sem réplica disponível tudo vai para o primário
+"""
+import random
+import threading
+import time
+
+from flask import g, has_request_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import create_engine, event, text
+
+COOKIE_ESCRITA = 'catalogo_ultima_escrita'
+METODOS_LEITURA = ('GET', 'HEAD', 'OPTIONS')
+
+# Atraso 0 quando a réplica já aplicou todo o WAL recebido: com o primário
+# ocioso, now() - pg_last_xact_replay_timestamp() só cresce mesmo sem atraso
+SQL_ESTADO_REPLICA = """
+    SELECT pg_is_in_recovery(),
+           CASE
+               WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+               ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+           END
+"""
+
+
+def somente_leitura(view):
+    """Marca um endpoint não-GET (ex.: consulta em lote via POST) como leitura"""
+    view.somente_leitura = True
+    return view
+
+
+def usar_primario(view):
+    """Força um endpoint de leitura a usar o primário"""
+    view.usar_primario = True
+    return view
+
+
+class Replica:
+    def __init__(self, url, fabrica_engine):
+        self.url = url
+        self.engine = fabrica_engine(url)
+        self.disponivel = False
+        self.atraso = None
+        self.erro = None
+        self.verificado_em = 0.0
+        # Falha de conexão durante uma consulta tira a réplica de rotação
+        event.listen(self.engine, 'handle_error', self._ao_falhar)
+
+    def _ao_falhar(self, contexto):
+        if contexto.is_disconnect or contexto.connection is None:
+            self.disponivel = False
+            self.erro = str(contexto.original_exception)
+
+    def status(self):
+        return {
+            'url': self.engine.url.render_as_string(hide_password=True),
+            'disponivel': self.disponivel,
+            'atraso_segundos': self.atraso,
+            'erro': self.erro
+        }
+
+
+class RoteadorBanco:
+    def __init__(self, app, urls_replicas, fabrica_engine=create_engine, atraso_maximo=5.0,
+                 intervalo_verificacao=10.0, janela_leitura_primario=5.0,
+                 exigir_recuperacao=True):
+        self.app = app
+        self.replicas = [Replica(url, fabrica_engine) for url in urls_replicas]
+        self.atraso_maximo = atraso_maximo
+        self.intervalo_verificacao = intervalo_verificacao
+        self.janela_leitura_primario = janela_leitura_primario
+        self.exigir_recuperacao = exigir_recuperacao
+        self._lock = threading.Lock()
+
+        app.before_request(self._antes_da_requisicao)
+        app.after_request(self._depois_da_requisicao)
+
+    # ---------- Escolha por requisição ----------
+
+    def _antes_da_requisicao(self):
+        view = self.app.view_functions.get(request.endpoint)
+        leitura = request.method in METODOS_LEITURA or getattr(view, 'somente_leitura', False)
+        g.leitura_replica = (
+            bool(self.replicas)
+            and leitura
+            and not getattr(view, 'usar_primario', False)
+            and not self._leitura_consistente_exigida()
+        )
+
+    def _leitura_consistente_exigida(self):
+        if request.headers.get('X-Consistencia', '').lower() == 'forte':
+            return True
+        ultima_escrita = request.cookies.get(COOKIE_ESCRITA, type=float)
+        return bool(ultima_escrita) and time.time() - ultima_escrita < self.janela_leitura_primario
+
+    def _depois_da_requisicao(self, response):
+        view = self.app.view_functions.get(request.endpoint)
+        escrita = request.method not in METODOS_LEITURA and not getattr(view, 'somente_leitura', False)
+        if escrita and response.status_code < 400:
+            response.set_cookie(
+                COOKIE_ESCRITA, str(time.time()),
+                max_age=int(self.janela_leitura_primario) + 1, httponly=True
+            )
+        return response
+
+    def engine_leitura(self):
+        """Engine de uma réplica para a requisição atual, ou None (primário)"""
+        if not has_request_context() or not g.get('leitura_replica'):
+            return None
+        disponiveis = [replica for replica in self.replicas if self._verificar(replica)]
+        if not disponiveis:
+            return None
+        return random.choice(disponiveis).engine
+
+    # ---------- Saúde e atraso das réplicas ----------
+
+    def _verificar(self, replica):
+        agora = time.monotonic()
+        if agora - replica.verificado_em < self.intervalo_verificacao:
+            return replica.disponivel
+        with self._lock:
+            if agora - replica.verificado_em < self.intervalo_verificacao:
+                return replica.disponivel
+            replica.verificado_em = agora
+
+        try:
+            with replica.engine.connect() as conexao:
+                em_recuperacao, atraso = conexao.execute(text(SQL_ESTADO_REPLICA)).one()
+            replica.atraso = float(atraso)
+            if self.exigir_recuperacao and not em_recuperacao:
+                replica.disponivel = False
+                replica.erro = 'Banco não está em modo de recuperação (não é uma réplica)'
+            elif replica.atraso > self.atraso_maximo:
+                replica.disponivel = False
+                replica.erro = f'Atraso de replicação acima de {self.atraso_maximo}s'
+            else:
+                replica.disponivel = True
+                replica.erro = None
+        except Exception as e:
+            replica.disponivel = False
+            replica.erro = str(e)
+        return replica.disponivel
+
+    def status(self):
+        return {
+            'replicas': [replica.status() for replica in self.replicas],
+            'atraso_maximo': self.atraso_maximo,
+            'janela_leitura_primario': self.janela_leitura_primario
+        }
+
+
+class SessaoRoteada(Session):
+    """Sessão do Flask-SQLAlchemy que envia leituras para réplicas"""
+
+    roteador = None
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and self.roteador is not None and not self._flushing:
+            engine = self.roteador.engine_leitura()
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper, clause=clause, bind=bind, **kwargs)
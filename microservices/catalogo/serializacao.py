@@ -0,0 +1,114 @@
+"""
+Serialização de produtos para as respostas da API
+
+As listagens selecionam só as colunas necessárias (com o nome da categoria
+via JOIN, sem carregar objetos do ORM nem a relação preguiçosa de
+Produto.to_dict) e montam dicionários direto das linhas. O parâmetro
+?fields=id,nome,preco limita os campos da resposta.
+
+Com orjson instalado, o Flask passa a codificar o JSON com ele
+(ProvedorJsonRapido); sem ele, segue o encoder padrão.
+"""
+from datetime import date, datetime
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson é opcional
+    orjson = None
+
+CAMPOS_PRODUTO = (
+    'id', 'nome', 'descricao', 'preco', 'estoque', 'estoque_disponivel', 'categoria_id',
+    'categoria_nome', 'foto_url', 'ativo', 'criado_em', 'atualizado_em'
+)
+
+# Campos sempre lidos do banco: id e preço montam o cursor da paginação e o
+# estoque é a base do estoque disponível
+CAMPOS_INTERNOS = ('id', 'preco', 'estoque')
+
+
+class CamposInvalidos(ValueError):
+    pass
+
+
+def campos_solicitados(valor):
+    """Valor de ?fields= -> tupla de campos na ordem de CAMPOS_PRODUTO"""
+    if not valor:
+        return CAMPOS_PRODUTO
+    pedidos = {campo.strip() for campo in valor.split(',') if campo.strip()}
+    desconhecidos = pedidos - set(CAMPOS_PRODUTO)
+    if desconhecidos:
+        raise CamposInvalidos(f'Campos inválidos: {", ".join(sorted(desconhecidos))}')
+    return tuple(campo for campo in CAMPOS_PRODUTO if campo in pedidos)
+
+
+def colunas_produto(Produto, Categoria, campos):
+    """Colunas rotuladas para Query.with_entities (o nome da categoria vem do JOIN)"""
+    colunas = {
+        'id': Produto.id,
+        'nome': Produto.nome,
+        'descricao': Produto.descricao,
+        'preco': Produto.preco,
+        'estoque': Produto.estoque,
+        'categoria_id': Produto.categoria_id,
+        'categoria_nome': Categoria.nome,
+        'foto_url': Produto.foto_url,
+        'ativo': Produto.ativo,
+        'criado_em': Produto.criado_em,
+        'atualizado_em': Produto.atualizado_em,
+    }
+    lidos = [campo for campo in colunas if campo in campos or campo in CAMPOS_INTERNOS]
+    return [colunas[campo].label(campo) for campo in lidos]
+
+
+def selecionar_produtos(query, Produto, Categoria, campos):
+    """Aplica o JOIN com categorias e a seleção de colunas à consulta de produtos"""
+    query = query.with_entities(*colunas_produto(Produto, Categoria, campos))
+    if 'categoria_nome' in campos:
+        query = query.outerjoin(Categoria, Produto.categoria_id == Categoria.id)
+    return query
+
+
+def _valor(valor):
+    if isinstance(valor, (datetime, date)):
+        return valor.isoformat()
+    return valor
+
+
+def linhas_para_dicts(linhas, campos, reservados=None):
+    """
+    Linhas de selecionar_produtos -> dicionários só com `campos`.
+    estoque_disponivel = estoque menos `reservados` ({produto_id: quantidade})
+    """
+    reservados = reservados or {}
+    lidos = [campo for campo in campos if campo != 'estoque_disponivel']
+    disponivel = 'estoque_disponivel' in campos
+    dados = []
+    for linha in linhas:
+        mapa = linha._mapping
+        item = {campo: _valor(mapa[campo]) for campo in lidos}
+        if disponivel:
+            item['estoque_disponivel'] = max((mapa['estoque'] or 0) - reservados.get(mapa['id'], 0), 0)
+        dados.append(item)
+    return dados
+
+
+class ProvedorJsonRapido(DefaultJSONProvider):
+    """jsonify com orjson (datas e Decimal seguem o padrão do Flask)"""
+
+    opcoes = (orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME) if orjson else 0
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None or kwargs:
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=self.default, option=self.opcoes).decode()
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        if orjson is None:
+            return super().response(obj)
+        return self._app.response_class(
+            orjson.dumps(obj, default=self.default, option=self.opcoes),
+            mimetype=self.mimetype
+        )
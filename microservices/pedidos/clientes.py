@@ -0,0 +1,83 @@
+"""
+Clientes HTTP dos serviços de carrinho e catálogo
+Uma sessão por serviço e por worker, com pool de conexões keep-alive,
+timeouts separados de conexão e leitura e retentativas só para GET (e
+para falhas de conexão, quando a requisição nem chegou a ser enviada)
+"""
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+class ServicoIndisponivel(Exception):
+    """
+    O serviço não respondeu (erro de rede, timeout ou 5xx)
+    incerto=True quando a requisição pode ter sido processada: timeout de
+    leitura ou qualquer 5xx (um 500 pode vir depois do commit, um 502/504
+    de um proxy que desistiu de esperar)
+    """
+
+    def __init__(self, mensagem, incerto=False):
+        super().__init__(mensagem)
+        self.incerto = incerto
+
+
+class ClienteServico:
+    def __init__(self, nome, base_url, connect_timeout=1.0, read_timeout=5.0,
+                 retries=2, backoff=0.1, pool_maxsize=20):
+        self.nome = nome
+        self.base_url = base_url.rstrip('/')
+        self.timeout = (connect_timeout, read_timeout)
+        self.chamadas = 0
+        self.falhas = 0
+
+        retry = Retry(
+            total=retries,
+            connect=retries,
+            read=retries,
+            status=retries,
+            backoff_factor=backoff,
+            status_forcelist=(502, 503, 504),
+            allowed_methods=frozenset({'GET', 'HEAD'}),
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_maxsize, max_retries=retry)
+
+        self.session = requests.Session()
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def requisitar(self, metodo, caminho, **kwargs):
+        """Lança ServicoIndisponivel em caso de falha de rede ou 5xx"""
+        kwargs.setdefault('timeout', self.timeout)
+        self.chamadas += 1
+        try:
+            response = self.session.request(metodo, f'{self.base_url}{caminho}', **kwargs)
+        except requests.ReadTimeout as e:
+            self.falhas += 1
+            raise ServicoIndisponivel(f'{self.nome}: {e}', incerto=True) from e
+        except requests.RequestException as e:
+            self.falhas += 1
+            raise ServicoIndisponivel(f'{self.nome}: {e}') from e
+
+        if response.status_code >= 500:
+            self.falhas += 1
+            raise ServicoIndisponivel(f'{self.nome} respondeu {response.status_code}', incerto=True)
+        return response
+
+    def get(self, caminho, **kwargs):
+        return self.requisitar('GET', caminho, **kwargs)
+
+    def post(self, caminho, **kwargs):
+        return self.requisitar('POST', caminho, **kwargs)
+
+    def delete(self, caminho, **kwargs):
+        return self.requisitar('DELETE', caminho, **kwargs)
+
+    def status(self):
+        return {
+            'url': self.base_url,
+            'chamadas': self.chamadas,
+            'falhas': self.falhas,
+            'timeout': {'conexao': self.timeout[0], 'leitura': self.timeout[1]}
+        }
@@ -5,7 +5,7 @@ from pedidos.models import Pedido, PedidoItem
 class PedidoItemInline(admin.TabularInline):
     model = PedidoItem
     extra = 0  # Remove linhas adicionais vazias
-    readonly_fields = ('doce', 'quantidade')  # Campos somente leitura para evitar edição acidental
+    readonly_fields = ('doce', 'produto_id', 'nome_produto', 'quantidade')  # Campos somente leitura para evitar edição acidental
 
 class PedidoAdmin(admin.ModelAdmin):
     list_display = ('nome_comprador', 'contato_comprador', 'nome_retirada', 'data_retirada', 'valor_total', 'entregue')
@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class PedidosConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "pedidos"
+
+    def ready(self):
+        # Registra as tarefas da fila pós-checkout
+        from pedidos import tarefas  # noqa: F401
+        from pedidos.fila import verificar_cache_compartilhado
+
+        verificar_cache_compartilhado()
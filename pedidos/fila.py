@@ -0,0 +1,224 @@
+"""
+Fila de tarefas pós-checkout (notificação, reconciliação de estoque,
+relatório de vendas).
+
+Com PEDIDOS_FILA_REDIS_URL, as tarefas vão para o Redis Stream
+`pedidos:tarefas` e são executadas pelos workers
+(python manage.py worker_pedidos), fora da requisição de checkout:
+
+- consumer group "workers": cada tarefa vai para um único worker; as que
+  ficam pendentes com um worker que caiu são retomadas (XAUTOCLAIM)
+- falhas são reagendadas com backoff exponencial (sorted set
+  `pedidos:tarefas:agendadas`) até PEDIDOS_FILA_MAX_TENTATIVAS; depois vão
+  para o stream `pedidos:tarefas:falhas`
+- cada tarefa tem uma chave de idempotência (tipo:pedido_id); tarefas já
+  concluídas não são executadas de novo
+- as marcas de conclusão e os contadores do relatório ficam no cache padrão
+  do Django, que precisa ser compartilhado entre a loja e os workers
+  (DJANGO_CACHE_REDIS_URL)
+
+Sem Redis (desenvolvimento), as tarefas rodam na hora, após o commit.
+"""
+import json
+import socket
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+
+STREAM_TAREFAS = "pedidos:tarefas"
+STREAM_FALHAS = "pedidos:tarefas:falhas"
+CHAVE_AGENDADAS = "pedidos:tarefas:agendadas"
+GRUPO_WORKERS = "workers"
+PREFIXO_CONCLUIDAS = "pedidos:tarefa:concluida"
+
+# Conclusões lembradas por 7 dias (janela de deduplicação)
+TTL_CONCLUIDAS = 7 * 24 * 3600
+
+# Tarefas enfileiradas para cada pedido finalizado (ver pedidos/tarefas.py)
+TAREFAS_POS_CHECKOUT = ("notificar_pedido", "reconciliar_estoque", "registrar_relatorio")
+
+# Caches que não são vistos pelos outros processos
+CACHES_LOCAIS = (
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+)
+
+# Devolve ao stream as tarefas cuja espera (backoff) terminou, em uma única
+# operação: ZREM e XADD juntos, sem perder nem duplicar a tarefa se o worker
+# cair no meio. KEYS: agendadas, stream; ARGV: agora, lote
+LUA_MOVER_AGENDADAS = """
+local movidas = 0
+for _, dados in ipairs(redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, ARGV[2])) do
+    redis.call('ZREM', KEYS[1], dados)
+    local campos = {}
+    for campo, valor in pairs(cjson.decode(dados)) do
+        table.insert(campos, campo)
+        table.insert(campos, tostring(valor))
+    end
+    redis.call('XADD', KEYS[2], 'MAXLEN', '~', '100000', '*', unpack(campos))
+    movidas = movidas + 1
+end
+return movidas
+"""
+
+_tarefas = {}
+
+
+def tarefa(nome):
+    """Registra a função que executa as tarefas do tipo `nome`"""
+
+    def registrar(funcao):
+        _tarefas[nome] = funcao
+        return funcao
+
+    return registrar
+
+
+def verificar_cache_compartilhado():
+    """
+    Com a fila no Redis as tarefas rodam em outros processos: um cache
+    local a cada processo repetiria tarefas e dividiria o relatório
+    """
+    if settings.PEDIDOS_FILA_REDIS_URL and settings.CACHES["default"]["BACKEND"] in CACHES_LOCAIS:
+        raise ImproperlyConfigured(
+            "PEDIDOS_FILA_REDIS_URL exige um cache compartilhado entre os processos (defina DJANGO_CACHE_REDIS_URL)"
+        )
+
+
+def chave_idempotencia(tipo, pedido_id):
+    return f"{tipo}:{pedido_id}"
+
+
+def executar(mensagem):
+    """
+    Executa uma tarefa ({"tipo", "pedido_id", "chave", "tentativas"}) se ela
+    ainda não foi concluída. Exceções sobem para quem chamou (retentativa).
+    """
+    chave_concluida = f"{PREFIXO_CONCLUIDAS}:{mensagem['chave']}"
+    if cache.get(chave_concluida):
+        return False
+    _tarefas[mensagem["tipo"]](int(mensagem["pedido_id"]))
+    cache.set(chave_concluida, 1, TTL_CONCLUIDAS)
+    return True
+
+
+class FilaLocal:
+    """Executa as tarefas na hora (sem Redis)"""
+
+    def enfileirar(self, tipo, pedido_id):
+        mensagem = {"tipo": tipo, "pedido_id": pedido_id, "chave": chave_idempotencia(tipo, pedido_id), "tentativas": 0}
+        try:
+            executar(mensagem)
+        except Exception as e:
+            print(f"Erro na tarefa {tipo} do pedido {pedido_id}: {e}")
+
+
+class FilaRedis:
+    def __init__(self, redis_client, max_tentativas=5, backoff=2.0, tempo_retomada_ms=60000):
+        self.redis_client = redis_client
+        self.max_tentativas = max_tentativas
+        self.backoff = backoff
+        self.tempo_retomada_ms = tempo_retomada_ms
+        self._mover = redis_client.register_script(LUA_MOVER_AGENDADAS)
+
+    def enfileirar(self, tipo, pedido_id, tentativas=0):
+        self.redis_client.xadd(STREAM_TAREFAS, {
+            "tipo": tipo,
+            "pedido_id": str(pedido_id),
+            "chave": chave_idempotencia(tipo, pedido_id),
+            "tentativas": str(tentativas),
+        }, maxlen=100000, approximate=True)
+
+    def _criar_grupo(self):
+        try:
+            self.redis_client.xgroup_create(STREAM_TAREFAS, GRUPO_WORKERS, id="0", mkstream=True)
+        except Exception as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    def _mover_agendadas(self):
+        # Tarefas cuja espera (backoff) terminou voltam ao stream
+        return self._mover(keys=[CHAVE_AGENDADAS, STREAM_TAREFAS], args=[time.time(), 100])
+
+    def _processar(self, mensagem_id, campos):
+        mensagem = dict(campos)
+        try:
+            executar(mensagem)
+        except Exception as e:
+            tentativas = int(mensagem.get("tentativas", 0)) + 1
+            print(f"Erro na tarefa {mensagem['chave']} (tentativa {tentativas}): {e}")
+            mensagem["tentativas"] = str(tentativas)
+            if tentativas >= self.max_tentativas:
+                self.redis_client.xadd(STREAM_FALHAS, {**mensagem, "erro": str(e)[:500]})
+            else:
+                espera = self.backoff ** tentativas
+                self.redis_client.zadd(CHAVE_AGENDADAS, {json.dumps(mensagem): time.time() + espera})
+        self.redis_client.xack(STREAM_TAREFAS, GRUPO_WORKERS, mensagem_id)
+
+    def trabalhar(self, consumidor=None, bloqueio_ms=5000, lote=10):
+        """Laço do worker: retoma tarefas abandonadas, lê novas e executa"""
+        consumidor = consumidor or f"{socket.gethostname()}-{time.time_ns()}"
+        self._criar_grupo()
+        while True:
+            try:
+                self.ciclo(consumidor, bloqueio_ms, lote)
+            except Exception as e:
+                print(f"Erro ao ler a fila de pedidos: {e}")
+                time.sleep(1)
+
+    def ciclo(self, consumidor, bloqueio_ms=5000, lote=10):
+        """Um passo do worker; retorna quantas tarefas foram processadas"""
+        self._mover_agendadas()
+        processadas = 0
+        _, abandonadas, *_ = self.redis_client.xautoclaim(
+            STREAM_TAREFAS, GRUPO_WORKERS, consumidor, self.tempo_retomada_ms, start_id="0-0", count=lote
+        )
+        for mensagem_id, campos in abandonadas:
+            if campos:
+                self._processar(mensagem_id, campos)
+                processadas += 1
+
+        resposta = self.redis_client.xreadgroup(
+            GRUPO_WORKERS, consumidor, {STREAM_TAREFAS: ">"}, count=lote, block=bloqueio_ms
+        )
+        for _, mensagens in resposta or []:
+            for mensagem_id, campos in mensagens:
+                self._processar(mensagem_id, campos)
+                processadas += 1
+        return processadas
+
+    def estatisticas(self):
+        return {
+            "tamanho_stream": self.redis_client.xlen(STREAM_TAREFAS),
+            "agendadas": self.redis_client.zcard(CHAVE_AGENDADAS),
+            "falhas": self.redis_client.xlen(STREAM_FALHAS),
+        }
+
+
+_fila = None
+
+
+def fila_pedidos():
+    global _fila
+    if _fila is None:
+        if settings.PEDIDOS_FILA_REDIS_URL:
+            import redis
+
+            verificar_cache_compartilhado()
+
+            _fila = FilaRedis(
+                redis.Redis.from_url(settings.PEDIDOS_FILA_REDIS_URL, decode_responses=True),
+                max_tentativas=settings.PEDIDOS_FILA_MAX_TENTATIVAS,
+            )
+        else:
+            _fila = FilaLocal()
+    return _fila
+
+
+def enfileirar_pos_checkout(pedido_id):
+    """Enfileira as tarefas do pedido; chamado após o commit do checkout"""
+    fila = fila_pedidos()
+    for tipo in TAREFAS_POS_CHECKOUT:
+        fila.enfileirar(tipo, pedido_id)
@@ -1,3 +1,5 @@
+import uuid
+
 from django import forms
 from django.utils import timezone
 
@@ -34,6 +36,14 @@ class PedidoForms(forms.Form):
         widget=forms.Textarea(attrs={"class": "form__mensagem", "placeholder": "Observações sobre o pedido"})
     )
 
+    # Identifica o envio: reenvios do mesmo formulário não criam outro pedido
+    chave_idempotencia = forms.CharField(
+        required=False,
+        max_length=64,
+        widget=forms.HiddenInput,
+        initial=lambda: uuid.uuid4().hex
+    )
+
     def clean_data_retirada(self):
         data_retirada = self.cleaned_data.get("data_retirada")
         data_minima = timezone.now().date()
@@ -0,0 +1,46 @@
+"""
+Proteção contra pedidos duplicados (duplo clique, reenvio do formulário,
+retentativa de um cliente com o cabeçalho Idempotency-Key)
+
+O formulário de finalização leva uma chave única (campo oculto
+chave_idempotencia). O primeiro envio marca a chave no cache e, quando o
+pedido é criado, guarda nela a URL para onde o cliente foi redirecionado;
+reenvios com a mesma chave vão para o mesmo destino sem criar outro
+pedido. A chave vale só dentro da sessão que a enviou: o destino leva os
+dados do comprador e não pode ser entregue a outro cliente. Se o envio não criar o pedido (formulário inválido, sem estoque),
+a chave é liberada para uma nova tentativa.
+"""
+from django.conf import settings
+from django.core.cache import cache
+
+PROCESSANDO = "processando"
+TAMANHO_MAXIMO_CHAVE = 255
+
+
+def chave_da_requisicao(request):
+    """Chave do cache para o envio, ou None se a requisição não trouxer uma (ou não tiver sessão)"""
+    chave = request.headers.get("Idempotency-Key") or request.POST.get("chave_idempotencia")
+    sessao = request.session.session_key
+    if not chave or len(chave) > TAMANHO_MAXIMO_CHAVE or not sessao:
+        # Sem sessão também não há carrinho: o checkout só redireciona
+        return None
+    return f"pedidos:idempotencia:{sessao}:{chave}"
+
+
+def reservar(chave):
+    """Marca a chave como em processamento; False se ela já foi usada"""
+    return cache.add(chave, PROCESSANDO, settings.PEDIDOS_IDEMPOTENCIA_TTL_PROCESSAMENTO)
+
+
+def resultado(chave):
+    """URL de destino do pedido já criado, PROCESSANDO ou None"""
+    return cache.get(chave)
+
+
+def concluir(chave, url):
+    cache.set(chave, url, settings.PEDIDOS_IDEMPOTENCIA_TTL)
+
+
+def liberar_se_pendente(chave):
+    if cache.get(chave) == PROCESSANDO:
+        cache.delete(chave)
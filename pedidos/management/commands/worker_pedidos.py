@@ -0,0 +1,24 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from pedidos.fila import STREAM_TAREFAS, fila_pedidos
+
+
+class Command(BaseCommand):
+    help = (
+        "Executa as tarefas pós-checkout (notificação, reconciliação de estoque, "
+        "relatório) da fila de pedidos no Redis. Rode quantos workers quiser: cada "
+        "tarefa vai para um só, e as de um worker que caiu são retomadas pelos outros."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--nome", default=None, help="Nome do consumidor no grupo (padrão: host + horário)")
+        parser.add_argument("--bloqueio-ms", type=int, default=5000)
+        parser.add_argument("--lote", type=int, default=10)
+
+    def handle(self, *args, **options):
+        if not settings.PEDIDOS_FILA_REDIS_URL:
+            raise CommandError("Defina PEDIDOS_FILA_REDIS_URL para usar o worker (sem ela as tarefas rodam no checkout)")
+
+        self.stdout.write(f"Consumindo {STREAM_TAREFAS}")
+        fila_pedidos().trabalhar(options["nome"], bloqueio_ms=options["bloqueio_ms"], lote=options["lote"])
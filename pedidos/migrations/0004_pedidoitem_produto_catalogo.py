@@ -0,0 +1,28 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('confeitaria', '0011_doce_indices'),
+        ('pedidos', '0003_pedido_indices'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='pedidoitem',
+            name='doce',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='confeitaria.doce'),
+        ),
+        migrations.AddField(
+            model_name='pedidoitem',
+            name='produto_id',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='pedidoitem',
+            name='nome_produto',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+    ]
@@ -21,13 +21,28 @@ class Pedido(models.Model):
     entregue = models.BooleanField(default=False)
     data_entrega = models.DateField(blank=True, null=True)
 
+    class Meta:
+        indexes = [
+            # filtros do admin (list_filter) e fila de pedidos a entregar
+            models.Index(fields=["entregue", "data_retirada"], name="pedido_entregue_retirada_idx"),
+            models.Index(fields=["data_retirada"], name="pedido_data_retirada_idx"),
+        ]
+
     def __str__(self):
         return f"Pedido {self.id} por {self.nome_comprador}"
 
 class PedidoItem(models.Model):
     pedido = models.ForeignKey(Pedido, on_delete=models.CASCADE)
-    doce = models.ForeignKey(Doce, on_delete=models.CASCADE)
+    # Vazio nos pedidos feitos com o catálogo da API (CATALOGO_BACKEND=api)
+    doce = models.ForeignKey(Doce, on_delete=models.CASCADE, null=True, blank=True)
+    # Id e nome do produto no microserviço de catálogo (CATALOGO_BACKEND=api)
+    produto_id = models.PositiveIntegerField(null=True, blank=True)
+    nome_produto = models.CharField(max_length=100, blank=True)
     quantidade = models.PositiveIntegerField()
 
+    @property
+    def nome(self):
+        return self.doce.nome if self.doce_id else self.nome_produto
+
     def __str__(self):
-        return f"{self.quantidade} x {self.doce.nome} no pedido {self.pedido.id}"
+        return f"{self.quantidade} x {self.nome} no pedido {self.pedido.id}"
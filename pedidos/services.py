@@ -0,0 +1,134 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from confeitaria.models import Doce
+from pedidos.fila import enfileirar_pos_checkout
+from pedidos.models import Pedido, PedidoItem
+
+
+class EstoqueInsuficiente(Exception):
+    def __init__(self, doce, quantidade):
+        self.doce = doce
+        self.quantidade = quantidade
+        super().__init__(f"Estoque insuficiente para {doce.nome}. Estoque disponível: {doce.estoque}.")
+
+
+def agrupar_itens_carrinho(itens):
+    # Converte o carrinho da sessão em {doce_id: quantidade}, somando ids repetidos
+    quantidades = {}
+    for item in itens:
+        doce_id = int(item['doce_id'])
+        quantidades[doce_id] = quantidades.get(doce_id, 0) + int(item['quantidade'])
+    return dict(sorted(quantidades.items()))
+
+
+def catalogo_api():
+    # Checkout no microserviço de catálogo (CATALOGO_BACKEND=api)
+    if settings.CATALOGO_BACKEND != 'api':
+        return None
+    from confeitaria.catalogo_api import cliente_catalogo
+
+    return cliente_catalogo()
+
+
+def carregar_doces_carrinho(itens):
+    # Carrega todos os doces do carrinho com uma única consulta (ou um lote da API)
+    quantidades = agrupar_itens_carrinho(itens)
+    cliente = catalogo_api()
+    if cliente is not None:
+        doces = cliente.obter_muitos(list(quantidades))
+    else:
+        doces = Doce.objects.select_related('categoria').in_bulk(list(quantidades))
+    faltantes = [doce_id for doce_id in quantidades if doce_id not in doces]
+    if faltantes:
+        raise Doce.DoesNotExist(f"Doces não encontrados: {faltantes}")
+    return [{'doce': doces[doce_id], 'quantidade': quantidade} for doce_id, quantidade in quantidades.items()]
+
+
+def finalizar_checkout(itens, nome, telefone, nome_retirada, data_retirada, mensagem):
+    """
+    Cria o pedido e baixa o estoque em uma única transação.
+    Os doces são travados (SELECT ... FOR UPDATE, em ordem de id) com uma
+    consulta, os itens são inseridos com bulk_create e cada estoque é
+    decrementado com um UPDATE condicional, evitando vender além do estoque.
+    Notificação, reconciliação de estoque e relatório vão para a fila de
+    pedidos depois do commit (pedidos/fila.py), fora do tempo do checkout.
+    Com CATALOGO_BACKEND=api o estoque é o do catálogo (finalizar_checkout_catalogo).
+    """
+    quantidades = agrupar_itens_carrinho(itens)
+    dados_pedido = dict(
+        nome_comprador=nome,
+        contato_comprador=telefone,
+        nome_retirada=nome_retirada,
+        data_retirada=data_retirada,
+        mensagem=mensagem
+    )
+    cliente = catalogo_api()
+    if cliente is not None:
+        return finalizar_checkout_catalogo(cliente, quantidades, dados_pedido)
+
+    with transaction.atomic():
+        doces = Doce.objects.select_for_update().order_by('pk').in_bulk(list(quantidades))
+        faltantes = [doce_id for doce_id in quantidades if doce_id not in doces]
+        if faltantes:
+            raise Doce.DoesNotExist(f"Doces não encontrados: {faltantes}")
+
+        for doce_id, quantidade in quantidades.items():
+            if doces[doce_id].estoque < quantidade:
+                raise EstoqueInsuficiente(doces[doce_id], quantidade)
+
+        valor_total = sum(doces[doce_id].preco * quantidade for doce_id, quantidade in quantidades.items())
+
+        pedido = Pedido.objects.create(valor_total=valor_total, **dados_pedido)
+
+        PedidoItem.objects.bulk_create([
+            PedidoItem(pedido=pedido, doce_id=doce_id, quantidade=quantidade)
+            for doce_id, quantidade in quantidades.items()
+        ])
+
+        for doce_id, quantidade in quantidades.items():
+            atualizados = Doce.objects.filter(pk=doce_id, estoque__gte=quantidade).update(
+                estoque=F('estoque') - quantidade
+            )
+            if not atualizados:
+                raise EstoqueInsuficiente(doces[doce_id], quantidade)
+
+        transaction.on_commit(lambda: enfileirar_pos_checkout(pedido.id))
+
+    itens_pedido = [{'doce': doces[doce_id], 'quantidade': quantidade} for doce_id, quantidade in quantidades.items()]
+    return pedido, itens_pedido
+
+
+def finalizar_checkout_catalogo(cliente, quantidades, dados_pedido):
+    """
+    Checkout com CATALOGO_BACKEND=api: os ids do carrinho são do
+    microserviço de catálogo, então o estoque é debitado lá
+    (POST /api/produtos/reservar, tudo ou nada) e o pedido guarda o id e o
+    nome de cada produto. Se a gravação do pedido falhar, a reserva é
+    devolvida ao catálogo (POST /api/produtos/liberar).
+    """
+    doces = cliente.obter_muitos(list(quantidades))
+    faltantes = [doce_id for doce_id in quantidades if doce_id not in doces]
+    if faltantes:
+        raise Doce.DoesNotExist(f"Doces não encontrados: {faltantes}")
+
+    recusados = cliente.reservar(quantidades)
+    if recusados:
+        doce_id = recusados[0]
+        raise EstoqueInsuficiente(cliente.obter(doce_id, fresco=True) or doces[doce_id], quantidades[doce_id])
+
+    valor_total = sum(doces[doce_id].preco * quantidade for doce_id, quantidade in quantidades.items())
+    try:
+        with transaction.atomic():
+            pedido = Pedido.objects.create(valor_total=valor_total, **dados_pedido)
+            PedidoItem.objects.bulk_create([
+                PedidoItem(pedido=pedido, produto_id=doce_id, nome_produto=doces[doce_id].nome, quantidade=quantidade)
+                for doce_id, quantidade in quantidades.items()
+            ])
+            transaction.on_commit(lambda: enfileirar_pos_checkout(pedido.id))
+    except Exception:
+        cliente.liberar(quantidades)
+        raise
+
+    itens_pedido = [{'doce': doces[doce_id], 'quantidade': quantidade} for doce_id, quantidade in quantidades.items()]
+    return pedido, itens_pedido
@@ -0,0 +1,95 @@
+"""
+Tarefas executadas pelos workers depois do checkout (ver pedidos/fila.py).
+Cada uma recebe o id do pedido e pode ser repetida sem efeito duplicado.
+"""
+from datetime import datetime
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.mail import send_mail
+from django.utils import timezone
+
+from pedidos.fila import tarefa
+from pedidos.models import Pedido, PedidoItem
+
+# Abaixo deste estoque, o worker avisa a loja para repor o doce
+ESTOQUE_BAIXO = 5
+
+
+def itens_do_pedido(pedido_id):
+    return list(
+        PedidoItem.objects.filter(pedido_id=pedido_id).select_related("doce").order_by("doce_id", "produto_id")
+    )
+
+
+@tarefa("notificar_pedido")
+def notificar_pedido(pedido_id):
+    """Avisa a loja do novo pedido por e-mail (PEDIDOS_EMAIL_LOJA)"""
+    pedido = Pedido.objects.get(pk=pedido_id)
+    itens_texto = "\n".join(f"- {item.nome} (Quantidade: {item.quantidade})" for item in itens_do_pedido(pedido_id))
+    texto = (
+        f"Pedido {pedido.id} de {pedido.nome_comprador} ({pedido.contato_comprador})\n"
+        f"Retirada: {pedido.data_retirada.strftime('%d/%m/%Y')} por {pedido.nome_retirada or pedido.nome_comprador}\n"
+        f"Valor Total: R${pedido.valor_total:.2f}\n\n{itens_texto}"
+    )
+    if not settings.PEDIDOS_EMAIL_LOJA:
+        print(f"Novo pedido:\n{texto}")
+        return
+    send_mail(f"Novo pedido #{pedido.id}", texto, None, [settings.PEDIDOS_EMAIL_LOJA])
+
+
+@tarefa("reconciliar_estoque")
+def reconciliar_estoque(pedido_id):
+    """
+    Avisa dos doces do pedido com estoque baixo. Com o catálogo da API
+    (CATALOGO_BACKEND=api) a baixa já foi feita no checkout, pela reserva
+    no microserviço; aqui o estoque é relido de lá, sem o cache.
+    """
+    itens = itens_do_pedido(pedido_id)
+
+    if settings.CATALOGO_BACKEND == "api":
+        from confeitaria.catalogo_api import cliente_catalogo
+
+        cliente = cliente_catalogo()
+        estoques = {}
+        for item in itens:
+            if item.produto_id is not None:
+                produto = cliente.obter(item.produto_id, fresco=True)
+                estoques[item.nome] = produto.estoque if produto else 0
+    else:
+        estoques = {item.doce.nome: item.doce.estoque for item in itens if item.doce_id}
+
+    for nome, estoque in estoques.items():
+        if estoque < ESTOQUE_BAIXO:
+            print(f"Estoque baixo: {nome} ({estoque} restantes)")
+
+
+def chave_relatorio(dia, nome):
+    """
+    Chave do contador no cache. Um datetime (ex.: data_pedido de um pedido
+    ainda não relido do banco) vira a data local, como o DateField grava
+    """
+    if isinstance(dia, datetime):
+        dia = timezone.localdate(dia) if timezone.is_aware(dia) else dia.date()
+    return f"pedidos:relatorio:{dia.isoformat()}:{nome}"
+
+
+@tarefa("registrar_relatorio")
+def registrar_relatorio(pedido_id):
+    """Soma o pedido aos contadores de vendas do dia (pedidos e valor em centavos)"""
+    pedido = Pedido.objects.get(pk=pedido_id)
+    for nome, valor in (("pedidos", 1), ("valor_centavos", round(pedido.valor_total * 100))):
+        chave = chave_relatorio(pedido.data_pedido, nome)
+        # Chave sem expiração: o relatório do dia fica disponível para consulta
+        if not cache.add(chave, valor, None):
+            cache.incr(chave, valor)
+
+
+def relatorio_do_dia(dia):
+    """{"pedidos": int, "valor_total": float} registrados para a data"""
+    pedidos, valor = chave_relatorio(dia, "pedidos"), chave_relatorio(dia, "valor_centavos")
+    dados = cache.get_many([pedidos, valor])
+    return {
+        "pedidos": dados.get(pedidos, 0),
+        "valor_total": dados.get(valor, 0) / 100,
+    }
@@ -1,3 +1,153 @@
-from django.test import TestCase
+from datetime import date
+from unittest import skipUnless
+from unittest.mock import patch
 
-# Create your tests here.
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from confeitaria.catalogo_api import ClienteCatalogoApi
+from confeitaria.models import Categoria, Doce
+from pedidos.fila import FilaLocal
+from pedidos.models import Pedido, PedidoItem
+from pedidos.services import finalizar_checkout
+from pedidos.tarefas import relatorio_do_dia
+
+
+@skipUnless(connection.vendor == "postgresql", "EXPLAIN verificado apenas no PostgreSQL")
+class IndicesPedidosTest(TestCase):
+    """Os filtros do admin de pedidos precisam poder usar os índices"""
+
+    def plano(self, queryset):
+        # Com poucas linhas o planejador prefere seq scan; desliga para ver se o índice serve
+        with connection.cursor() as cursor:
+            cursor.execute("SET LOCAL enable_seqscan = off")
+        return queryset.explain()
+
+    def test_filtro_entregue_e_data_usa_indice_composto(self):
+        plano = self.plano(Pedido.objects.filter(entregue=False, data_retirada__gte="2024-01-01"))
+        self.assertIn("pedido_entregue_retirada_idx", plano)
+
+    def test_filtro_data_retirada_usa_indice(self):
+        plano = self.plano(Pedido.objects.filter(data_retirada__gte="2024-01-01"))
+        self.assertIn("pedido_data_retirada_idx", plano)
+
+
+@override_settings(PEDIDOS_FILA_REDIS_URL="", PEDIDOS_EMAIL_LOJA="", CATALOGO_BACKEND="local")
+class FilaPosCheckoutTest(TestCase):
+    """As tarefas pós-checkout rodam após o commit e uma única vez por pedido"""
+
+    @classmethod
+    def setUpTestData(cls):
+        categoria = Categoria.objects.create(nome="Bolos")
+        cls.doce = Doce.objects.create(
+            nome="Bolo", descricao="Bolo de teste", categoria=categoria, preco=12.5, estoque=10
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def finalizar(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            pedido, _ = finalizar_checkout(
+                [{"doce_id": self.doce.id, "quantidade": 2}],
+                nome="Ana", telefone="62999999999", nome_retirada="", data_retirada=date(2025, 1, 10), mensagem=""
+            )
+        return pedido, callbacks
+
+    def test_tarefas_enfileiradas_apos_o_commit(self):
+        pedido, callbacks = self.finalizar()
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(relatorio_do_dia(pedido.data_pedido), {"pedidos": 1, "valor_total": 25.0})
+
+    def test_tarefa_repetida_nao_duplica_relatorio(self):
+        pedido, _ = self.finalizar()
+        FilaLocal().enfileirar("registrar_relatorio", pedido.id)
+        self.assertEqual(relatorio_do_dia(pedido.data_pedido)["pedidos"], 1)
+
+
+@override_settings(CARRINHO_REDIS_URL="", PEDIDOS_FILA_REDIS_URL="", CATALOGO_BACKEND="local")
+class FinalizarPedidoIdempotenteTest(TestCase):
+    """Reenviar o formulário de finalização não cria um segundo pedido"""
+
+    @classmethod
+    def setUpTestData(cls):
+        categoria = Categoria.objects.create(nome="Bolos")
+        cls.doce = Doce.objects.create(
+            nome="Bolo", descricao="Bolo de teste", categoria=categoria, preco=10.0, estoque=5
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client.post(reverse("carrinho"), {"tipo": "adicionar", "doce_id": self.doce.id, "quantidade": 1})
+
+    def enviar(self, cliente=None):
+        return (cliente or self.client).post(reverse("finalizar"), {
+            "nome": "Ana", "telefone": "62999999999", "nome_retirada": "Ana",
+            "data_retirada": date.today().strftime("%d/%m/%Y"), "chave_idempotencia": "envio-1"
+        })
+
+    def test_reenvio_redireciona_para_o_mesmo_pedido(self):
+        primeira = self.enviar()
+        segunda = self.enviar()
+        self.assertEqual(Pedido.objects.count(), 1)
+        self.assertEqual(segunda.url, primeira.url)
+
+    def test_mesma_chave_em_outra_sessao_nao_recebe_o_pedido(self):
+        self.enviar()
+        outro_cliente = Client()
+        outro_cliente.post(reverse("carrinho"), {"tipo": "adicionar", "doce_id": self.doce.id, "quantidade": 1})
+        self.enviar(outro_cliente)
+        self.assertEqual(Pedido.objects.count(), 2)
+
+
+def produto_catalogo(produto_id):
+    return {
+        "id": produto_id, "nome": f"Produto {produto_id}", "descricao": "", "preco": 10.0, "estoque": 5,
+        "categoria_id": 1, "categoria_nome": "Bolos", "foto_url": None, "ativo": True,
+    }
+
+
+@override_settings(CATALOGO_BACKEND="api", CARRINHO_REDIS_URL="", PEDIDOS_FILA_REDIS_URL="")
+class CheckoutCatalogoApiTest(TestCase):
+    """Com CATALOGO_BACKEND=api o checkout usa os ids e o estoque do catálogo, não a tabela Doce"""
+
+    # Id que só existe no microserviço de catálogo
+    PRODUTO_ID = 900
+
+    def setUp(self):
+        cache.clear()
+        self.reserva_aceita = True
+        patcher = patch.object(ClienteCatalogoApi, "_requisitar", side_effect=self.resposta_catalogo)
+        self.requisitar = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client.post(reverse("carrinho"), {"tipo": "adicionar", "doce_id": self.PRODUTO_ID, "quantidade": 2})
+
+    def resposta_catalogo(self, metodo, caminho, **kwargs):
+        if caminho == "/api/produtos/lote":
+            return {"data": [produto_catalogo(produto_id) for produto_id in kwargs["json"]["ids"]]}
+        if caminho == "/api/produtos/reservar":
+            if self.reserva_aceita:
+                return {"success": True, "data": {"itens": []}}
+            return {"success": False, "produtos_indisponiveis": [self.PRODUTO_ID]}
+        return {"data": produto_catalogo(int(caminho.rsplit("/", 1)[1]))}
+
+    def enviar(self):
+        return self.client.post(reverse("finalizar"), {
+            "nome": "Ana", "telefone": "62999999999", "nome_retirada": "Ana",
+            "data_retirada": date.today().strftime("%d/%m/%Y"), "chave_idempotencia": "envio-api"
+        })
+
+    def test_pedido_reserva_estoque_no_catalogo(self):
+        self.enviar()
+        item = PedidoItem.objects.get()
+        self.assertIsNone(item.doce_id)
+        self.assertEqual((item.produto_id, item.nome, item.quantidade), (self.PRODUTO_ID, "Produto 900", 2))
+        reservas = [chamada for chamada in self.requisitar.call_args_list if chamada.args[1] == "/api/produtos/reservar"]
+        self.assertEqual(reservas[0].kwargs["json"], {"itens": [{"produto_id": self.PRODUTO_ID, "quantidade": 2}]})
+
+    def test_reserva_recusada_nao_cria_pedido(self):
+        self.reserva_aceita = False
+        response = self.enviar()
+        self.assertRedirects(response, reverse("carrinho"), fetch_redirect_response=False)
+        self.assertFalse(Pedido.objects.exists())
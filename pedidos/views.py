@@ -1,27 +1,51 @@
-from django.shortcuts import render, redirect, get_object_or_404
+from django.shortcuts import render, redirect
 from django.contrib import messages
+from confeitaria.carrinho import carrinho_da_requisicao
+from confeitaria.catalogo_api import CatalogoIndisponivel
 from confeitaria.models import Doce
-from pedidos.models import Pedido, PedidoItem
+from pedidos import idempotencia
 from pedidos.forms import PedidoForms
+from pedidos.services import EstoqueInsuficiente, carregar_doces_carrinho, finalizar_checkout
 import urllib.parse
 
 def finalizar_pedido(request):
-    itens = request.session.get('Carrinho', [])
+    chave = idempotencia.chave_da_requisicao(request) if request.method == 'POST' else None
+    if chave is None:
+        return processar_pedido(request)
+
+    if not idempotencia.reservar(chave):
+        # Reenvio de um pedido já finalizado (ou ainda em andamento)
+        destino = idempotencia.resultado(chave)
+        if destino and destino != idempotencia.PROCESSANDO:
+            return redirect(destino)
+        messages.info(request, 'Seu pedido já está sendo processado.')
+        return redirect('index')
+
+    try:
+        return processar_pedido(request, chave)
+    finally:
+        idempotencia.liberar_se_pendente(chave)
+
+def processar_pedido(request, chave=None):
+    carrinho = carrinho_da_requisicao(request)
+    itens = carrinho.itens()
     if not itens:
         messages.error(request, 'Seu carrinho está vazio!')
         return redirect('carrinho')
 
-    # Carregar os doces do carrinho, verificando se cada item existe
-    doces = []
-    for item in itens:
-        try:
-            doce = get_object_or_404(Doce, pk=item['doce_id'])  # Acessa o doce_id corretamente
-            if doce.estoque <= 0:
-                messages.error(request, f"O doce '{doce.nome}' está fora de estoque.")
-                return redirect('carrinho')
-            doces.append({'doce': doce, 'quantidade': item['quantidade']})  # Inclui a quantidade também
-        except Exception as e:
-            messages.error(request, f"Ocorreu um problema ao processar o item de ID {item['doce_id']}.")
+    # Carregar os doces do carrinho com uma única consulta, verificando se cada item existe
+    try:
+        doces = carregar_doces_carrinho(itens)
+    except Doce.DoesNotExist:
+        messages.error(request, "Ocorreu um problema ao processar um dos itens do carrinho.")
+        return redirect('carrinho')
+    except CatalogoIndisponivel:
+        messages.error(request, "Não foi possível consultar os doces agora. Tente novamente em instantes.")
+        return redirect('carrinho')
+
+    for doce_info in doces:
+        if doce_info['doce'].estoque <= 0:
+            messages.error(request, f"O doce '{doce_info['doce'].nome}' está fora de estoque.")
             return redirect('carrinho')
 
     # Cálculo do valor total do pedido
@@ -38,26 +62,29 @@ def finalizar_pedido(request):
             data_retirada = form.cleaned_data['data_retirada']
             mensagem = form.cleaned_data['mensagem']
 
-            # Cria o pedido com o valor total calculado
-            pedido = Pedido.objects.create(
-                nome_comprador=nome,
-                contato_comprador=telefone,
-                nome_retirada=nome_retirada,
-                data_retirada=data_retirada,
-                mensagem=mensagem,
-                valor_total=valor_total
-            )
-
-            # Adicionar itens ao pedido e reduzir estoque
-            for doce_info in doces:
-                doce = doce_info['doce']
-                quantidade = doce_info['quantidade']
-                PedidoItem.objects.create(pedido=pedido, doce=doce, quantidade=quantidade)
-                doce.estoque -= quantidade
-                doce.save()
+            # Cria o pedido, os itens e baixa o estoque em uma única transação
+            try:
+                pedido, doces = finalizar_checkout(
+                    itens,
+                    nome=nome,
+                    telefone=telefone,
+                    nome_retirada=nome_retirada,
+                    data_retirada=data_retirada,
+                    mensagem=mensagem
+                )
+            except EstoqueInsuficiente as e:
+                messages.error(request, str(e))
+                return redirect('carrinho')
+            except Doce.DoesNotExist:
+                messages.error(request, "Ocorreu um problema ao processar um dos itens do carrinho.")
+                return redirect('carrinho')
+            except CatalogoIndisponivel:
+                messages.error(request, "Não foi possível finalizar o pedido agora. Tente novamente em instantes.")
+                return redirect('carrinho')
+            valor_total = pedido.valor_total
 
             # Limpar o carrinho após finalizar o pedido
-            request.session['Carrinho'] = []
+            carrinho.limpar()
 
             # Preparar mensagem para WhatsApp
             itens_texto = "\n".join([f"- {doce_info['doce'].nome} (Quantidade: {doce_info['quantidade']})" for doce_info in doces])
@@ -75,6 +102,8 @@ def finalizar_pedido(request):
             """
             texto_whatsapp = urllib.parse.quote(texto_whatsapp)
             url_whatsapp = f"https://wa.me/5562996877578?text={texto_whatsapp}"
+            if chave:
+                idempotencia.concluir(chave, url_whatsapp)
 
             messages.success(request, 'Pedido finalizado com sucesso! Você será redirecionado para o WhatsApp.')
             return redirect(url_whatsapp)
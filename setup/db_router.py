@@ -0,0 +1,110 @@
+"""
+Roteamento de leitura/escrita entre o banco primário ("default") e as
+réplicas configuradas em DATABASE_REPLICAS.
+
+- Leituras vão para uma réplica saudável; escritas para o primário
+- Requisições que escrevem (POST, PUT...) e as que chegam logo depois de
+  uma escrita do mesmo cliente (cookie) leem do primário: read-your-writes
+- Réplicas fora do ar, com atraso acima de REPLICA_ATRASO_MAXIMO ou que não
+  estão em recuperação são ignoradas até a próxima verificação
+"""
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.db import connections
+
+COOKIE_ESCRITA = "ultima_escrita"
+METODOS_LEITURA = ("GET", "HEAD", "OPTIONS")
+
+# Atraso 0 quando a réplica já aplicou todo o WAL recebido: com o primário
+# ocioso, now() - pg_last_xact_replay_timestamp() só cresce mesmo sem atraso
+SQL_ESTADO_REPLICA = """
+    SELECT pg_is_in_recovery(),
+           CASE
+               WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+               ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+           END
+"""
+
+_requisicao = threading.local()
+_estado_replicas = {}
+_lock = threading.Lock()
+
+
+def _replica_disponivel(alias):
+    agora = time.monotonic()
+    intervalo = getattr(settings, "REPLICA_INTERVALO_VERIFICACAO", 10.0)
+    with _lock:
+        disponivel, verificado_em = _estado_replicas.get(alias, (False, None))
+        if verificado_em is not None and agora - verificado_em < intervalo:
+            return disponivel
+        _estado_replicas[alias] = (disponivel, agora)
+
+    try:
+        with connections[alias].cursor() as cursor:
+            cursor.execute(SQL_ESTADO_REPLICA)
+            em_recuperacao, atraso = cursor.fetchone()
+        disponivel = em_recuperacao and float(atraso) <= getattr(settings, "REPLICA_ATRASO_MAXIMO", 5.0)
+    except Exception:
+        disponivel = False
+
+    with _lock:
+        _estado_replicas[alias] = (disponivel, agora)
+    return disponivel
+
+
+def estado_replicas():
+    with _lock:
+        return {alias: disponivel for alias, (disponivel, _) in _estado_replicas.items()}
+
+
+class RoteadorReplicas:
+    def db_for_read(self, model, **hints):
+        if getattr(_requisicao, "usar_primario", True):
+            return "default"
+        disponiveis = [alias for alias in settings.DATABASE_REPLICAS if _replica_disponivel(alias)]
+        return random.choice(disponiveis) if disponiveis else "default"
+
+    def db_for_write(self, model, **hints):
+        _requisicao.escreveu = True
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Réplicas têm os mesmos dados do primário
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == "default"
+
+
+class LeituraReplicaMiddleware:
+    """Decide, por requisição, se as leituras podem ir para uma réplica"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        janela = getattr(settings, "REPLICA_JANELA_LEITURA_PRIMARIO", 5.0)
+        ultima_escrita = request.COOKIES.get(COOKIE_ESCRITA)
+        try:
+            escrita_recente = ultima_escrita is not None and time.time() - float(ultima_escrita) < janela
+        except ValueError:
+            escrita_recente = False
+
+        _requisicao.usar_primario = (
+            not settings.DATABASE_REPLICAS
+            or request.method not in METODOS_LEITURA
+            or escrita_recente
+        )
+        _requisicao.escreveu = False
+        try:
+            response = self.get_response(request)
+            if _requisicao.escreveu:
+                response.set_cookie(COOKIE_ESCRITA, str(time.time()), max_age=int(janela) + 1, httponly=True)
+            return response
+        finally:
+            # Fora de requisições (shell, comandos, testes) tudo usa o primário
+            _requisicao.usar_primario = True
+            _requisicao.escreveu = False
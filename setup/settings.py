@@ -47,6 +47,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
+    "setup.db_router.LeituraReplicaMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -55,7 +56,45 @@ MIDDLEWARE = [
     "django.middleware.clickjacking.XFrameOptionsMiddleware"
 ]
 
-SESSION_ENGINE = "django.contrib.sessions.backends.signed_cookies"
+# Sessões no servidor (cache + banco): o cookie leva só a chave da sessão
+SESSION_ENGINE = "django.contrib.sessions.backends.cached_db"
+
+# Cache usado pelas sessões: Redis com DJANGO_CACHE_REDIS_URL, senão memória local
+DJANGO_CACHE_REDIS_URL = os.getenv("DJANGO_CACHE_REDIS_URL", "")
+if DJANGO_CACHE_REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": DJANGO_CACHE_REDIS_URL,
+        }
+    }
+
+# Carrinho no Redis do microserviço de carrinho (mesmo formato de hash).
+# Vazio: os itens do carrinho ficam na sessão (ver confeitaria/carrinho.py)
+CARRINHO_REDIS_URL = os.getenv("CARRINHO_REDIS_URL", "")
+CARRINHO_REDIS_MAX_CONEXOES = int(os.getenv("CARRINHO_REDIS_MAX_CONEXOES", 50))
+CARRINHO_TTL = int(os.getenv("CARRINHO_TTL", 86400))
+
+# Origem do catálogo das views da loja: "local" (banco do Django) ou "api"
+# (microserviço de catálogo, com cache local e busca em lote)
+CATALOGO_BACKEND = os.getenv("CATALOGO_BACKEND", "local")
+CATALOGO_API_URL = os.getenv("CATALOGO_API_URL", "http://localhost:5001")
+CATALOGO_API_TIMEOUT = float(os.getenv("CATALOGO_API_TIMEOUT", 3.0))
+CATALOGO_API_CACHE_TTL = int(os.getenv("CATALOGO_API_CACHE_TTL", 30))
+CATALOGO_API_LOTE_MAX = int(os.getenv("CATALOGO_API_LOTE_MAX", 100))
+CATALOGO_API_POOL_MAXSIZE = int(os.getenv("CATALOGO_API_POOL_MAXSIZE", 10))
+# Redis com o feed de alterações do catálogo (manage.py consumir_eventos_catalogo)
+CATALOGO_EVENTOS_REDIS_URL = os.getenv("CATALOGO_EVENTOS_REDIS_URL", "redis://localhost:6379/0")
+
+# Fila das tarefas pós-checkout (manage.py worker_pedidos). Vazio: as tarefas
+# rodam na própria requisição, logo após o commit do pedido
+PEDIDOS_FILA_REDIS_URL = os.getenv("PEDIDOS_FILA_REDIS_URL", "")
+PEDIDOS_FILA_MAX_TENTATIVAS = int(os.getenv("PEDIDOS_FILA_MAX_TENTATIVAS", 5))
+# E-mail que recebe o aviso de novos pedidos (vazio: aviso só no log do worker)
+PEDIDOS_EMAIL_LOJA = os.getenv("PEDIDOS_EMAIL_LOJA", "")
+# Janela em que reenvios do checkout (mesma chave_idempotencia) não criam outro pedido
+PEDIDOS_IDEMPOTENCIA_TTL = int(os.getenv("PEDIDOS_IDEMPOTENCIA_TTL", 86400))
+PEDIDOS_IDEMPOTENCIA_TTL_PROCESSAMENTO = int(os.getenv("PEDIDOS_IDEMPOTENCIA_TTL_PROCESSAMENTO", 60))
 
 ROOT_URLCONF = "setup.urls"
 
@@ -97,6 +136,26 @@ DATABASES = {
     }
 }
 
+# Réplicas de leitura (opcional): DJANGO_DB_REPLICAS="host:porta,host:porta"
+# Leituras vão para uma réplica saudável e escritas para o "default"
+# (ver setup/db_router.py)
+DATABASE_REPLICAS = []
+for indice, endereco in enumerate(filter(None, os.getenv("DJANGO_DB_REPLICAS", "").split(",")), start=1):
+    host, _, porta = endereco.strip().partition(":")
+    alias = f"replica{indice}"
+    DATABASES[alias] = {
+        **DATABASES["default"],
+        "HOST": host,
+        "PORT": porta or "5432",
+        "TEST": {"MIRROR": "default"},
+    }
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ["setup.db_router.RoteadorReplicas"]
+REPLICA_ATRASO_MAXIMO = float(os.getenv("REPLICA_ATRASO_MAXIMO", 5.0))
+REPLICA_INTERVALO_VERIFICACAO = float(os.getenv("REPLICA_INTERVALO_VERIFICACAO", 10.0))
+REPLICA_JANELA_LEITURA_PRIMARIO = float(os.getenv("REPLICA_JANELA_LEITURA_PRIMARIO", 5.0))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.1/ref/settings/#auth-password-validators